@@ -1,60 +1,275 @@
-from typing import Dict, Any, TypedDict, Optional
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple, TypedDict, Optional
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
-from spec import WorkflowSpec, NodeSpec
+from spec import WorkflowSpec, NodeSpec, ToolSpec
 from tools_registry import ToolRegistry
+from geo_cache import ResponseCache
+from llm_gateway import LLM
+from checkpoints import CHECKPOINTER
+import telemetry
 
 class DynamicState(TypedDict, total=False):
     prompt: str
     report_md: Optional[str]
 
-def make_node_fn(node: NodeSpec):
-    def fn(state: Dict[str, Any]) -> Dict[str, Any]:
+def _state_schema(spec: WorkflowSpec):
+    # node outputs live under their node id; without these keys LangGraph drops them from state
+    fields: Dict[str, Any] = {n.id: Any for n in spec.nodes}
+    fields.update(DynamicState.__annotations__)
+    return TypedDict("DynamicState", fields, total=False)
+
+# -----------------------------
+# Upstream context
+# -----------------------------
+
+UPSTREAM_SCOPE = os.environ.get("UPSTREAM_SCOPE", "direct")             # "direct" predecessors or "all" state
+UPSTREAM_MAX_BYTES = int(os.environ.get("UPSTREAM_MAX_BYTES", "12000"))  # ~3k tokens; 0 = no budget
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, default=str, ensure_ascii=False).encode("utf-8"))
+
+def _shrink(value: Any, budget: int) -> Any:
+    """Fit value into roughly budget bytes of JSON: drop meta, then cut long strings head+tail."""
+    if _size(value) <= budget:
+        return value
+    if isinstance(value, str):
+        keep = max(0, budget - 40) // 2
+        return value[:keep] + f" …[{len(value) - 2 * keep} chars truncated]… " + value[-keep:] if keep else "…"
+    if isinstance(value, dict):
+        value = {k: v for k, v in value.items() if k != "meta"}
+        if not value:
+            return {}
+        share = max(64, budget // len(value))
+        return {k: _shrink(v, share) for k, v in value.items()}
+    if isinstance(value, list):
+        out, used = [], 2
+        for item in value:
+            item = _shrink(item, max(64, budget - used))
+            used += _size(item) + 1
+            if used > budget and out:
+                out.append(f"…[{len(value) - len(out)} more items]")
+                break
+            out.append(item)
+        return out
+    return _shrink(str(value), budget)
+
+def upstream_context(state: Dict[str, Any], preds: Optional[List[str]]) -> Tuple[Dict[str, Any], int, int]:
+    """(upstream, bytes before, bytes after) for a node: its direct predecessors' outputs within the budget."""
+    if preds is None or UPSTREAM_SCOPE == "all":
+        upstream = {k: v for k, v in state.items() if k not in ("prompt", "report_md")}
+    else:
+        upstream = {p: state[p] for p in preds if p in state}
+    before = _size(upstream)
+    if UPSTREAM_MAX_BYTES and before > UPSTREAM_MAX_BYTES:
+        upstream = _shrink(upstream, UPSTREAM_MAX_BYTES)
+    return upstream, before, _size(upstream)
+
+TOOL_CONCURRENCY = int(os.environ.get("TOOL_CONCURRENCY", "4"))
+
+def _run_tool(t: ToolSpec, node: NodeSpec, ctx: Dict[str, Any]) -> Tuple[Any, bool]:
+    """(result, ok) for one tool call; ok is False for unknown tools and exceptions."""
+    tool_name = getattr(t, "name", None)
+    impl = ToolRegistry.get(tool_name)
+    if not impl:
+        return {"error": f"unknown tool '{tool_name}'"}, False
+    params = (getattr(t, "params", None) or {})
+    try:
+        return impl(prompt=node.prompt, context={**ctx, "tool_params": params}), True
+    except Exception as e:
+        return {"error": f"tool '{tool_name}' failed: {e}"}, False
+
+def _tool_plan(tools: List[ToolSpec]) -> List[List[ToolSpec]]:
+    """Topological waves of a node's tools; raises ValueError on duplicate ids, unknown deps or cycles."""
+    by_id: Dict[str, ToolSpec] = {}
+    for t in tools:
+        tid = t.id or t.name
+        if tid in by_id:
+            raise ValueError(f"duplicate tool id '{tid}' (set ToolSpec.id)")
+        by_id[tid] = t
+    deps = {tid: set(t.depends_on or []) for tid, t in by_id.items()}
+    for tid, ds in deps.items():
+        missing = ds - by_id.keys()
+        if missing:
+            raise ValueError(f"tool '{tid}' depends on unknown tool(s) {sorted(missing)}")
+    waves, done = [], set()
+    while len(done) < len(by_id):
+        ready = [tid for tid in by_id if tid not in done and deps[tid] <= done]
+        if not ready:
+            raise ValueError(f"tool dependency cycle among {sorted(set(by_id) - done)}")
+        waves.append([by_id[tid] for tid in ready])
+        done.update(ready)
+    return waves
+
+def _run_tool_graph(node: NodeSpec, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Run tools wave by wave, each wave on a pool capped at the node's concurrency;
+    output is {tool_id: result} plus the text of the final tools and per-tool meta."""
+    try:
+        waves = _tool_plan(node.tools)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    results: Dict[str, Any] = {}
+    failed_ids = set()
+    cap = max(1, node.max_concurrency or TOOL_CONCURRENCY)
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(cap, max(len(w) for w in waves))) as pool:
+        for wave in waves:
+            futures = {}
+            for t in wave:
+                tid = t.id or t.name
+                needed = t.depends_on or []
+                failed = [d for d in needed if d in failed_ids]
+                if failed:
+                    results[tid] = {"error": f"skipped: dependency {failed} failed"}
+                    failed_ids.add(tid)
+                    continue
+                dep_out = {d: results[d] for d in needed}
+                tool_ctx = {**ctx, "deps": dep_out}
+                if needed:
+                    tool_ctx["last_result"] = dep_out[needed[-1]]
+                # copy contextvars so the run's LangGraph config (streaming callbacks) follows the tool
+                futures[tid] = pool.submit(contextvars.copy_context().run, _run_tool, t, node, tool_ctx)
+            for tid, fut in futures.items():
+                results[tid], ok = fut.result()
+                if not ok:
+                    failed_ids.add(tid)
+
+    depended = {d for t in node.tools for d in (t.depends_on or [])}
+    sinks = [tid for tid in results if tid not in depended]
+    texts = [results[tid].get("text") for tid in sinks if isinstance(results[tid], dict) and results[tid].get("text")]
+    out: Dict[str, Any] = dict(results)
+    out["text"] = "\n\n".join(texts)
+    out["meta"] = {
+        "mode": "tool_graph",
+        "waves": [[t.id or t.name for t in w] for w in waves],
+        "elapsed_s": round(time.perf_counter() - t0, 3),
+        "tools": {tid: r.get("meta") for tid, r in results.items() if isinstance(r, dict) and "meta" in r},
+    }
+    return out
+
+# -----------------------------
+# Node memo cache
+# -----------------------------
+
+# in-memory SQLite by default; NODE_CACHE_PATH keeps results across restarts
+NODE_CACHE = ResponseCache(
+    path=os.environ.get("NODE_CACHE_PATH", ":memory:"),
+    max_bytes=int(os.environ.get("NODE_CACHE_MAX_MB", "64")) * 1024 * 1024,
+    ttls={"node": float(os.environ.get("NODE_CACHE_TTL_S", str(7 * 86400)))},
+    enabled=os.environ.get("NODE_CACHE_DISABLE", "").lower() not in ("1", "true", "yes"),
+)
+
+def node_cache_key(node: NodeSpec, ctx: Dict[str, Any]) -> Dict[str, Any]:
+    """Everything a node's output depends on: its prompt and tools, the run prompt, the upstream
+    it actually sees, and which model answers (so dev-stub output never stands in for real output).
+    Upstream meta is provenance only (e.g. the cached flag), so it's left out."""
+    upstream = {
+        k: ({kk: vv for kk, vv in v.items() if kk != "meta"} if isinstance(v, dict) else v)
+        for k, v in (ctx.get("upstream") or {}).items()
+    }
+    return {
+        "prompt": node.prompt,
+        "tools": [t.model_dump(mode="json") for t in node.tools],
+        "max_concurrency": node.max_concurrency,
+        "global_prompt": ctx.get("global_prompt"),
+        "upstream": json.loads(json.dumps(upstream, default=str)),
+        "llm": [LLM.model, LLM.available],
+    }
+
+def _failed(result: Any) -> bool:
+    if not isinstance(result, dict):
+        return result is None
+    return "error" in result or any(isinstance(v, dict) and "error" in v for v in result.values())
+
+def failed_nodes(spec: WorkflowSpec, state: Dict[str, Any]) -> List[str]:
+    """Nodes whose output in state is a tool error (tool failures don't raise, they land in state)."""
+    return [n.id for n in spec.nodes if n.id in state and _failed(state[n.id])]
+
+def _execute_node(node: NodeSpec, ctx: Dict[str, Any]) -> Any:
+    tools = node.tools or []
+
+    # default to 'llm' if none listed (now dev-safe)
+    if not tools:
+        impl = ToolRegistry.get("llm")
+        if not impl:
+            return {"error": "missing default 'llm' tool"}
+        try:
+            return impl(prompt=node.prompt, context=ctx)
+        except Exception as e:
+            return {"error": f"tool 'llm' failed: {e}"}
+
+    # depends_on anywhere -> dependency-aware, parallel execution
+    if any(t.depends_on is not None for t in tools):
+        return _run_tool_graph(node, ctx)
+
+    # plain list: execute listed tools sequentially
+    result = None
+    for t in tools:
+        result, ok = _run_tool(t, node, ctx)
+        if not ok:
+            break
+        ctx["last_result"] = result
+    return result
+
+def make_node_fn(node: NodeSpec, preds: Optional[List[str]] = None):
+    def fn(state: Dict[str, Any], config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        run_id = ((config or {}).get("configurable") or {}).get("run_id")
+        with telemetry.span("node", node.id, run_id=run_id):
+            return _node(state, config)
+
+    def _node(state: Dict[str, Any], config: Optional[RunnableConfig]) -> Dict[str, Any]:
+        upstream, before, after = upstream_context(state, preds)
         ctx = {
             "global_prompt": state.get("prompt"),
-            "upstream": {k: v for k, v in state.items() if k not in ("prompt", "report_md")}
+            "upstream": upstream,
         }
+        prompt_bytes = _size(ctx) + len(node.prompt.encode("utf-8"))
+        print(f"[CTX] {node.id}: upstream={list(upstream)} {after}B"
+              + (f" (truncated from {before}B)" if after < before else "")
+              + f", prompt ~{prompt_bytes}B / ~{prompt_bytes // 4} tokens", flush=True)
 
-        tools = node.tools or []
+        use_cache = ((config or {}).get("configurable") or {}).get("node_cache", True)
+        key = node_cache_key(node, ctx) if use_cache else None
+        if key is not None:
+            hit, cached = NODE_CACHE.get("node", key)
+            if hit:
+                print(f"[NODE_CACHE] {node.id}: hit, tools skipped", flush=True)
+                telemetry.note(cache="hit")
+                if isinstance(cached, dict) and isinstance(cached.get("meta"), dict):
+                    cached["meta"] = {**cached["meta"], "cached": True}
+                return {node.id: cached}
 
-        # default to 'llm' if none listed (now dev-safe)
-        if not tools:
-            impl = ToolRegistry.get("llm")
-            if not impl:
-                return {node.id: {"error": "missing default 'llm' tool"}}
-            try:
-                result = impl(prompt=node.prompt, context=ctx)
-            except Exception as e:
-                result = {"error": f"tool 'llm' failed: {e}"}
-            return {node.id: result}
-
-        # execute listed tools sequentially
-        result = None
-        for t in tools:
-            tool_name = getattr(t, "name", None)
-            impl = ToolRegistry.get(tool_name)
-            if not impl:
-                result = {"error": f"unknown tool '{tool_name}'"}
-                break
-            params = (getattr(t, "params", None) or {})
+        result = _execute_node(node, ctx)
+        if key is not None and not _failed(result):
             try:
-                result = impl(prompt=node.prompt, context={**ctx, "tool_params": params})
-            except Exception as e:
-                result = {"error": f"tool '{tool_name}' failed: {e}"}
-                break
-            ctx["last_result"] = result
-
+                NODE_CACHE.put("node", key, result)
+            except (TypeError, ValueError):
+                pass   # not JSON-serializable; just don't memoize it
         return {node.id: result}
     return fn
 
-def build_graph_from_spec(spec: WorkflowSpec):
-    g = StateGraph(DynamicState)
+def build_graph_from_spec(spec: WorkflowSpec, checkpointer=CHECKPOINTER):
+    g = StateGraph(_state_schema(spec))
+
+    preds: Dict[str, List[str]] = {n.id: [] for n in spec.nodes}
+    for s, t in spec.edges:
+        if s not in preds.setdefault(t, []):
+            preds[t].append(s)
 
     # add nodes; wrap drafting node to also set report_md
     for n in spec.nodes:
-        base_fn = make_node_fn(n)
+        base_fn = make_node_fn(n, preds.get(n.id, []))
         if n.id == spec.drafting_node:
-            def drafting_wrapper(state, _base_fn=base_fn, _nid=n.id):
-                out = _base_fn(state)
+            def drafting_wrapper(state, config: RunnableConfig, _base_fn=base_fn, _nid=n.id):
+                out = _base_fn(state, config)
                 node_out = out.get(_nid, {}) or {}
                 text = (
                     node_out.get("text")
@@ -67,11 +282,15 @@ def build_graph_from_spec(spec: WorkflowSpec):
         else:
             g.add_node(n.id, base_fn)
 
-    # edges
+    # edges; a node with several predecessors waits for all of them (one run, complete upstream)
     incoming = {n.id: 0 for n in spec.nodes}
     for s, t in spec.edges:
         incoming[t] = incoming.get(t, 0) + 1
-        g.add_edge(s, t)
+    for t, ps in preds.items():
+        if len(ps) == 1:
+            g.add_edge(ps[0], t)
+        elif ps:
+            g.add_edge(ps, t)
 
     roots = [nid for nid, deg in incoming.items() if deg == 0] or [spec.nodes[0].id]
 
@@ -85,4 +304,82 @@ def build_graph_from_spec(spec: WorkflowSpec):
             g.add_edge("start", r)
         g.set_entry_point("start")
 
-    return g.compile()
+    return g.compile(checkpointer=checkpointer)
+
+# -----------------------------
+# Compiled-graph cache
+# -----------------------------
+
+def spec_hash(spec: WorkflowSpec) -> str:
+    """Canonical hash of everything build_graph_from_spec looks at; edge order doesn't matter."""
+    data = spec.model_dump(mode="json")
+    canon = {
+        "nodes": data["nodes"],
+        "edges": sorted([list(e) for e in data["edges"]]),
+        "drafting_node": data["drafting_node"],
+    }
+    raw = json.dumps(canon, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class GraphCache:
+    """LRU of compiled graphs keyed by spec_hash. Compiled graphs hold no per-run state,
+    so concurrent runs of the same spec share one instance (like main.app_graph)."""
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._graphs: "OrderedDict[str, Any]" = OrderedDict()
+        self._build_s: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.build_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def get(self, spec: WorkflowSpec):
+        key = spec_hash(spec)
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                self._graphs.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += self._build_s.get(key, 0.0)
+                return graph
+            self.misses += 1
+
+        t0 = time.perf_counter()
+        graph = build_graph_from_spec(spec)
+        dt = time.perf_counter() - t0
+
+        with self._lock:
+            self.build_seconds += dt
+            if key not in self._graphs:
+                self._build_s[key] = dt
+            graph = self._graphs.setdefault(key, graph)   # another request may have built it meanwhile
+            self._graphs.move_to_end(key)
+            while len(self._graphs) > self.max_entries:
+                old, _ = self._graphs.popitem(last=False)
+                self._build_s.pop(old, None)
+                self.evictions += 1
+            return graph
+
+    def clear(self):
+        with self._lock:
+            self._graphs.clear()
+            self._build_s.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._graphs),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+                "evictions": self.evictions,
+                "build_seconds": round(self.build_seconds, 4),
+                "saved_seconds": round(self.saved_seconds, 4),
+            }
+
+GRAPH_CACHE = GraphCache(max_entries=int(os.environ.get("GRAPH_CACHE_SIZE", "32")))
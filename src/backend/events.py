@@ -0,0 +1,196 @@
+# src/backend/events.py
+"""
+Thread-safe event bus between graph runs and WebSocket clients.
+
+publish() may be called from any thread (graph nodes run in executor threads);
+events are handed to the server loop with call_soon_threadsafe, collected for a
+short flush window, coalesced (e.g. repeated node_tick for the same node), and
+fanned out to per-client bounded buffers. Each client has its own sender task,
+so a slow browser only ever drops its own oldest frames instead of stalling
+everyone else.
+
+Events carrying a run_id go only to clients subscribed to that run (or to "*").
+Each run's events are serialized once per flush and the same string is handed
+to every subscriber. The last few frames of each run are kept, so a client that
+subscribes right after POST /api/execute still sees run_start.
+"""
+
+import asyncio
+import json
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+def _merge_replace(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    return new
+
+def _merge_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    return {**new, "delta": (old.get("delta") or "") + (new.get("delta") or "")}
+
+# event type -> how two events with the same coalescing key inside one flush window combine
+COALESCE: Dict[str, Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]] = {
+    "node_tick": _merge_replace,
+    "report_delta": _merge_delta,   # tokens from one flush window go out as one chunk
+}
+
+def _coalesce_key(message: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    if message.get("type") not in COALESCE:
+        return None
+    return (message["type"], message.get("run_id"), message.get("node"))
+
+ALL_RUNS = "*"
+
+class _Client:
+    def __init__(self, ws: WebSocket, max_buffer: int):
+        self.ws = ws
+        self.max_buffer = max_buffer
+        self.buffer: Deque[str] = deque()
+        self.ready = asyncio.Event()
+        self.runs: Set[str] = set()
+        self.dropped = 0
+        self.sent = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def wants(self, run_id: Optional[str]) -> bool:
+        return run_id is None or run_id in self.runs or ALL_RUNS in self.runs
+
+    def offer(self, frame: str):
+        if len(self.buffer) >= self.max_buffer:
+            self.buffer.popleft()
+            self.dropped += 1
+        self.buffer.append(frame)
+        self.ready.set()
+
+class EventBus:
+    def __init__(self, client_buffer: int = 256, flush_interval: float = 0.05,
+                 replay_frames: int = 64, replay_runs: int = 100):
+        self.client_buffer = client_buffer
+        self.flush_interval = flush_interval
+        self.replay_frames = replay_frames
+        self.replay_runs = replay_runs
+        self._history: "OrderedDict[str, Deque[str]]" = OrderedDict()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._clients: Dict[int, _Client] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_keys: Dict[Tuple[Any, ...], int] = {}
+        self._flush_scheduled = False
+        self.published = 0
+        self.coalesced = 0
+        self.frames = 0
+
+    def bind(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Attach to the server loop (idempotent); called from code already running on it.
+        Rebinds if the previous loop has stopped (a restarted server in the same process)."""
+        if self._loop is None or not self._loop.is_running():
+            self._loop = loop or asyncio.get_running_loop()
+            self._pending, self._pending_keys, self._flush_scheduled = [], {}, False
+
+    # ---------- producers (any thread) ----------
+
+    def publish(self, message: Dict[str, Any]):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return   # no server loop yet means no client could be listening
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._enqueue(message)
+        else:
+            loop.call_soon_threadsafe(self._enqueue, message)
+
+    # ---------- loop side ----------
+
+    def _enqueue(self, message: Dict[str, Any]):
+        self.published += 1
+        key = _coalesce_key(message)
+        if key is not None and key in self._pending_keys:
+            i = self._pending_keys[key]
+            self._pending[i] = COALESCE[message["type"]](self._pending[i], message)
+            self.coalesced += 1
+        else:
+            if key is not None:
+                self._pending_keys[key] = len(self._pending)
+            self._pending.append(message)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self._loop.call_later(self.flush_interval, self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        events, self._pending, self._pending_keys = self._pending, [], {}
+        by_run: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for ev in events:
+            by_run.setdefault(ev.get("run_id"), []).append(ev)
+        for run_id, evs in by_run.items():
+            # serialized once; every subscriber gets the same string
+            frame = json.dumps(evs[0] if len(evs) == 1 else {"type": "batch", "events": evs})
+            self.frames += 1
+            if run_id is not None:
+                self._remember(run_id, frame)
+            for client in self._clients.values():
+                if client.wants(run_id):
+                    client.offer(frame)
+
+    def _remember(self, run_id: str, frame: str):
+        hist = self._history.get(run_id)
+        if hist is None:
+            hist = self._history[run_id] = deque(maxlen=self.replay_frames)
+            while len(self._history) > self.replay_runs:
+                self._history.popitem(last=False)
+        hist.append(frame)
+
+    async def _pump(self, client: _Client):
+        try:
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                while client.buffer:
+                    await client.ws.send_text(client.buffer.popleft())
+                    client.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._clients.pop(id(client.ws), None)
+
+    async def connect(self, ws: WebSocket):
+        self.bind()
+        await ws.accept()
+        client = _Client(ws, self.client_buffer)
+        client.task = asyncio.get_running_loop().create_task(self._pump(client))
+        self._clients[id(ws)] = client
+
+    async def disconnect(self, ws: WebSocket):
+        client = self._clients.pop(id(ws), None)
+        if client is not None and client.task is not None:
+            client.task.cancel()
+
+    def subscribe(self, ws: WebSocket, run_id: str):
+        """Start sending run_id's events to this socket (ALL_RUNS for everything); replays what was missed."""
+        client = self._clients.get(id(ws))
+        if client is None or run_id in client.runs:
+            return
+        client.runs.add(run_id)
+        if run_id == ALL_RUNS:
+            return
+        for frame in self._history.get(run_id, ()):
+            client.offer(frame)
+
+    def unsubscribe(self, ws: WebSocket, run_id: str):
+        client = self._clients.get(id(ws))
+        if client is not None:
+            client.runs.discard(run_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self._clients),
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "frames": self.frames,
+            "per_client": [
+                {"runs": sorted(c.runs), "buffered": len(c.buffer), "sent": c.sent, "dropped": c.dropped}
+                for c in self._clients.values()
+            ],
+        }
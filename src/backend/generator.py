@@ -1,11 +1,12 @@
 # src/backend/generator.py
+import time
 from typing import Dict, Any
-from langchain_openai import ChatOpenAI
 from langchain_core.output_parsers import JsonOutputParser
 from langchain_core.messages import SystemMessage, HumanMessage
 from spec import WorkflowSpec
+from spec_cache import SPEC_CACHE, estimate_tokens
+from llm_gateway import LLM
 
-_gen_model = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
 _parser = JsonOutputParser(pydantic_object=WorkflowSpec)
 
 SYSTEM = """You convert workflow descriptions into executable DAGs.
@@ -26,9 +27,20 @@ Schema (pydantic):
 
 Return ONLY JSON that validates to this schema."""
 
-def generate_spec(description: str) -> WorkflowSpec:
+def generate_spec(description: str, use_cache: bool = True) -> WorkflowSpec:
+    """LLM description -> WorkflowSpec; use_cache=False forces a fresh generation."""
+    if use_cache:
+        cached, kind = SPEC_CACHE.lookup(description)
+        if cached is not None:
+            print(f"[SPEC_CACHE] {kind} hit")
+            return cached
+    else:
+        SPEC_CACHE.note_bypass()
+
     msg = USER_TMPL.format(desc=description, schema=WorkflowSpec.model_json_schema())
-    out = _gen_model.invoke([SystemMessage(content=SYSTEM), HumanMessage(content=msg)])
+    t0 = time.perf_counter()
+    out = LLM.invoke([SystemMessage(content=SYSTEM), HumanMessage(content=msg)])
+    latency = time.perf_counter() - t0
     parsed = _parser.parse(out.content)
     spec = WorkflowSpec(**parsed) if isinstance(parsed, dict) else parsed
     # --- normalize: ensure drafting_node is one of the node ids ---
@@ -37,5 +49,10 @@ def generate_spec(description: str) -> WorkflowSpec:
         # pick the last node as drafting fallback (or any deterministic choice)
         fallback = spec.nodes[-1].id if spec.nodes else "report"
         spec.drafting_node = fallback
+
+    usage = getattr(out, "usage_metadata", None) or {}
+    tokens_in = usage.get("input_tokens") or estimate_tokens(SYSTEM + msg)
+    tokens_out = usage.get("output_tokens") or estimate_tokens(out.content)
+    SPEC_CACHE.store(description, spec, latency, tokens_in, tokens_out)
     return spec
 
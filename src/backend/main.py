@@ -1,44 +1,53 @@
 import asyncio
 import json
-import threading
 import time
+from contextlib import asynccontextmanager
 from typing import Any, Dict, List, TypedDict
 
-from langgraph.graph import StateGraph, END
+from langchain_core.runnables import RunnableConfig
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, RedirectResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, RedirectResponse
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
-from tools_registry import HAS_OPENAI
-
-load_dotenv()
-
-# new agent-plan creation (dynamic)
-from spec import WorkflowSpec
-from generator import generate_spec
-from dynamic_graph import build_graph_from_spec
 
 import sys, os
 from pathlib import Path
 
-# Add src root to the Python path
+# Add src root to the Python path (tools_registry/generator use the shared llm_gateway)
 SRC_ROOT = Path(__file__).resolve().parents[1]
 sys.path.append(str(SRC_ROOT))
 
-# static (milestone 1/2) real-API graph
-from milestone1_sitesourcing_langgraph_real import (
-    SGState,
-    input_parser,
-    ideation_node,
-    zoning_ranker,
-    infrastructure_ranker,
-    labor_market_ranker,
-    report_aggregator,
-)
+load_dotenv()
+
+# new agent-plan creation (dynamic)
+from spec import WorkflowSpec
+from generator import generate_spec
+from spec_cache import SPEC_CACHE
+from dynamic_graph import GRAPH_CACHE, NODE_CACHE, failed_nodes
+from runs import DONE, QUEUED, RUNNING, QueueFull, Run, RunScheduler
+from events import EventBus
+from run_facts import RUN_FACTS
 
-app = FastAPI(title="Site Sourcing Agent — Milestones 2/3", version="1.0")
+# static (milestone 1/2) real-API graph
+import rate_limit
+from llm_gateway import LLM
+from checkpoints import CHECKPOINTER, thread_config
+import telemetry
+from telemetry import TELEMETRY
+from geo_cache import GEO_CACHE
+import milestone1_sitesourcing_langgraph_real as sitesourcing
+from milestone1_sitesourcing_langgraph_real import OVERPASS_SCHEDULER, SGState
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # bind the event bus up front: a run started over REST before any browser connects
+    # still gets its events into the replay history
+    bus.bind()
+    yield
+
+app = FastAPI(title="Site Sourcing Agent — Milestones 2/3", version="1.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -55,86 +64,142 @@ app.mount(
 
 @app.get("/api/health")
 def api_health():
-    return {"has_openai": HAS_OPENAI}
+    return {"has_openai": LLM.available, "osm_backend": sitesourcing.OSM_BACKEND}
+
+@app.get("/api/cache")
+def api_cache():
+    return GEO_CACHE.stats()
+
+@app.get("/api/overpass/stats")
+def api_overpass_stats():
+    return {"endpoints": OVERPASS_SCHEDULER.stats()}
+
+@app.get("/api/graph_cache")
+def api_graph_cache():
+    return {**GRAPH_CACHE.stats(), "node_cache": NODE_CACHE.stats()}
+
+@app.get("/api/llm")
+def api_llm():
+    return LLM.stats()
+
+@app.get("/api/rate_limits")
+def api_rate_limits():
+    return {"limits": rate_limit.RATE_LIMITS, "buckets": rate_limit.stats()}
+
+@app.get("/api/metrics")
+def api_metrics():
+    """Prometheus text format: run/node/call latency histograms, semaphore waits, bytes, retries, cache hits."""
+    return PlainTextResponse(TELEMETRY.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 async def root():
     return RedirectResponse(url="/ui")
 
-# ---------------- Connection manager ----------------
+# ---------------- Event bus ----------------
 
-class ConnectionManager:
-    def __init__(self):
-        self.active: List[WebSocket] = []
-        self._lock = asyncio.Lock()
+# emit() is called from node worker threads as well as the server loop; the bus
+# hops events onto the loop and fans them out to per-client bounded buffers.
+bus = EventBus(
+    client_buffer=int(os.environ.get("WS_CLIENT_BUFFER", "256")),
+    flush_interval=float(os.environ.get("WS_FLUSH_MS", "50")) / 1000.0,
+)
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        async with self._lock:
-            self.active.append(websocket)
+def emit(message: dict):
+    print("[EMIT]", message)
+    bus.publish(message)
 
-    async def disconnect(self, websocket: WebSocket):
-        async with self._lock:
-            if websocket in self.active:
-                self.active.remove(websocket)
+@app.get("/api/events/stats")
+def api_events_stats():
+    return bus.stats()
 
-    async def broadcast(self, message: dict):
-        async with self._lock:
-            conns = list(self.active)
-        dead = []
-        for ws in conns:
-            try:
-                await ws.send_text(json.dumps(message))
-            except Exception:
-                dead.append(ws)
-        if dead:
-            async with self._lock:
-                for d in dead:
-                    if d in self.active:
-                        self.active.remove(d)
+# ---------------- Run scheduler ----------------
 
-manager = ConnectionManager()
+runs = RunScheduler(
+    max_workers=int(os.environ.get("RUN_WORKERS", "4")),
+    max_queue=int(os.environ.get("RUN_QUEUE_DEPTH", "16")),
+)
 
-def emit(message: dict):
-    print("[EMIT]", message)
+def admit(kind: str, fn, meta: Dict[str, Any] | None = None, run_id: str | None = None, slots: int = 1):
+    """Queue a run; 429 with the current queue depth when the admission queue is full."""
     try:
-        asyncio.get_running_loop()
-        asyncio.create_task(manager.broadcast(message))
-    except RuntimeError:
-        asyncio.run(manager.broadcast(message))
+        r = runs.submit(kind, fn, meta, run_id, slots=slots)
+    except QueueFull as e:
+        return JSONResponse(
+            {"status": "rejected", "error": str(e), "queue_depth": e.depth, "max_queue": runs.max_queue},
+            status_code=429,
+        )
+    return JSONResponse({
+        "status": "queued" if runs.queue_position(r.id) else "started",
+        "run_id": r.id,
+        "queue_position": runs.queue_position(r.id),
+    })
+
+def run_config(r: Run, metadata: Dict[str, Any] | None = None, **configurable) -> Dict[str, Any]:
+    # nodes read the run id back from config so their events land on the right channel;
+    # the run id is also the checkpoint thread, and metadata is saved with every checkpoint
+    return {"configurable": {"thread_id": r.id, "run_id": r.id, **configurable}, "metadata": metadata or {}}
+
+async def stream_run(graph, init: Dict[str, Any], r: Run, drafting_node: str,
+                     config: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """Run the graph to completion, forwarding the drafting node's LLM tokens as report_delta events."""
+    final_state: Dict[str, Any] = {}
+    # the DAG is kept with the run's spans for /api/runs/{id}/critical_path
+    TELEMETRY.start_run(r.id, sitesourcing.graph_edges(graph), resumed=init is None)
+    with telemetry.span("run", r.kind, run_id=r.id):
+        async for mode, chunk in graph.astream(init, config=config or run_config(r), stream_mode=["messages", "values"]):
+            if mode == "values":
+                final_state = chunk
+                continue
+            msg, meta = chunk
+            delta = getattr(msg, "content", None)
+            if meta.get("langgraph_node") == drafting_node and isinstance(delta, str) and delta:
+                emit({"type": "report_delta", "run_id": r.id, "node": drafting_node, "delta": delta})
+    return final_state
 
 # ---------------- Dynamic endpoints (Milestone 3) ----------------
 
 class GeneratePayload(BaseModel):
     description: str
+    no_cache: bool = False     # force a fresh LLM generation
 
 @app.post("/api/generate")
 def api_generate(payload: GeneratePayload):
-    spec = generate_spec(payload.description)
+    spec = generate_spec(payload.description, use_cache=not payload.no_cache)
     return spec.model_dump()
 
+@app.get("/api/spec_cache")
+def api_spec_cache():
+    return SPEC_CACHE.stats()
+
 class ExecuteGeneratedPayload(BaseModel):
     prompt: str
     spec: WorkflowSpec
-
-@app.post("/api/execute_generated")
-def api_execute_generated(payload: ExecuteGeneratedPayload):
-    app_graph = build_graph_from_spec(payload.spec)
-    init = {"prompt": payload.prompt, "report_md": None}
-
-    def run():
-        emit({"type": "run_start", "ts": time.time(), "mode": "dynamic-invoke"})
+    no_cache: bool = False     # re-run every node instead of reusing memoized node results
+
+def dynamic_run(spec: WorkflowSpec, init: Dict[str, Any] | None, no_cache: bool = False,
+                resume: Dict[str, Any] | None = None):
+    """Run body for a generated workflow; init=None with resume (a checkpoint's configurable) continues one."""
+    app_graph = GRAPH_CACHE.get(spec)   # compiled once per distinct spec
+    # the spec rides along in checkpoint metadata so /resume can rebuild the graph after a restart
+    metadata = {"run_kind": "dynamic", "spec": spec.model_dump_json()}
+
+    async def run(r: Run):
+        emit({"type": "run_start", "run_id": r.id, "ts": time.time(), "mode": "dynamic-invoke",
+              **({"resumed_at": r.meta.get("resumed_at")} if resume else {})})
         report_md = None  # <-- ensure it's defined in this scope
         try:
             # Get final state deterministically
-            final_state = app_graph.invoke(init) or {}
+            final_state = await stream_run(
+                app_graph, init, r, spec.drafting_node,
+                config=run_config(r, metadata, node_cache=not no_cache, **(resume or {})),
+            ) or {}
 
             # 1) Prefer report_md set by drafting wrapper
             report_md = final_state.get("report_md")
 
             # 2) Fallback: try drafting node's own text
             if not report_md:
-                drafting = payload.spec.drafting_node
+                drafting = spec.drafting_node
                 draft = final_state.get(drafting)
                 if isinstance(draft, dict) and "text" in draft:
                     report_md = draft["text"]
@@ -146,64 +211,64 @@ def api_execute_generated(payload: ExecuteGeneratedPayload):
 
             # Collect per-node provenance AFTER we have final_state
             node_meta = {}
-            for n in payload.spec.nodes:
+            for n in spec.nodes:
                 out = final_state.get(n.id)
                 if isinstance(out, dict) and "meta" in out:
                     node_meta[n.id] = out["meta"]
 
             emit({
                 "type": "result_final",
+                "run_id": r.id,
                 "report_md": report_md,
                 "meta": node_meta,
+                "failed_nodes": failed_nodes(spec, final_state),
                 "ts": time.time()
             })
-            emit({"type": "run_end", "ts": time.time()})
+            emit({"type": "run_end", "run_id": r.id, "ts": time.time()})
+            return final_state
 
+        except asyncio.CancelledError:
+            emit({"type": "run_cancelled", "run_id": r.id, "ts": time.time()})
+            raise
         except Exception as e:
             # If anything failed before report_md was set, it still exists (None)
-            emit({"type": "run_error", "error": str(e), "ts": time.time()})
+            emit({"type": "run_error", "run_id": r.id, "error": str(e), "resumable": CHECKPOINTER is not None,
+                  "ts": time.time()})
+            raise
+
+    return run
 
-    threading.Thread(target=run, daemon=True).start()
-    return {"status": "started"}
+@app.post("/api/execute_generated")
+async def api_execute_generated(payload: ExecuteGeneratedPayload):
+    init = {"prompt": payload.prompt, "report_md": None}
+    return admit("dynamic", dynamic_run(payload.spec, init, payload.no_cache))
 
 # ---------------- Static endpoints (Milestones 1/2) ----------------
 
-def with_events(name: str, fn):
-    def wrapped(state: SGState) -> SGState:
-        emit({"type": "node_start", "node": name, "ts": time.time()})
-        out = fn(state)
-        emit({"type": "node_end", "node": name, "ts": time.time(), "writes": list(out.keys())})
+# node events keep their original names; the graph (and the node spans) use the node ids
+EVENT_NAMES = {"infra_ranker": "infrastructure_ranker", "labor_ranker": "labor_market_ranker",
+               "report": "report_aggregator"}
+
+def with_events(node_id: str, fn):
+    name = EVENT_NAMES.get(node_id, node_id)
+
+    def wrapped(state: SGState, config: RunnableConfig) -> SGState:
+        run_id = (config or {}).get("configurable", {}).get("run_id")
+        emit({"type": "node_start", "run_id": run_id, "node": name, "ts": time.time()})
+        out = fn(state, config)   # build_graph already wrapped fn in its node span
+        emit({"type": "node_end", "run_id": run_id, "node": name, "ts": time.time(), "writes": list(out.keys())})
         if "report_md" in out:
-            emit({"type": "result", "node": name, "report_md": out["report_md"], "ts": time.time()})
+            emit({"type": "result", "run_id": run_id, "node": name, "report_md": out["report_md"], "ts": time.time()})
         return out
     return wrapped
 
-def build_graph_with_events():
-    g = StateGraph(SGState)
-    g.add_node("input_parser", with_events("input_parser", input_parser))
-    g.add_node("ideation", with_events("ideation", ideation_node))
-    g.add_node("zoning_ranker", with_events("zoning_ranker", zoning_ranker))
-    g.add_node("infra_ranker", with_events("infrastructure_ranker", infrastructure_ranker))
-    g.add_node("labor_ranker", with_events("labor_market_ranker", labor_market_ranker))
-    g.add_node("report", with_events("report_aggregator", report_aggregator))
-
-    g.set_entry_point("input_parser")
-    g.add_edge("input_parser", "ideation")
-    g.add_edge("ideation", "zoning_ranker")
-    g.add_edge("ideation", "infra_ranker")
-    g.add_edge("ideation", "labor_ranker")
-    g.add_edge("zoning_ranker", "report")
-    g.add_edge("infra_ranker", "report")
-    g.add_edge("labor_ranker", "report")
-    g.add_edge("report", END)
-    return g.compile()
-
-app_graph = build_graph_with_events()
+app_graph = sitesourcing.build_graph(CHECKPOINTER, wrap=with_events)
 
 class ExecutePayload(BaseModel):
     prompt: str
     location: str | None = None
-    max_candidates: int | None = 8
+    max_candidates: int | None = 8          # stage 2: sites scored by the remote-API rankers
+    candidate_pool: int | None = None       # stage 1: sites kept by ideation (default 10; thousands ok)
 
 @app.get("/api/dag")
 async def dag():
@@ -211,6 +276,7 @@ async def dag():
         "nodes": [
             {"id": "input_parser", "label": "Input Parser", "tasks": ["Parse prompt/location", "Geocode (Nominatim)"]},
             {"id": "ideation", "label": "Ideation", "tasks": ["Overpass landuse=industrial", "Deduplicate centroids"]},
+            {"id": "prescreen", "label": "Prescreen", "tasks": ["Cheap local prescore", "Keep top max_candidates"]},
             {"id": "zoning_ranker", "label": "Zoning/Access", "tasks": ["Nearest motorway distance", "Proximity curve score"]},
             {"id": "infra_ranker", "label": "Infrastructure", "tasks": ["Power/water/telecom/pipeline scan", "Weighted log score"]},
             {"id": "labor_ranker", "label": "Labor", "tasks": ["FCC County FIPS", "BLS unemployment", "Workforce proximity"]},
@@ -218,9 +284,10 @@ async def dag():
         ],
         "edges": [
             ["input_parser", "ideation"],
-            ["ideation", "zoning_ranker"],
-            ["ideation", "infra_ranker"],
-            ["ideation", "labor_ranker"],
+            ["ideation", "prescreen"],
+            ["prescreen", "zoning_ranker"],
+            ["prescreen", "infra_ranker"],
+            ["prescreen", "labor_ranker"],
             ["zoning_ranker", "report"],
             ["infra_ranker", "report"],
             ["labor_ranker", "report"],
@@ -234,25 +301,263 @@ async def execute(payload: ExecutePayload):
         init["location"] = payload.location
     if payload.max_candidates:
         init["max_candidates"] = payload.max_candidates
+    if payload.candidate_pool:
+        init["candidate_pool"] = payload.candidate_pool
+
+    return admit("static", static_run(init), {"location": payload.location})
 
-    def run():
+def static_run(init: SGState | None, resume: Dict[str, Any] | None = None):
+    """Run body for the static graph; init=None with resume (a checkpoint's configurable) continues one."""
+    async def run(r: Run):
         try:
-            emit({"type": "run_start", "ts": time.time(), "init": init})
-            _ = app_graph.invoke(init)
-            emit({"type": "run_end", "ts": time.time()})
+            emit({"type": "run_start", "run_id": r.id, "ts": time.time(),
+                  **({"resumed_at": r.meta.get("resumed_at")} if resume else {"init": init})})
+            final_state = await stream_run(app_graph, init, r, "report",
+                                           config=run_config(r, {"run_kind": "static"}, **(resume or {})))
+            # raw measurements for /api/rescore
+            RUN_FACTS.save(r.id, sitesourcing.facts_from_state(final_state))
+            emit({"type": "run_end", "run_id": r.id, "ts": time.time()})
+            return final_state
+        except asyncio.CancelledError:
+            emit({"type": "run_cancelled", "run_id": r.id, "ts": time.time()})
+            raise
         except Exception as e:
-            emit({"type": "run_error", "error": str(e), "ts": time.time()})
+            emit({"type": "run_error", "run_id": r.id, "error": str(e), "resumable": CHECKPOINTER is not None,
+                  "ts": time.time()})
+            raise
+    return run
 
-    threading.Thread(target=run, daemon=True).start()
-    return JSONResponse({"status": "started"})
+# ---------------- Batch (many locations) ----------------
+
+class ExecuteBatchPayload(BaseModel):
+    locations: List[str]
+    prompt: str | None = None               # default: "Find industrial sites near <location>" per metro
+    max_candidates: int | None = 8
+    candidate_pool: int | None = None
+    concurrency: int | None = Field(None, ge=1)   # metros in flight at once (default BATCH_CONCURRENCY)
+    top: int = Field(25, ge=1)                    # sites in the combined report
+
+BATCH_MAX_LOCATIONS = int(os.environ.get("BATCH_MAX_LOCATIONS", "100"))
+
+@app.post("/api/execute_batch")
+async def execute_batch(payload: ExecuteBatchPayload):
+    """One run that sources sites for every location and ranks them together. Each metro runs the
+    static graph as a child run with its own id ("<batch id>.<n>"): look it up or cancel it under
+    /api/runs, subscribe to it for node events, and use it with /api/rescore, /resume and /critical_path.
+    The batch holds one worker slot per metro it runs at once."""
+    locations = sitesourcing.batch_locations(payload.locations)
+    if not locations:
+        return JSONResponse({"error": "no locations"}, status_code=400)
+    if len(locations) > BATCH_MAX_LOCATIONS:
+        return JSONResponse({"error": f"at most {BATCH_MAX_LOCATIONS} locations per batch"}, status_code=400)
+    slots = min(payload.concurrency or sitesourcing.BATCH_CONCURRENCY, len(locations), runs.max_workers)
+    return admit("batch", batch_run(locations, payload, slots), {"locations": locations}, slots=slots)
+
+def batch_run(locations: List[str], payload: ExecuteBatchPayload, slots: int):
+    async def run(r: Run):
+        try:
+            emit({"type": "run_start", "run_id": r.id, "ts": time.time(), "locations": locations})
+            centers, geo_errors = await asyncio.to_thread(sitesourcing.geocode_many, locations)
+            inits = sitesourcing.batch_inits(centers, payload.prompt, payload.candidate_pool, payload.max_candidates)
+            metros = [{"location": loc, "run_id": f"{r.id}.{i}", "center": centers.get(loc),
+                       "status": "error" if loc in geo_errors else "queued", "error": geo_errors.get(loc)}
+                      for i, loc in enumerate(locations)]
+            emit({"type": "batch_start", "run_id": r.id, "ts": time.time(), "metros": [dict(m) for m in metros]})
+
+            # the provider rate limits, semaphores and response cache are process-wide, so metros
+            # (and concurrent batches) share them; the gate only keeps the metros within the batch's slots
+            gate = asyncio.Semaphore(slots)
+            by_id = {m["run_id"]: m for m in metros}
+
+            async def one(child: Run):
+                m = by_id[child.id]
+                m["status"] = "running"
+                emit({"type": "metro_start", "run_id": r.id, "metro_run_id": child.id, "location": m["location"],
+                      "ts": time.time()})
+                try:
+                    state = await stream_run(app_graph, inits[m["location"]], child, "report",
+                                             config=run_config(child, {"run_kind": "static", "batch": r.id}))
+                except (Exception, asyncio.CancelledError) as e:
+                    cancelled = isinstance(e, asyncio.CancelledError)
+                    m.update(status="cancelled" if cancelled else "error", error=None if cancelled else str(e))
+                    emit({"type": "metro_end", "run_id": r.id, "metro_run_id": child.id, "location": m["location"],
+                          "status": m["status"], "error": m["error"], "resumable": CHECKPOINTER is not None,
+                          "ts": time.time()})
+                    raise
+                facts = sitesourcing.facts_from_state(state)
+                RUN_FACTS.save(child.id, facts)
+                m["status"] = "done"
+                emit({"type": "metro_end", "run_id": r.id, "metro_run_id": child.id, "location": m["location"],
+                      "status": "done", "ts": time.time()})
+                return facts
+
+            # children are registered runs, so a single metro can be cancelled without stopping the batch
+            children = [runs.child("static", one, {"location": m["location"], "batch": r.id}, m["run_id"], gate)
+                        for m in metros if m["status"] == "queued"]
+            await asyncio.gather(*(c.task for c in children))
+            for m in metros:
+                if m["status"] == "queued":   # cancelled before its turn at the gate
+                    m["status"] = "cancelled"
+                    emit({"type": "metro_end", "run_id": r.id, "metro_run_id": m["run_id"], "location": m["location"],
+                          "status": "cancelled", "error": None, "resumable": False, "ts": time.time()})
+            facts = [c.result for c in children if c.status == DONE]
+            ranking = sitesourcing.combine_facts(facts)
+            result = {"metros": metros, "ranking": ranking[:payload.top],
+                      "report_md": sitesourcing.combined_report(ranking, metros, payload.top)}
+            emit({"type": "batch_result", "run_id": r.id, "ts": time.time(), **result})
+            emit({"type": "run_end", "run_id": r.id, "ts": time.time()})
+            return result
+        except asyncio.CancelledError:
+            emit({"type": "run_cancelled", "run_id": r.id, "ts": time.time()})
+            raise
+        except Exception as e:
+            emit({"type": "run_error", "run_id": r.id, "error": str(e), "ts": time.time()})
+            raise
+    return run
+
+@app.get("/api/runs/{run_id}/batch")
+async def api_run_batch(run_id: str):
+    """Combined ranking and per-metro status of a finished batch run."""
+    r = runs.get(run_id)
+    if r is None or r.kind != "batch":
+        return JSONResponse({"error": "unknown batch run"}, status_code=404)
+    if r.result is None:
+        return JSONResponse({"run_id": run_id, "status": r.status, "error": r.error}, status_code=409)
+    return {"run_id": run_id, "status": r.status, **r.result}
+
+# ---------------- Rescoring ----------------
+
+class RescorePayload(BaseModel):
+    run_id: str
+    # {"combine": {"zoning","infra","labor"}, "zoning": {"compatible","proximity"},
+    #  "labor": {"unemployment","proximity"}, "infra": {<feature kind>: weight}}
+    weights: Dict[str, Dict[str, float]] = {}
+
+@app.post("/api/rescore")
+def api_rescore(payload: RescorePayload):
+    """Re-rank a finished static run with new weights from its stored measurements (no network, no LLM)."""
+    t0 = time.perf_counter()
+    facts = RUN_FACTS.load(payload.run_id)
+    if facts is None:
+        return JSONResponse({"error": "no stored measurements for this run"}, status_code=404)
+    try:
+        out = sitesourcing.rescore_facts(facts, payload.weights)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return {"run_id": payload.run_id, "location": facts.get("location"), **out,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 2)}
+
+@app.get("/api/rescore/runs")
+def api_rescore_runs():
+    return {"runs": RUN_FACTS.recent()}
+
+# ---------------- Runs ----------------
+
+@app.get("/api/runs")
+async def api_runs():
+    return {"scheduler": runs.stats(), "runs": [r.to_dict() for r in runs.runs.values()]}
+
+@app.get("/api/runs/{run_id}")
+async def api_run(run_id: str):
+    r = runs.get(run_id)
+    if r is None:
+        return JSONResponse({"error": "unknown run"}, status_code=404)
+    return {**r.to_dict(), "queue_position": runs.queue_position(run_id)}
+
+@app.post("/api/runs/{run_id}/cancel")
+async def api_run_cancel(run_id: str):
+    if runs.get(run_id) is None:
+        return JSONResponse({"error": "unknown run"}, status_code=404)
+    was_queued = bool(runs.queue_position(run_id))
+    cancelled = runs.cancel(run_id)
+    if cancelled and was_queued:
+        # running runs announce this themselves; queued ones never started their run() body
+        emit({"type": "run_cancelled", "run_id": run_id, "ts": time.time()})
+    return {"run_id": run_id, "cancelled": cancelled}
+
+async def resume_point(graph, run_id: str, spec: WorkflowSpec | None = None):
+    """Extra configurable for continuing a run (None: nothing to resume), and the nodes that run first.
+
+    A run that raised (or was cancelled) stops with nodes still pending: continue from its
+    latest checkpoint; sibling nodes that finished in that step keep their saved writes.
+    Generated workflows record tool errors in state instead of raising, so a finished one
+    is replayed from the earliest checkpoint about to run a failed node; everything after
+    it re-runs, and nodes that had succeeded come straight from the node memo cache."""
+    snap = await graph.aget_state(thread_config(run_id))
+    if snap.next:
+        return {}, list(snap.next)   # no checkpoint_id: continue the thread, keeping pending writes
+    failed = set(failed_nodes(spec, snap.values)) if spec is not None else set()
+    if not failed:
+        return None, []
+    point = None
+    async for s in graph.aget_state_history(thread_config(run_id)):   # newest first
+        if failed & set(s.next):
+            point = s
+    if point is None:
+        return None, []
+    # checkpoint_id pins an earlier step; LangGraph forks the thread from there
+    return {"checkpoint_id": point.config["configurable"]["checkpoint_id"]}, list(point.next)
+
+@app.post("/api/runs/{run_id}/resume")
+async def api_run_resume(run_id: str):
+    """Re-admit a failed/cancelled run under the same id, re-executing only the nodes that
+    didn't complete (or failed) and everything downstream of them."""
+    if CHECKPOINTER is None:
+        return JSONResponse({"error": "checkpoints are disabled (CHECKPOINT_DISABLE)"}, status_code=409)
+    prev = runs.get(run_id)
+    if prev is not None and prev.status in (QUEUED, RUNNING):
+        return JSONResponse({"error": f"run is {prev.status}"}, status_code=409)
+    latest = await CHECKPOINTER.aget_tuple(thread_config(run_id))
+    if latest is None:
+        return JSONResponse({"error": "no checkpoints for this run"}, status_code=404)
+
+    spec = None
+    if (latest.metadata or {}).get("run_kind") == "dynamic":
+        spec = WorkflowSpec.model_validate_json(latest.metadata["spec"])
+        graph = GRAPH_CACHE.get(spec)
+    else:
+        graph = app_graph
+    resume, resumed_at = await resume_point(graph, run_id, spec)
+    if resume is None:
+        return JSONResponse({"error": "nothing to resume: run finished without failed nodes"}, status_code=409)
+
+    print(f"[RESUME] {run_id} at {resumed_at}", flush=True)
+    meta = {**(prev.meta if prev is not None else {}), "resumed_at": resumed_at,
+            "resumes": (prev.meta.get("resumes", 0) if prev is not None else 0) + 1}
+    if spec is not None:
+        return admit("dynamic", dynamic_run(spec, None, resume=resume), meta, run_id)
+    return admit("static", static_run(None, resume), meta, run_id)
+
+@app.get("/api/runs/{run_id}/critical_path")
+async def api_run_critical_path(run_id: str):
+    """Where a run's wall-clock time went: the chain of nodes that gated it, each split into
+    scheduling gap, external calls (by call, with waits/bytes/retries/cache hits) and local time."""
+    cp = TELEMETRY.critical_path(run_id)
+    if cp is None:
+        return JSONResponse({"error": "no timing for this run (unknown or aged out)"}, status_code=404)
+    r = runs.get(run_id)
+    return {"status": r.status if r is not None else None, **cp}
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    """Clients only get events for runs they subscribe to:
+    /ws?run_id=<id>[,<id>...] or {"action": "subscribe"|"unsubscribe", "run_id": <id or "*">}."""
+    await bus.connect(websocket)
+    for run_id in filter(None, (websocket.query_params.get("run_id") or "").split(",")):
+        bus.subscribe(websocket, run_id)
     try:
         while True:
-            await asyncio.sleep(60)
+            try:
+                msg = json.loads(await websocket.receive_text())
+            except ValueError:
+                continue
+            if not isinstance(msg, dict) or not msg.get("run_id"):
+                continue
+            if msg.get("action") == "subscribe":
+                bus.subscribe(websocket, str(msg["run_id"]))
+            elif msg.get("action") == "unsubscribe":
+                bus.unsubscribe(websocket, str(msg["run_id"]))
     except WebSocketDisconnect:
-        await manager.disconnect(websocket)
+        await bus.disconnect(websocket)
     except Exception:
-        await manager.disconnect(websocket)
+        await bus.disconnect(websocket)
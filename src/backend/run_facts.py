@@ -0,0 +1,66 @@
+# src/backend/run_facts.py
+"""
+Per-run store of raw ranker measurements (motorway distances, infra feature
+counts, unemployment rates, distances to center) so /api/rescore can re-rank
+a finished run with new weights without touching the network.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "site-sourcing", "run_facts.sqlite")
+
+class RunFactsStore:
+    def __init__(self, path: str = DEFAULT_PATH, keep: int = 500):
+        self.path = path
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS facts ("
+                " run_id TEXT PRIMARY KEY, created REAL NOT NULL, location TEXT, payload TEXT NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def save(self, run_id: str, facts: Dict[str, Any]):
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO facts (run_id, created, location, payload) VALUES (?, ?, ?, ?)",
+                (run_id, time.time(), facts.get("location"), json.dumps(facts, separators=(",", ":"))),
+            )
+            # bounded history: keep the newest `keep` runs
+            db.execute(
+                "DELETE FROM facts WHERE run_id NOT IN (SELECT run_id FROM facts ORDER BY created DESC LIMIT ?)",
+                (self.keep,),
+            )
+            db.commit()
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db().execute("SELECT payload FROM facts WHERE run_id = ?", (run_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT run_id, created, location FROM facts ORDER BY created DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [{"run_id": r, "created": c, "location": loc} for r, c, loc in rows]
+
+RUN_FACTS = RunFactsStore(
+    path=os.environ.get("RUN_FACTS_PATH", DEFAULT_PATH),
+    keep=int(os.environ.get("RUN_FACTS_KEEP", "500")),
+)
@@ -0,0 +1,204 @@
+# src/backend/runs.py
+"""
+Run scheduler for the FastAPI server: a bounded number of graph runs execute at
+once on the server's event loop (via LangGraph's ainvoke), further runs wait in
+an admission queue of fixed depth, and anything beyond that is rejected so the
+API can answer 429 instead of piling up threads.
+
+A run can take several worker slots (a batch runs that many graphs at once), and
+child runs execute inside their parent's slots: they are listed and cancellable
+like any run but take no slot or queue place of their own.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+QUEUED, RUNNING, DONE, ERROR, CANCELLED = "queued", "running", "done", "error", "cancelled"
+
+class QueueFull(Exception):
+    def __init__(self, depth: int):
+        super().__init__(f"run queue is full ({depth} waiting)")
+        self.depth = depth
+
+class Run:
+    def __init__(self, kind: str, meta: Optional[Dict[str, Any]] = None, run_id: Optional[str] = None):
+        self.id = run_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.meta = meta or {}
+        self.status = QUEUED
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.ended: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result: Any = None
+        self.task: Optional[asyncio.Task] = None
+        self.slots = 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "ended": self.ended,
+            "error": self.error,
+            **self.meta,
+        }
+
+class RunScheduler:
+    def __init__(self, max_workers: int = 4, max_queue: int = 16, keep_finished: int = 200):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.keep_finished = keep_finished
+        self.runs: Dict[str, Run] = {}
+        self._waiting: Deque[str] = deque()
+        self._finished: Deque[str] = deque()
+        self._running = 0
+        self._used = 0     # worker slots held by running runs
+        self._cond: Optional[asyncio.Condition] = None   # created on the server loop
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def submit(self, kind: str, fn: Callable[[Run], Awaitable[Any]], meta: Optional[Dict[str, Any]] = None,
+               run_id: Optional[str] = None, slots: int = 1) -> Run:
+        """Admit a run or raise QueueFull. Must be called from the event loop.
+        Passing a finished run's id re-admits it under the same id (resume).
+        The run holds `slots` workers while it runs (capped at max_workers)."""
+        slots = max(1, min(slots, self.max_workers))
+        _, free, blocked = self._queue()
+        # the queue limit counts runs that have to wait; one that fits a free slot is always let in
+        if (blocked or slots > free) and blocked >= self.max_queue:
+            raise QueueFull(blocked)
+        run = self._register(kind, meta, run_id)
+        run.slots = slots
+        self._waiting.append(run.id)
+        run.task = asyncio.get_running_loop().create_task(self._execute(run, fn))
+        return run
+
+    def child(self, kind: str, fn: Callable[[Run], Awaitable[Any]], meta: Optional[Dict[str, Any]],
+              run_id: str, gate: asyncio.Semaphore) -> Run:
+        """Start a run inside a running parent's slots, `gate` capping how many of its children
+        run at once. Must be called from the parent's task; cancelling the parent cancels it."""
+        run = self._register(kind, meta, run_id)
+        run.slots = 0
+        run.task = asyncio.get_running_loop().create_task(self._execute(run, fn, gate))
+        return run
+
+    def _register(self, kind: str, meta: Optional[Dict[str, Any]], run_id: Optional[str]) -> Run:
+        run = Run(kind, meta, run_id)
+        if run.id in self._finished:
+            self._finished.remove(run.id)
+        self.runs[run.id] = run
+        return run
+
+    async def _acquire(self, run: Run):
+        # first come, first served: a run waits for the ones ahead of it even if it would fit
+        # now, so a wide batch isn't starved by a stream of single runs
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self._waiting[0] == run.id and self._used + run.slots <= self.max_workers)
+            self._waiting.popleft()
+            self._used += run.slots
+            self._running += 1
+            cond.notify_all()
+
+    async def _release(self, run: Run):
+        cond = self._condition()
+        async with cond:
+            self._used -= run.slots
+            self._running -= 1
+            cond.notify_all()
+
+    async def _execute(self, run: Run, fn: Callable[[Run], Awaitable[Any]],
+                       gate: Optional[asyncio.Semaphore] = None):
+        try:
+            if gate is not None:
+                await gate.acquire()
+            else:
+                await self._acquire(run)
+            run.status = RUNNING
+            run.started = time.time()
+            try:
+                run.result = await fn(run)
+                run.status = DONE
+            finally:
+                if gate is not None:
+                    gate.release()
+                else:
+                    await asyncio.shield(self._release(run))
+        except asyncio.CancelledError:
+            run.status = CANCELLED
+        except Exception as e:
+            run.status = ERROR
+            run.error = str(e)
+        finally:
+            if run.id in self._waiting:
+                self._waiting.remove(run.id)
+                self._wake()
+            run.ended = time.time()
+            self._retire(run)
+
+    def _wake(self):
+        # a cancelled run left the queue: whoever is now at its head may be able to start
+        async def notify():
+            async with self._condition():
+                self._condition().notify_all()
+        asyncio.get_running_loop().create_task(notify())
+
+    def _retire(self, run: Run):
+        # keep a bounded history of finished runs for /api/runs lookups
+        self._finished.append(run.id)
+        while len(self._finished) > self.keep_finished:
+            self.runs.pop(self._finished.popleft(), None)
+
+    def queue_position(self, run_id: str) -> Optional[int]:
+        """1-based position among runs waiting for a worker, 0 if running/finished (or about to
+        start: a just-submitted run sits in _waiting until its task gets going), None if unknown."""
+        if run_id not in self.runs:
+            return None
+        return self._queue()[0].get(run_id, 0)
+
+    def _queue(self) -> Tuple[Dict[str, int], int, int]:
+        """({waiting run: queue position}, slots left over, runs that have to wait)."""
+        free, blocked, positions = self.max_workers - self._used, 0, {}
+        for rid in self._waiting:
+            slots = self.runs[rid].slots
+            if not blocked and slots <= free:
+                free -= slots       # fits now, starts once its task runs
+                positions[rid] = 0
+            else:
+                blocked += 1
+                positions[rid] = blocked
+        return positions, free, blocked
+
+    def get(self, run_id: str) -> Optional[Run]:
+        return self.runs.get(run_id)
+
+    def cancel(self, run_id: str) -> bool:
+        """Cancel a queued or running run. A node already executing in a worker thread
+        finishes its current call, but no further nodes are scheduled."""
+        run = self.runs.get(run_id)
+        if run is None or run.task is None or run.task.done():
+            return False
+        run.task.cancel()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for r in self.runs.values():
+            counts[r.status] = counts.get(r.status, 0) + 1
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": self._running,
+            "slots_in_use": self._used,
+            "waiting": len(self._waiting),
+            "by_status": counts,
+        }
@@ -5,6 +5,11 @@ from typing import List, Dict, Any, Tuple, Optional
 class ToolSpec(BaseModel):
     name: str = Field(..., description="Tool id from ToolRegistry, e.g. 'llm' or 'geocode'")
     params: Dict[str, Any] | None = None
+    id: Optional[str] = Field(None, description="Key for this call's output and for depends_on; defaults to name")
+    depends_on: Optional[List[str]] = Field(
+        None, description="ids of tools in this node whose output this one needs. Setting it on any tool runs "
+                          "the node's tools as a dependency graph (independent ones in parallel); otherwise in order"
+    )
 
 class NodeSpec(BaseModel):
     id: str
@@ -13,6 +18,7 @@ class NodeSpec(BaseModel):
     prompt: str = Field(..., description="Instruction the node sends to its tool(s)")
     tasks: List[str] = Field(default_factory=list)
     tools: List[ToolSpec] = Field(default_factory=list)
+    max_concurrency: Optional[int] = Field(None, description="Cap on tools running at once in this node")
 
 class WorkflowSpec(BaseModel):
     nodes: List[NodeSpec]
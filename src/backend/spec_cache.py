@@ -0,0 +1,185 @@
+# src/backend/spec_cache.py
+"""
+Cache for generator.generate_spec: repeated workflow descriptions return the
+previously validated WorkflowSpec instead of another gpt-4o-mini call.
+
+Lookups go exact text -> normalized text (case / whitespace / punctuation) ->
+optional embedding similarity. The embedding backend is local: hashed word and
+character n-grams, so nothing leaves the process. Entries expire after a TTL
+and the least recently used are evicted past max_entries. Every hit adds the
+original generation's latency and token cost to the "saved" counters.
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from spec import WorkflowSpec
+
+# USD per 1M tokens (gpt-4o-mini list price); override when the model changes
+PRICE_IN_PER_M = float(os.environ.get("SPEC_CACHE_PRICE_IN", "0.15"))
+PRICE_OUT_PER_M = float(os.environ.get("SPEC_CACHE_PRICE_OUT", "0.60"))
+
+# -----------------------------
+# Normalization / embeddings
+# -----------------------------
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def hashed_embedding(text: str, dim: int = 512) -> np.ndarray:
+    """Feature-hashed bag of word uni/bigrams and char trigrams, L2-normalized."""
+    words = normalize_text(text).split()
+    feats = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"#{w}#"
+        feats += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    vec = np.zeros(dim)
+    for f in feats:
+        h = int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 63) & 1 else -1.0
+    n = np.linalg.norm(vec)
+    return vec / n if n else vec
+
+def estimate_tokens(text: str) -> int:
+    try:
+        import tiktoken
+        return len(tiktoken.encoding_for_model("gpt-4o-mini").encode(text))
+    except Exception:
+        return max(1, len(text) // 4)   # tiktoken missing or can't fetch its BPE files offline
+
+# -----------------------------
+# Cache
+# -----------------------------
+
+class _Entry:
+    def __init__(self, spec: Dict[str, Any], norm: str, vector: Optional[np.ndarray],
+                 latency_s: float, tokens_in: int, tokens_out: int):
+        self.spec = spec
+        self.norm = norm
+        self.vector = vector
+        self.latency_s = latency_s
+        self.tokens_in = tokens_in
+        self.tokens_out = tokens_out
+        self.created = time.time()
+
+class SpecCache:
+    def __init__(self, max_entries: int = 256, ttl_s: float = 7 * 86400, enabled: bool = True,
+                 embeddings: str = "off", similarity: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.enabled = enabled
+        self.embeddings = embeddings          # "off" | "hashed"
+        self.similarity = similarity
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()   # normalized-text digest -> entry
+        self._exact: Dict[str, str] = {}                           # raw-text digest -> normalized digest
+        self._lock = threading.Lock()
+        self.counts = {"exact": 0, "normalized": 0, "semantic": 0, "miss": 0, "bypass": 0, "expired": 0, "evicted": 0}
+        self.saved_latency_s = 0.0
+        self.saved_tokens = 0
+        self.saved_usd = 0.0
+
+    def _expired(self, e: _Entry) -> bool:
+        return self.ttl_s > 0 and time.time() - e.created > self.ttl_s
+
+    def _drop(self, key: str):
+        self._entries.pop(key, None)
+        for raw in [r for r, k in self._exact.items() if k == key]:
+            del self._exact[raw]
+
+    def _hit(self, key: str, kind: str) -> WorkflowSpec:
+        e = self._entries[key]
+        self._entries.move_to_end(key)
+        self.counts[kind] += 1
+        self.saved_latency_s += e.latency_s
+        self.saved_tokens += e.tokens_in + e.tokens_out
+        self.saved_usd += (e.tokens_in * PRICE_IN_PER_M + e.tokens_out * PRICE_OUT_PER_M) / 1e6
+        return WorkflowSpec.model_validate(e.spec)   # fresh copy; callers may mutate it
+
+    def lookup(self, description: str) -> Tuple[Optional[WorkflowSpec], str]:
+        """(spec, kind) where kind is exact / normalized / semantic / miss / disabled."""
+        if not self.enabled:
+            return None, "disabled"
+        raw_key = _digest(description)
+        norm = normalize_text(description)
+        key = _digest(norm)
+        with self._lock:
+            for k in list(self._entries):
+                if self._expired(self._entries[k]):
+                    self._drop(k)
+                    self.counts["expired"] += 1
+            if self._exact.get(raw_key) in self._entries:
+                return self._hit(self._exact[raw_key], "exact"), "exact"
+            if key in self._entries:
+                return self._hit(key, "normalized"), "normalized"
+            if self.embeddings == "hashed" and self._entries:
+                vec = hashed_embedding(description)
+                keys = [k for k, e in self._entries.items() if e.vector is not None]
+                if keys:
+                    sims = np.stack([self._entries[k].vector for k in keys]) @ vec
+                    best = int(np.argmax(sims))
+                    if sims[best] >= self.similarity:
+                        return self._hit(keys[best], "semantic"), "semantic"
+            self.counts["miss"] += 1
+            return None, "miss"
+
+    def store(self, description: str, spec: WorkflowSpec, latency_s: float, tokens_in: int, tokens_out: int):
+        if not self.enabled:
+            return
+        norm = normalize_text(description)
+        key = _digest(norm)
+        vec = hashed_embedding(description) if self.embeddings == "hashed" else None
+        with self._lock:
+            self._entries[key] = _Entry(spec.model_dump(mode="json"), norm, vec, latency_s, tokens_in, tokens_out)
+            self._entries.move_to_end(key)
+            self._exact[_digest(description)] = key
+            while len(self._entries) > self.max_entries:
+                old = next(iter(self._entries))
+                self._drop(old)
+                self.counts["evicted"] += 1
+
+    def note_bypass(self):
+        with self._lock:
+            self.counts["bypass"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._exact.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.counts["exact"] + self.counts["normalized"] + self.counts["semantic"]
+            total = hits + self.counts["miss"]
+            return {
+                "enabled": self.enabled,
+                "embeddings": self.embeddings,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                **self.counts,
+                "hit_rate": round(hits / total, 3) if total else None,
+                "saved_latency_s": round(self.saved_latency_s, 3),
+                "saved_tokens": self.saved_tokens,
+                "saved_usd": round(self.saved_usd, 6),
+            }
+
+SPEC_CACHE = SpecCache(
+    max_entries=int(os.environ.get("SPEC_CACHE_MAX", "256")),
+    ttl_s=float(os.environ.get("SPEC_CACHE_TTL_S", str(7 * 86400))),
+    enabled=not os.environ.get("SPEC_CACHE_DISABLE"),
+    embeddings=os.environ.get("SPEC_CACHE_EMBEDDINGS", "off"),
+    similarity=float(os.environ.get("SPEC_CACHE_SIMILARITY", "0.95")),
+)
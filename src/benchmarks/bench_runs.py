@@ -0,0 +1,199 @@
+# src/benchmarks/bench_runs.py
+"""
+End-to-end graph benchmark against local stand-ins (replay_server.py) instead
+of the public APIs, so runs are repeatable and changes can be compared.
+
+Runs the static graph from build_graph() at several candidate counts and a
+generated WorkflowSpec graph at several fan-out widths, each at several
+concurrency levels, and reports p50/p95 run latency, throughput and peak
+traced memory per scenario.
+
+    # record real answers once (needs network; BLS_API_KEY/OPENAI_API_KEY as usual)
+    python src/benchmarks/bench_runs.py --record --fixtures src/benchmarks/fixtures/phoenix.jsonl --sizes 10 100
+    # replay them, with latency/errors injected
+    python src/benchmarks/bench_runs.py --fixtures src/benchmarks/fixtures/phoenix.jsonl \\
+        --latency-ms 40 --latency overpass=300 --error-rate fcc=0.02 --concurrency 1 8 --json out.json
+
+Without --fixtures every request is answered with deterministic synthetic data.
+The response caches and the node memo cache are off unless --warm-cache, so
+each run pays for its calls; the stand-ins have no rate limits unless
+--provider-limits (which applies the real providers' token buckets to them).
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+SRC_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(SRC_ROOT))
+sys.path.append(str(SRC_ROOT / "backend"))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from replay_server import UPSTREAMS, add_standin_args, standins_from_args  # noqa: E402
+
+def percentile(values: List[float], q: float) -> float | None:
+    if not values:
+        return None
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+def workflow_spec(width: int) -> Dict[str, Any]:
+    """plan -> `width` parallel llm workers -> report (the shape /api/generate tends to produce)."""
+    workers = [{"id": f"worker_{i}", "label": f"Worker {i}", "prompt": f"Assess factor {i} for the site shortlist",
+                "tasks": ["assess"], "tools": [{"name": "llm"}]} for i in range(width)]
+    return {
+        "nodes": [{"id": "plan", "label": "Plan", "prompt": "Plan the site assessment", "tasks": ["plan"],
+                   "tools": [{"name": "llm"}]}]
+                 + workers
+                 + [{"id": "report", "label": "Report", "prompt": "Draft the report", "tasks": ["draft"],
+                     "tools": [{"name": "llm"}]}],
+        "edges": [["plan", w["id"]] for w in workers] + [[w["id"], "report"] for w in workers],
+        "drafting_node": "report",
+    }
+
+def run_scenario(name: str, size: int, concurrency: int, rounds: int, one_run: Callable[[], Any],
+                 trace_memory: bool) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+
+    def timed():
+        t0 = time.perf_counter()
+        try:
+            one_run()
+            latencies.append(time.perf_counter() - t0)
+        except Exception as e:
+            key = f"{type(e).__name__}: {str(e)[:80]}"
+            errors[key] = errors.get(key, 0) + 1
+
+    if trace_memory:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(rounds):
+            list(pool.map(lambda _: timed(), range(concurrency)))
+    wall = time.perf_counter() - t0
+    peak_mb = (tracemalloc.get_traced_memory()[1] - base) / 1e6 if trace_memory else None
+
+    runs = rounds * concurrency
+    return {
+        "graph": name, "size": size, "concurrency": concurrency, "runs": runs, "ok": len(latencies),
+        "p50_s": percentile(latencies, 0.5), "p95_s": percentile(latencies, 0.95),
+        "mean_s": statistics.fmean(latencies) if latencies else None,
+        "throughput_rps": len(latencies) / wall if wall else None, "wall_s": wall,
+        "peak_traced_mb": peak_mb, "errors": errors,
+    }
+
+def fmt(v: float | None, spec: str) -> str:
+    return format(v, spec) if v is not None else "-".rjust(int(spec.split(".")[0]))
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline end-to-end benchmark for the static and generated graphs")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000],
+                    help="static graph: candidates (candidate_pool = max_candidates)")
+    ap.add_argument("--widths", type=int, nargs="+", default=[1, 10, 100],
+                    help="generated graph: parallel worker nodes between plan and report")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 8], help="runs in flight at once")
+    ap.add_argument("--rounds", type=int, default=3, help="batches of `concurrency` runs per scenario")
+    ap.add_argument("--warmup", type=int, default=1, help="unmeasured runs before each scenario")
+    ap.add_argument("--location", type=str, default="Phoenix, AZ")
+    ap.add_argument("--no-static", action="store_true")
+    ap.add_argument("--no-dynamic", action="store_true")
+    ap.add_argument("--record", action="store_true", help="proxy to the real APIs and append answers to --fixtures")
+    ap.add_argument("--warm-cache", action="store_true", help="keep the response/node caches on")
+    ap.add_argument("--provider-limits", action="store_true", help="apply the real providers' rate limits to the stand-ins")
+    ap.add_argument("--no-tracemalloc", action="store_true", help="skip peak-memory tracing (it slows allocation-heavy runs)")
+    ap.add_argument("--json", type=str, default=None, help="also write the results here")
+    add_standin_args(ap)
+    args = ap.parse_args()
+    if args.record and not args.fixtures:
+        ap.error("--record needs --fixtures")
+    if args.record:
+        args.rounds, args.warmup, args.concurrency = 1, 0, [1]   # one pass is enough to capture the answers
+
+    standins = standins_from_args(args, "record" if args.record else "replay")
+    # the app reads these at import time, so set them before importing it
+    os.environ.update(standins.env())
+    if not args.record:
+        os.environ.setdefault("OPENAI_API_KEY", "replay")
+    os.environ["CHECKPOINT_PATH"] = ":memory:"
+    if not args.warm_cache:
+        os.environ["GEO_CACHE_DISABLE"] = "1"
+        os.environ["NODE_CACHE_DISABLE"] = "1"
+
+    import rate_limit
+    import milestone1_sitesourcing_langgraph_real as sitesourcing
+    from checkpoints import thread_config
+    from dynamic_graph import GRAPH_CACHE
+    from spec import WorkflowSpec
+
+    if args.provider_limits:
+        from urllib.parse import urlsplit
+        for service, real in UPSTREAMS.items():
+            lim = rate_limit.RATE_LIMITS.get(urlsplit(real).hostname or "")
+            if lim:
+                rate_limit.configure(urlsplit(standins.url(service)).hostname, lim["rate"], lim["burst"])
+
+    scenarios = []
+    if not args.no_static:
+        app = sitesourcing.build_graph()
+        for n in args.sizes:
+            init = {"prompt": f"Find industrial sites near {args.location}", "location": args.location,
+                    "candidate_pool": n, "max_candidates": n}
+            scenarios.append(("static", n, lambda init=init: app.invoke(
+                dict(init), config=thread_config(uuid.uuid4().hex))))
+    if not args.no_dynamic:
+        for w in args.widths:
+            graph = GRAPH_CACHE.get(WorkflowSpec(**workflow_spec(w)))   # compile outside the timed runs
+            scenarios.append(("generated", w, lambda graph=graph: graph.invoke(
+                {"prompt": f"Assess industrial sites near {args.location}", "report_md": None},
+                config=thread_config(uuid.uuid4().hex, node_cache=args.warm_cache))))
+
+    trace = not args.no_tracemalloc
+    if trace:
+        tracemalloc.start()
+    results = []
+    out = sys.stdout
+    # the nodes print a line per candidate; send that to /dev/null for the whole loop
+    # (redirecting per run would race between the worker threads)
+    devnull = open(os.devnull, "w")
+    sys.stdout = devnull
+    print(f"{'graph':>9} {'size':>5} {'conc':>4} {'ok/runs':>8} {'p50 s':>8} {'p95 s':>8} {'runs/s':>7} {'peak MB':>8}  errors", file=out)
+    for name, size, fn in scenarios:
+        for _ in range(args.warmup):
+            try:
+                fn()
+            except Exception:
+                pass
+        for conc in args.concurrency:
+            r = run_scenario(name, size, conc, args.rounds, fn, trace)
+            results.append(r)
+            print(f"{name:>9} {size:>5} {conc:>4} {r['ok']:>3}/{r['runs']:<4} {fmt(r['p50_s'], '8.3f')} "
+                  f"{fmt(r['p95_s'], '8.3f')} {fmt(r['throughput_rps'], '7.2f')} {fmt(r['peak_traced_mb'], '8.1f')}  "
+                  + ("; ".join(f"{k} x{v}" for k, v in r["errors"].items()) or "-"), file=out, flush=True)
+    sys.stdout = out
+    devnull.close()
+
+    maxrss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 if sys.platform != "darwin" else 1024 * 1024)
+    print(f"\nprocess max RSS: {maxrss_mb:.0f} MB")
+    print("stand-in requests:", json.dumps(standins.stats()))
+    if args.record:
+        print(f"fixtures: {len(standins.state.fixtures.entries)} in {args.fixtures}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results, "max_rss_mb": maxrss_mb,
+                       "standins": standins.stats()}, f, indent=2)
+    standins.shutdown()
+
+if __name__ == "__main__":
+    main()
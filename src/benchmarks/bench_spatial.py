@@ -0,0 +1,96 @@
+# src/benchmarks/bench_spatial.py
+"""
+Synthetic point-cloud benchmark for the spatial helpers in geo_utils.
+
+Compares the original pure-Python loops (O(n^2) centroid dedup, per-pair
+haversine, per-element `around` test) with the grid / NumPy versions used by
+the nodes, and checks both give the same answer.
+
+    python src/benchmarks/bench_spatial.py --sizes 1000 5000 20000
+"""
+
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+SRC_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(SRC_ROOT))
+
+from geo_utils import (  # noqa: E402
+    ElementIndex,
+    element_within_km,
+    grid_dedup,
+    haversine_km,
+    haversine_km_many,
+)
+
+CENTER = (33.4484, -112.0740)  # Phoenix
+
+def cloud(n: int, spread_deg: float = 0.25, seed: int = 0):
+    rnd = random.Random(seed)
+    return [(CENTER[0] + rnd.uniform(-spread_deg, spread_deg), CENTER[1] + rnd.uniform(-spread_deg, spread_deg))
+            for _ in range(n)]
+
+def ways(n: int, seed: int = 1):
+    rnd = random.Random(seed)
+    out = []
+    for i, (lat, lon) in enumerate(cloud(n, 0.4, seed)):
+        geom = [{"lat": lat + rnd.uniform(-0.03, 0.03), "lon": lon + rnd.uniform(-0.03, 0.03)}
+                for _ in range(rnd.randint(2, 12))]
+        out.append({"type": "way", "id": i, "geometry": geom})
+    return out
+
+def naive_dedup(points, min_km, limit=None):
+    kept = []
+    for p in points:
+        if all(haversine_km(p, u) > min_km for u in kept):
+            kept.append(p)
+            if limit is not None and len(kept) >= limit:
+                break
+    return kept
+
+def timed(fn, *args, **kw):
+    t0 = time.perf_counter()
+    out = fn(*args, **kw)
+    return out, time.perf_counter() - t0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    ap.add_argument("--dedup-km", type=float, default=0.5)
+    ap.add_argument("--naive-max", type=int, default=5000, help="skip the O(n^2) baseline above this size")
+    args = ap.parse_args()
+
+    print(f"{'n':>7} | {'dedup naive':>12} {'dedup grid':>11} {'kept':>6} | "
+          f"{'dist loop':>10} {'dist numpy':>11} | {'around loop':>12} {'around index':>13}")
+    for n in args.sizes:
+        pts = cloud(n)
+
+        if n <= args.naive_max:
+            ref, t_naive = timed(naive_dedup, pts, args.dedup_km)
+        else:
+            ref, t_naive = None, None
+        got, t_grid = timed(grid_dedup, pts, args.dedup_km)
+        if ref is not None:
+            assert ref == got, "grid dedup diverged from the O(n^2) baseline"
+
+        d_loop, t_loop = timed(lambda: [haversine_km(CENTER, p) for p in pts])
+        d_np, t_np = timed(haversine_km_many, CENTER, pts)
+        assert max(abs(a - b) for a, b in zip(d_loop, d_np.tolist())) < 1e-9
+
+        els = ways(min(n, 2000))
+        probes = pts[:20]
+        a_loop, t_around_loop = timed(lambda: [[element_within_km(el, p, 10.0) for el in els] for p in probes])
+        index, t_build = timed(ElementIndex, els)
+        a_idx, t_around_idx = timed(lambda: [index.within(p, 10.0).tolist() for p in probes])
+        assert a_loop == a_idx
+
+        naive_col = f"{t_naive:>11.4f}s" if t_naive is not None else f"{'skipped':>12}"
+        print(f"{n:>7} | {naive_col} {t_grid:>10.4f}s {len(got):>6} | "
+              f"{t_loop:>9.4f}s {t_np:>10.4f}s | {t_around_loop:>11.4f}s {t_build + t_around_idx:>12.4f}s")
+
+if __name__ == "__main__":
+    main()
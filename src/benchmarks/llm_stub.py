@@ -0,0 +1,157 @@
+# src/benchmarks/llm_stub.py
+"""
+Minimal OpenAI-compatible chat-completions server for exercising the LLM
+gateway offline (tests, benchmarks, demos without a key).
+
+    python src/benchmarks/llm_stub.py --port 8099 --latency-ms 400
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 uvicorn main:app   # from src/backend
+
+Replies echo a short digest of the last user message. Both plain and
+`stream: true` (SSE) requests are supported. With --spec, replies are a fixed
+valid WorkflowSpec JSON, so /api/generate works too.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+STUB_SPEC = {
+    "nodes": [
+        {"id": "research", "label": "Research", "prompt": "Collect facts", "tasks": ["collect"], "tools": [{"name": "llm"}]},
+        {"id": "analysis", "label": "Analysis", "prompt": "Analyse facts", "tasks": ["analyse"], "tools": [{"name": "llm"}]},
+        {"id": "report", "label": "Report", "prompt": "Draft the report", "tasks": ["draft"], "tools": [{"name": "llm"}]},
+    ],
+    "edges": [["research", "analysis"], ["analysis", "report"]],
+    "drafting_node": "report",
+}
+
+def _reply_text(body: Dict[str, Any], spec_mode: bool) -> str:
+    if spec_mode:
+        return json.dumps(STUB_SPEC)
+    msgs = body.get("messages") or []
+    last = next((m.get("content") for m in reversed(msgs) if m.get("role") == "user"), "") or ""
+    if not isinstance(last, str):
+        last = json.dumps(last)
+    first_line = last.strip().splitlines()[0][:120] if last.strip() else ""
+    return f"# Stub report\n\nReceived {len(last)} chars. First line: {first_line}\n\n- point one\n- point two\n"
+
+class StubState:
+    def __init__(self, latency_s: float, token_delay_s: float, spec_mode: bool):
+        self.latency_s = latency_s
+        self.token_delay_s = token_delay_s
+        self.spec_mode = spec_mode
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _json(self, code: int, payload: Dict[str, Any]):
+            raw = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self._json(200, {"requests": state.requests, "in_flight": state.in_flight,
+                                 "max_in_flight": state.max_in_flight})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._json(404, {"error": {"message": "only /v1/chat/completions is stubbed"}})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            with state.lock:
+                state.requests += 1
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+            try:
+                time.sleep(state.latency_s)
+                text = _reply_text(body, state.spec_mode)
+                cid = "chatcmpl-" + uuid.uuid4().hex[:12]
+                model = body.get("model", "stub")
+                usage = {"prompt_tokens": sum(len(str(m.get("content", ""))) for m in body.get("messages", [])) // 4,
+                         "completion_tokens": len(text) // 4}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                if body.get("stream"):
+                    self._stream(cid, model, text, usage if (body.get("stream_options") or {}).get("include_usage") else None)
+                else:
+                    self._json(200, {
+                        "id": cid, "object": "chat.completion", "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                        "usage": usage,
+                    })
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+        def _stream(self, cid: str, model: str, text: str, usage: Optional[Dict[str, int]]):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            def chunk(delta: Dict[str, Any], finish: Optional[str] = None, **extra):
+                payload = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                           "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **extra}
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            chunk({"role": "assistant", "content": ""})
+            for i in range(0, len(text), 8):
+                chunk({"content": text[i:i + 8]})
+                if state.token_delay_s:
+                    time.sleep(state.token_delay_s)
+            chunk({}, "stop")
+            if usage:
+                payload = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+                           "model": model, "choices": [], "usage": usage}
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+def serve(port: int = 8099, latency_ms: float = 200.0, token_delay_ms: float = 5.0, spec_mode: bool = False,
+          host: str = "127.0.0.1"):
+    """Start the stub in a daemon thread; returns (server, state). server.server_address has the bound port."""
+    state = StubState(latency_ms / 1000.0, token_delay_ms / 1000.0, spec_mode)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    return server, state
+
+def main():
+    ap = argparse.ArgumentParser(description="OpenAI-compatible stub for the LLM gateway")
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--latency-ms", type=float, default=200.0)
+    ap.add_argument("--token-delay-ms", type=float, default=5.0)
+    ap.add_argument("--spec", action="store_true", help="answer every request with a valid WorkflowSpec JSON")
+    args = ap.parse_args()
+    server, _ = serve(args.port, args.latency_ms, args.token_delay_ms, args.spec)
+    print(f"LLM stub on http://127.0.0.1:{server.server_address[1]}/v1 (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
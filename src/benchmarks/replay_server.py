@@ -0,0 +1,429 @@
+# src/benchmarks/replay_server.py
+"""
+Local stand-ins for Nominatim, Overpass (three mirrors), FCC, BLS and the
+OpenAI chat API, so graph runs can be timed without the public services.
+
+    record   proxy every request to the real service once and append the answer
+             to a JSONL fixture file
+    replay   answer from the fixtures, with injected latency and error rates;
+             misses get deterministic synthetic data (--strict: 404 instead)
+
+Each service listens on its own loopback address (127.0.0.2, .3, ...), so
+http_pool keeps applying per-host retry settings as it does for the real
+hosts. Pass --single-host on systems where only 127.0.0.1 is routable.
+LLM requests without a recorded answer are served like benchmarks/llm_stub.py.
+
+    python src/benchmarks/replay_server.py record --fixtures fx/phoenix.jsonl
+    python src/benchmarks/replay_server.py replay --fixtures fx/phoenix.jsonl --latency-ms 50 \\
+        --latency overpass=400 --error-rate fcc=0.05
+    # then export the printed env vars and run the CLI / uvicorn as usual
+
+bench_runs.py starts these in-process; see its docstring.
+"""
+
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+SRC_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(SRC_ROOT))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from llm_stub import _reply_text  # noqa: E402
+
+# service -> real endpoint (record mode) and the path the stand-in serves it on
+UPSTREAMS: Dict[str, str] = {
+    "nominatim": "https://nominatim.openstreetmap.org/search",
+    "overpass1": "https://overpass-api.de/api/interpreter",
+    "overpass2": "https://overpass.kumi.systems/api/interpreter",
+    "overpass3": "https://overpass.openstreetmap.ru/api/interpreter",
+    "fcc": "https://geo.fcc.gov/api/census/block/find",
+    "bls": "https://api.bls.gov/publicAPI/v2/timeseries/data/",
+    "openai": "https://api.openai.com/v1/chat/completions",
+}
+
+def _family(service: str) -> str:
+    # mirrors share fixtures, latency and error settings
+    return "overpass" if service.startswith("overpass") else service
+
+# -----------------------------
+# Fixtures
+# -----------------------------
+
+def request_key(service: str, query: str, body: bytes, content_type: str) -> str:
+    """Stable key for a request: the parameters that decide the answer, nothing transport-level."""
+    fam = _family(service)
+    if fam == "openai":
+        js = json.loads(body or b"{}")
+        parts: Any = {"model": js.get("model"), "messages": js.get("messages")}
+    elif "json" in content_type:
+        js = json.loads(body or b"{}")
+        js.pop("registrationkey", None)   # BLS key must not end up in fixtures
+        parts = js
+    else:
+        parts = sorted(parse_qsl(body.decode("utf-8"))) if body else []
+    raw = json.dumps({"service": fam, "query": sorted(parse_qsl(query)), "body": parts}, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+class Fixtures:
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if path and Path(path).exists():
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        e = json.loads(line)
+                        self.entries[e["key"]] = e
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    def add(self, entry: Dict[str, Any]):
+        with self._lock:
+            if entry["key"] in self.entries:
+                return
+            self.entries[entry["key"]] = entry
+            if self.path:
+                Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+# -----------------------------
+# Synthetic answers (replay misses)
+# -----------------------------
+
+_NUM = r"(-?\d+(?:\.\d+)?)"
+KNOWN_PLACES = {"phoenix": (33.4484, -112.0740), "houston": (29.7604, -95.3698), "chicago": (41.8781, -87.6298),
+                "atlanta": (33.7490, -84.3880), "dallas": (32.7767, -96.7970), "reno": (39.5296, -119.8138),
+                # neighbours, for batch runs whose metros share ranker queries
+                "mesa": (33.4152, -111.8315), "scottsdale": (33.4942, -111.9261), "fort worth": (32.7555, -97.3308)}
+INFRA_TAGS = [{"power": "substation"}, {"power": "generator"}, {"man_made": "water_tower"}, {"man_made": "mast"},
+              {"man_made": "communications_tower"}, {"pipeline": "substance"}]
+
+def _rng(key: str, seed: int) -> random.Random:
+    return random.Random(int(key[:12], 16) ^ seed)
+
+def _bbox_km2(s: float, w: float, n: float, e: float) -> float:
+    return abs(n - s) * 111.0 * abs(e - w) * 111.0 * math.cos(math.radians((s + n) / 2))
+
+def synthesize(service: str, query: str, body: bytes, key: str, seed: int) -> Tuple[int, Any]:
+    fam, rnd = _family(service), _rng(key, seed)
+    params = dict(parse_qsl(query))
+    if fam == "nominatim":
+        q = params.get("q", "").lower()
+        lat, lon = next((v for k, v in KNOWN_PLACES.items() if k in q),
+                        (rnd.uniform(30.0, 45.0), rnd.uniform(-120.0, -80.0)))
+        return 200, [{"lat": str(lat), "lon": str(lon), "display_name": params.get("q", "")}]
+    if fam == "fcc":
+        lat, lon = float(params.get("latitude", 0)), float(params.get("longitude", 0))
+        cell = int(math.floor(lat * 4)) * 1000 + int(math.floor(lon * 4))   # ~25 km "counties"
+        fips = f"{4 + cell % 50:02d}{(cell * 7) % 999 + 1:03d}"
+        return 200, {"County": {"FIPS": fips, "name": f"County {fips}"}, "State": {"FIPS": fips[:2]}, "status": "OK"}
+    if fam == "bls":
+        ids = json.loads(body or b"{}").get("seriesid") or []
+        series = [{"seriesID": s, "data": [{"year": "2025", "period": "M08", "periodName": "August",
+                                            "value": f"{2.5 + (int(hashlib.sha1(s.encode()).hexdigest()[:6], 16) % 55) / 10:.1f}"}]}
+                  for s in ids]
+        return 200, {"status": "REQUEST_SUCCEEDED", "Results": {"series": series}}
+    if fam == "overpass":
+        q = dict(parse_qsl(body.decode("utf-8"))).get("data", "") if body else params.get("data", "")
+        m = re.search(rf"around:(\d+),{_NUM},{_NUM}", q)
+        if m and "industrial" in q:
+            radius_km, lat0, lon0 = int(m.group(1)) / 1000.0, float(m.group(2)), float(m.group(3))
+            limit = int((re.search(r"out center (\d+)", q) or [None, "100"])[1])
+            els = []
+            for i in range(limit):
+                r, a = radius_km * math.sqrt(rnd.random()), rnd.uniform(0, 2 * math.pi)
+                lat = lat0 + (r * math.cos(a)) / 111.0
+                lon = lon0 + (r * math.sin(a)) / (111.0 * math.cos(math.radians(lat0)))
+                els.append({"type": "way", "id": 10_000_000 + i, "center": {"lat": lat, "lon": lon},
+                            "tags": {"landuse": "industrial"}})
+            return 200, {"elements": els}
+        m = re.search(rf"\({_NUM},{_NUM},{_NUM},{_NUM}\)", q)
+        if not m:
+            return 200, {"elements": []}
+        s, w, n, e = (float(m.group(i)) for i in range(1, 5))
+        area = _bbox_km2(s, w, n, e)
+        els = []
+        if "highway" in q:
+            for i in range(max(20, min(3000, int(area / 25)))):
+                la, lo = rnd.uniform(s, n), rnd.uniform(w, e)
+                geom = [{"lat": la + k * rnd.uniform(-0.004, 0.004), "lon": lo + k * rnd.uniform(-0.004, 0.004)}
+                        for k in range(rnd.randint(2, 6))]
+                els.append({"type": "way", "id": 20_000_000 + i, "tags": {"highway": "motorway"}, "geometry": geom,
+                            "bounds": {"minlat": min(p["lat"] for p in geom), "minlon": min(p["lon"] for p in geom),
+                                       "maxlat": max(p["lat"] for p in geom), "maxlon": max(p["lon"] for p in geom)}})
+        else:
+            for i in range(max(20, min(6000, int(area / 10)))):
+                els.append({"type": "node", "id": 30_000_000 + i, "lat": rnd.uniform(s, n), "lon": rnd.uniform(w, e),
+                            "tags": dict(rnd.choice(INFRA_TAGS))})
+        return 200, {"elements": els}
+    return 404, {"error": f"no synthetic data for {service}"}
+
+# -----------------------------
+# Server
+# -----------------------------
+
+class StandInState:
+    def __init__(self, mode: str = "replay", fixtures: Optional[Fixtures] = None,
+                 latency_s: Optional[Dict[str, float]] = None, jitter: float = 0.2,
+                 error_rate: Optional[Dict[str, float]] = None, strict: bool = False, seed: int = 0):
+        self.mode = mode
+        self.fixtures = fixtures or Fixtures(None)
+        self.latency_s = latency_s or {}
+        self.jitter = jitter
+        self.error_rate = error_rate or {}
+        self.strict = strict
+        self.seed = seed
+        self._rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts: Dict[str, Dict[str, int]] = {}
+
+    def count(self, service: str, what: str):
+        with self.lock:
+            c = self.counts.setdefault(_family(service), {})
+            c[what] = c.get(what, 0) + 1
+
+    def pick(self, service: str) -> Tuple[float, bool]:
+        """(latency to inject, whether to fail this request)."""
+        fam = _family(service)
+        base = self.latency_s.get(fam, self.latency_s.get("*", 0.0))
+        with self.lock:
+            lat = base * (1 + self.jitter * self._rnd.uniform(-1, 1)) if base else 0.0
+            fail = self._rnd.random() < self.error_rate.get(fam, self.error_rate.get("*", 0.0))
+        return max(0.0, lat), fail
+
+def _proxy(service: str, method: str, query: str, body: bytes, headers: Dict[str, str]) -> Tuple[int, str, bytes]:
+    import http_pool   # real network only in record mode
+    url = UPSTREAMS[service] + (f"?{query}" if query else "")
+    fwd = {k: v for k, v in headers.items() if k.lower() in ("user-agent", "content-type", "authorization")}
+    resp = http_pool.request(method, url, data=body or None, headers=fwd, timeout=180)
+    return resp.status_code, resp.headers.get("Content-Type", "application/json"), resp.content
+
+def make_handler(service: str, state: StandInState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, code: int, ctype: str, raw: bytes):
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _json(self, code: int, payload: Any):
+            self._send(code, "application/json", json.dumps(payload).encode("utf-8"))
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def _handle(self, method: str):
+            parts = urlsplit(self.path)
+            if parts.path.rstrip("/").endswith("/_stats"):
+                self._json(200, state.counts)
+                return
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            ctype = self.headers.get("Content-Type") or ""
+            key = request_key(service, parts.query, body, ctype)
+            state.count(service, "requests")
+
+            if state.mode == "record":
+                self._record(method, parts.query, body, key)
+                return
+
+            latency, fail = state.pick(service)
+            if latency:
+                time.sleep(latency)
+            if fail:
+                state.count(service, "injected_errors")
+                self._json(503, {"error": "injected failure"})
+                return
+            if _family(service) == "openai":
+                self._openai(body, key)
+                return
+            entry = state.fixtures.get(key)
+            if entry is not None:
+                state.count(service, "fixture_hits")
+                self._send(entry["status"], entry.get("content_type", "application/json"), entry["body"].encode("utf-8"))
+                return
+            state.count(service, "misses")
+            if state.strict:
+                self._json(404, {"error": "no fixture for this request (--strict)", "key": key})
+                return
+            code, payload = synthesize(service, parts.query, body, key, state.seed)
+            self._json(code, payload)
+
+        def _record(self, method: str, query: str, body: bytes, key: str):
+            streaming = False
+            if _family(service) == "openai":
+                js = json.loads(body or b"{}")
+                streaming = bool(js.pop("stream", False))
+                js.pop("stream_options", None)
+                body = json.dumps(js).encode("utf-8")   # record the plain completion; replay can stream it
+            cached = state.fixtures.get(key)
+            if cached is None:
+                try:
+                    code, ctype, raw = _proxy(service, method, query, body, dict(self.headers))
+                except Exception as e:
+                    state.count(service, "upstream_errors")
+                    self._json(502, {"error": f"upstream failed: {type(e).__name__}: {e}"})
+                    return
+                if code < 500 and code != 429:   # don't freeze an outage into the fixtures
+                    state.fixtures.add({"service": _family(service), "key": key, "status": code,
+                                        "content_type": ctype, "body": raw.decode("utf-8")})
+                    state.count(service, "recorded")
+            else:
+                code, ctype, raw = cached["status"], cached["content_type"], cached["body"].encode("utf-8")
+            if streaming and code == 200:
+                self._openai_reply(json.loads(raw), stream=True)
+            else:
+                self._send(code, ctype, raw)
+
+        def _openai(self, body: bytes, key: str):
+            req = json.loads(body or b"{}")
+            entry = state.fixtures.get(key)
+            if entry is not None:
+                state.count(service, "fixture_hits")
+                completion = json.loads(entry["body"])
+            else:
+                state.count(service, "misses")
+                text = _reply_text(req, spec_mode=False)
+                completion = {"choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                                           "finish_reason": "stop"}],
+                              "usage": {"prompt_tokens": len(json.dumps(req.get("messages"))) // 4,
+                                        "completion_tokens": len(text) // 4}}
+            completion["model"] = req.get("model", "replay")
+            self._openai_reply(completion, stream=bool(req.get("stream")))
+
+        def _openai_reply(self, completion: Dict[str, Any], stream: bool):
+            cid = completion.get("id") or "chatcmpl-" + uuid.uuid4().hex[:12]
+            text = completion["choices"][0]["message"].get("content") or ""
+            if not stream:
+                self._json(200, {"object": "chat.completion", "created": int(time.time()), **completion, "id": cid})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            base = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": completion.get("model")}
+            deltas = [{"role": "assistant", "content": ""}] + [{"content": text[i:i + 16]} for i in range(0, len(text), 16)]
+            for d in deltas:
+                self.wfile.write(f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': d, 'finish_reason': None}]})}\n\n".encode())
+            self.wfile.write(f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+class StandIns:
+    """One server per service; .env() has the variables that point the app at them."""
+
+    def __init__(self, state: StandInState, single_host: bool = False):
+        self.state = state
+        self.servers: Dict[str, ThreadingHTTPServer] = {}
+        for i, service in enumerate(UPSTREAMS):
+            host = "127.0.0.1" if single_host else f"127.0.0.{i + 2}"
+            srv = ThreadingHTTPServer((host, 0), make_handler(service, state))
+            srv.daemon_threads = True
+            threading.Thread(target=srv.serve_forever, name=f"standin-{service}", daemon=True).start()
+            self.servers[service] = srv
+
+    def url(self, service: str) -> str:
+        host, port = self.servers[service].server_address[:2]
+        return f"http://{host}:{port}" + urlsplit(UPSTREAMS[service]).path
+
+    def env(self) -> Dict[str, str]:
+        return {
+            "NOMINATIM_URL": self.url("nominatim"),
+            "OVERPASS_ENDPOINTS": ",".join(self.url(s) for s in UPSTREAMS if s.startswith("overpass")),
+            "FCC_URL": self.url("fcc"),
+            "BLS_URL": self.url("bls"),
+            "OPENAI_BASE_URL": self.url("openai").rsplit("/chat/completions", 1)[0],
+        }
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self.state.lock:
+            return json.loads(json.dumps(self.state.counts))
+
+    def shutdown(self):
+        for srv in self.servers.values():
+            srv.shutdown()
+            srv.server_close()
+
+def parse_per_service(values: List[str], default: float, scale: float = 1.0) -> Dict[str, float]:
+    """["50", "overpass=400"] -> {"*": 0.05, "overpass": 0.4} (with scale=1/1000)."""
+    out = {"*": default * scale}
+    for v in values or []:
+        if "=" in v:
+            k, x = v.split("=", 1)
+            out[k.strip()] = float(x) * scale
+        else:
+            out["*"] = float(v) * scale
+    return out
+
+def add_standin_args(ap: argparse.ArgumentParser):
+    ap.add_argument("--fixtures", type=str, default=None, help="JSONL fixture file (read in replay, appended in record)")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="injected latency for every service")
+    ap.add_argument("--latency", action="append", default=[], metavar="SERVICE=MS",
+                    help="per-service latency, e.g. overpass=400 (services: nominatim overpass fcc bls openai)")
+    ap.add_argument("--jitter", type=float, default=0.2, help="latency jitter as a fraction (uniform +-)")
+    ap.add_argument("--error-rate", action="append", default=[], metavar="[SERVICE=]P",
+                    help="probability of an injected 503, globally or per service")
+    ap.add_argument("--strict", action="store_true", help="404 on fixture misses instead of synthetic data")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--single-host", action="store_true", help="serve everything on 127.0.0.1")
+
+def standins_from_args(args, mode: str = "replay") -> StandIns:
+    state = StandInState(
+        mode=mode,
+        fixtures=Fixtures(args.fixtures),
+        latency_s=parse_per_service(args.latency, args.latency_ms, 1 / 1000.0),
+        jitter=args.jitter,
+        error_rate=parse_per_service(args.error_rate, 0.0),
+        strict=args.strict,
+        seed=args.seed,
+    )
+    return StandIns(state, single_host=args.single_host)
+
+def main():
+    ap = argparse.ArgumentParser(description="Record/replay stand-ins for the site-sourcing APIs")
+    ap.add_argument("mode", choices=["record", "replay"])
+    add_standin_args(ap)
+    args = ap.parse_args()
+    if args.mode == "record" and not args.fixtures:
+        ap.error("record needs --fixtures")
+    standins = standins_from_args(args, args.mode)
+    print(f"{args.mode}: {len(standins.state.fixtures.entries)} fixtures loaded. Point the app here with:")
+    for k, v in standins.env().items():
+        print(f"  export {k}={v}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(json.dumps(standins.stats(), indent=2))
+        standins.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# checkpoints.py
+"""
+Persistent LangGraph checkpointer shared by the static graph (CLI and server)
+and the generated graphs. Every superstep is saved under the run's thread id,
+so a run that dies late (BLS 500, drafting LLM timeout) can be resumed from the
+last completed node instead of redoing geocoding and Overpass.
+
+    CHECKPOINT_PATH      sqlite file (default ~/.cache/site-sourcing/checkpoints.sqlite)
+    CHECKPOINT_TTL_S     threads untouched for this long are pruned at startup (default 7 days)
+    CHECKPOINT_DISABLE=1 compile graphs without a checkpointer
+"""
+
+import asyncio
+import os
+import sqlite3
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "site-sourcing", "checkpoints.sqlite")
+
+class SqliteCheckpointer(SqliteSaver):
+    """SqliteSaver whose async methods run the sync ones in a worker thread.
+
+    The stock async saver binds to the loop it was created on; this one serves
+    app.invoke (CLI), astream on the server loop and node threads alike. It also
+    records when each thread was last written so old runs can be pruned."""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        super().__init__(conn)
+        self.path = path
+        with self.cursor() as cur:
+            cur.execute("CREATE TABLE IF NOT EXISTS thread_touch (thread_id TEXT PRIMARY KEY, updated REAL NOT NULL)")
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        out = super().put(config, checkpoint, metadata, new_versions)
+        with self.cursor() as cur:
+            cur.execute("INSERT OR REPLACE INTO thread_touch (thread_id, updated) VALUES (?, ?)",
+                        (str(config["configurable"]["thread_id"]), time.time()))
+        return out
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_touch WHERE thread_id = ?", (str(thread_id),))
+
+    def prune(self, max_age_s: float) -> int:
+        """Delete threads not written to in max_age_s; returns how many went."""
+        with self.cursor(transaction=False) as cur:
+            cur.execute("SELECT thread_id FROM thread_touch WHERE updated < ?", (time.time() - max_age_s,))
+            old: List[str] = [r[0] for r in cur.fetchall()]
+        for tid in old:
+            self.delete_thread(tid)
+        return len(old)
+
+    # ---------- async (what astream/ainvoke call) ----------
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter: Optional[Dict[str, Any]] = None, before=None,
+                    limit: Optional[int] = None) -> AsyncIterator[Any]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = ""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+def _open() -> Optional[SqliteCheckpointer]:
+    if os.environ.get("CHECKPOINT_DISABLE", "").lower() in ("1", "true", "yes"):
+        return None
+    saver = SqliteCheckpointer(os.environ.get("CHECKPOINT_PATH", DEFAULT_PATH))
+    pruned = saver.prune(float(os.environ.get("CHECKPOINT_TTL_S", str(7 * 86400))))
+    if pruned:
+        print(f"[CHECKPOINT] pruned {pruned} old run(s)", flush=True)
+    return saver
+
+CHECKPOINTER = _open()
+
+def thread_config(thread_id: str, **configurable) -> Dict[str, Any]:
+    return {"configurable": {"thread_id": thread_id, **configurable}}
@@ -0,0 +1,231 @@
+# geo_cache.py
+"""
+Persistent, content-addressed cache for the external geo/labor API responses
+(Nominatim, Overpass, FCC, BLS). Backed by a single SQLite file so repeat runs
+over the same metro skip the network entirely.
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "site-sourcing", "geo_cache.sqlite")
+
+# seconds; OSM edits show up quickly, county boundaries and monthly BLS data do not
+DEFAULT_TTLS: Dict[str, float] = {
+    "nominatim": 30 * 86400,
+    "overpass": 1 * 86400,
+    "fcc": 90 * 86400,
+    "bls": 3 * 86400,
+}
+FALLBACK_TTL = 86400
+
+def normalize_params(params: Any) -> Any:
+    """Canonical form of request params: collapsed whitespace, rounded floats, sorted keys."""
+    if isinstance(params, dict):
+        return {str(k): normalize_params(v) for k, v in sorted(params.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(params, (list, tuple)):
+        return [normalize_params(v) for v in params]
+    if isinstance(params, float):
+        return round(params, 6)
+    if isinstance(params, str):
+        return " ".join(params.split())
+    return params
+
+def cache_key(source: str, params: Any) -> str:
+    blob = json.dumps({"source": source, "params": normalize_params(params)}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class SingleFlight:
+    """Collapses concurrent requests for the same key: the first caller fetches, the rest wait for its answer.
+
+    Batch runs hit the same boxes/counties from several metros at once; without this each
+    of them would miss the cache and go to the network before the first answer is stored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.shared = 0
+
+    def claim(self, keys: Iterable[str]) -> Tuple[List[str], Dict[str, Future]]:
+        """(keys this caller must fetch and resolve(), futures for keys another caller is already fetching)."""
+        mine, theirs = [], {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                fut = self._calls.get(key)
+                if fut is None:
+                    self._calls[key] = Future()
+                    mine.append(key)
+                else:
+                    theirs[key] = fut
+            self.shared += len(theirs)
+        return mine, theirs
+
+    def resolve(self, key: str, value: Any = None, error: BaseException | None = None):
+        with self._lock:
+            fut = self._calls.pop(key, None)
+        if fut is None:
+            return
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(value)
+
+class ResponseCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = 256 * 1024 * 1024,
+                 ttls: Dict[str, float] | None = None, enabled: bool = True):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._flights = SingleFlight()
+
+    # ---------- storage ----------
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, source TEXT NOT NULL, payload TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+            self._conn = conn
+        return self._conn
+
+    def _count(self, source: str, what: str, n: int = 1):
+        c = self._counters.setdefault(source, {"hits": 0, "misses": 0, "stale": 0, "stores": 0, "evictions": 0, "shared": 0})
+        c[what] += n
+
+    def ttl(self, source: str) -> float:
+        return self.ttls.get(source, FALLBACK_TTL)
+
+    def get(self, source: str, params: Any) -> Tuple[bool, Any]:
+        """Return (hit, value). Expired entries are dropped and reported as a miss."""
+        if not self.enabled:
+            return False, None
+        key = cache_key(source, params)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT payload, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(source, "misses")
+                return False, None
+            payload, created = row
+            if now - created > self.ttl(source):
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                db.commit()
+                self._count(source, "stale")
+                self._count(source, "misses")
+                return False, None
+            db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            db.commit()
+            self._count(source, "hits")
+        return True, json.loads(payload)
+
+    def put(self, source: str, params: Any, value: Any):
+        if not self.enabled:
+            return
+        key = cache_key(source, params)
+        payload = json.dumps(value, separators=(",", ":"))
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, source, payload, created, accessed, size) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, source, payload, now, now, len(payload)),
+            )
+            self._count(source, "stores")
+            self._evict(db)
+            db.commit()
+
+    def _evict(self, db: sqlite3.Connection):
+        # size-bounded LRU: drop least-recently-accessed rows until we're back under 90% of the budget
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        for key, source, size in db.execute("SELECT key, source, size FROM entries ORDER BY accessed ASC").fetchall():
+            if total <= target:
+                break
+            db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._count(source, "evictions")
+            total -= size
+
+    def fetch(self, source: str, params: Any, fn: Callable[[], Any],
+              should_cache: Callable[[Any], bool] | None = None) -> Any:
+        """Cached call: return the stored response for (source, params) or run fn() and store it.
+        Concurrent misses on the same key share one fn() call."""
+        hit, value = self.get(source, params)
+        if hit:
+            return value
+        key = cache_key(source, params)
+        mine, theirs = self._flights.claim([key])
+        if not mine:
+            with self._lock:
+                self._count(source, "shared")
+            return theirs[key].result()
+        try:
+            value = fn()
+            if should_cache is None or should_cache(value):
+                self.put(source, params, value)
+        except BaseException as e:
+            self._flights.resolve(key, error=e)
+            raise
+        self._flights.resolve(key, value)
+        return value
+
+    def clear(self, source: str | None = None):
+        with self._lock:
+            db = self._db()
+            if source is None:
+                db.execute("DELETE FROM entries")
+            else:
+                db.execute("DELETE FROM entries WHERE source = ?", (source,))
+            db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            if not self.enabled:
+                return {"enabled": False, "counters": {}}
+            rows = self._db().execute(
+                "SELECT source, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY source"
+            ).fetchall()
+            counters = {k: dict(v) for k, v in self._counters.items()}
+        return {
+            "enabled": True,
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "entries": {src: {"count": n, "bytes": size} for src, n, size in rows},
+            "counters": counters,
+        }
+
+def _ttls_from_env() -> Dict[str, float]:
+    ttls = {}
+    for source in DEFAULT_TTLS:
+        raw = os.environ.get(f"GEO_CACHE_TTL_{source.upper()}")
+        if raw:
+            ttls[source] = float(raw)
+    return ttls
+
+GEO_CACHE = ResponseCache(
+    path=os.environ.get("GEO_CACHE_PATH", DEFAULT_CACHE_PATH),
+    max_bytes=int(os.environ.get("GEO_CACHE_MAX_MB", "256")) * 1024 * 1024,
+    ttls=_ttls_from_env(),
+    enabled=os.environ.get("GEO_CACHE_DISABLE", "").lower() not in ("1", "true", "yes"),
+)
@@ -0,0 +1,201 @@
+# geo_utils.py
+"""
+Distance and spatial-index helpers shared by the ideation and ranker nodes.
+
+Scalar helpers keep the original pure-Python semantics; the NumPy versions
+evaluate one point against many at once so nodes can scale to thousands of
+candidates / OSM elements per metro.
+"""
+
+from __future__ import annotations
+import math
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+EARTH_R_KM = 6371.0088
+
+Point = Tuple[float, float]
+
+# -----------------------------
+# Scalar
+# -----------------------------
+
+def haversine_km(a: Point, b: Point) -> float:
+    R = EARTH_R_KM
+    lat1, lon1 = map(math.radians, a)
+    lat2, lon2 = map(math.radians, b)
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    h = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
+    return 2*R*math.asin(math.sqrt(h))
+
+def bbox_around(points: Sequence[Point], radius_km: float) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) box covering every point plus radius_km on all sides."""
+    lats = [p[0] for p in points]
+    lons = [p[1] for p in points]
+    dlat = radius_km / 110.574 + 0.01              # km per degree of latitude is never below 110.574
+    max_abs_lat = min(89.0, max(abs(l) for l in lats) + dlat)
+    dlon = radius_km / (111.320 * math.cos(math.radians(max_abs_lat))) + 0.01
+    return (min(lats) - dlat, min(lons) - dlon, max(lats) + dlat, max(lons) + dlon)
+
+def bbox_tiles(bbox: Tuple[float, float, float, float], deg: float) -> List[Tuple[float, float, float, float]]:
+    """The cells of a fixed deg-by-deg grid that cover bbox, as (south, west, north, east) boxes.
+
+    The cells don't depend on bbox itself, so any box over the same area maps to the same tiles.
+    """
+    s, w, n, e = bbox
+    rows = range(math.floor(s / deg), max(math.floor(s / deg) + 1, math.ceil(n / deg)))
+    cols = range(math.floor(w / deg), max(math.floor(w / deg) + 1, math.ceil(e / deg)))
+    return [(round(i * deg, 6), round(j * deg, 6), round((i + 1) * deg, 6), round((j + 1) * deg, 6))
+            for i in rows for j in cols]
+
+def _segment_km(p: Point, a: Point, b: Point) -> float:
+    # local equirectangular projection around p; plenty accurate at ranker radii (<= ~20km)
+    kx = EARTH_R_KM * math.cos(math.radians(p[0])) * math.pi / 180.0
+    ky = EARTH_R_KM * math.pi / 180.0
+    ax, ay = (a[1] - p[1]) * kx, (a[0] - p[0]) * ky
+    bx, by = (b[1] - p[1]) * kx, (b[0] - p[0]) * ky
+    dx, dy = bx - ax, by - ay
+    seg2 = dx * dx + dy * dy
+    t = 0.0 if seg2 == 0 else max(0.0, min(1.0, -(ax * dx + ay * dy) / seg2))
+    return math.hypot(ax + t * dx, ay + t * dy)
+
+def element_center(el: Dict[str, Any]) -> Point | None:
+    """Overpass-style center: node coords, or the middle of a way's bounding box."""
+    if "center" in el:
+        return el["center"]["lat"], el["center"]["lon"]
+    if "lat" in el and "lon" in el:
+        return el["lat"], el["lon"]
+    b = el.get("bounds")
+    if b:
+        return (b["minlat"] + b["maxlat"]) / 2.0, (b["minlon"] + b["maxlon"]) / 2.0
+    return None
+
+def _element_geometry(el: Dict[str, Any]) -> List[Point]:
+    if "lat" in el and "lon" in el:
+        return [(el["lat"], el["lon"])]
+    return [(g["lat"], g["lon"]) for g in (el.get("geometry") or []) if g]
+
+def element_within_km(el: Dict[str, Any], p: Point, radius_km: float) -> bool:
+    """Local equivalent of Overpass `(around:radius,lat,lon)` for an element fetched with `out geom`."""
+    geom = _element_geometry(el)
+    if not geom:
+        return False
+    if len(geom) == 1:
+        return haversine_km(geom[0], p) <= radius_km
+    return any(_segment_km(p, geom[i], geom[i + 1]) <= radius_km for i in range(len(geom) - 1))
+
+# -----------------------------
+# Vectorized
+# -----------------------------
+
+def as_points(points: Iterable[Point]) -> np.ndarray:
+    arr = np.asarray(list(points), dtype=float)
+    return arr.reshape(-1, 2)
+
+def haversine_km_many(p: Point, pts: np.ndarray | Sequence[Point]) -> np.ndarray:
+    """Great-circle distance from p to every row of pts (shape (n, 2), lat/lon degrees)."""
+    pts = pts if isinstance(pts, np.ndarray) else as_points(pts)
+    if pts.size == 0:
+        return np.empty(0)
+    lat1, lon1 = math.radians(p[0]), math.radians(p[1])
+    lat2 = np.radians(pts[:, 0])
+    lon2 = np.radians(pts[:, 1])
+    h = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_R_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+class ElementIndex:
+    """Flattened node/segment arrays for a batch of Overpass elements (fetched with `out geom`).
+
+    within() answers the `around:` membership test and center_distances() the
+    center-to-point distance for every element at once.
+    """
+
+    def __init__(self, elements: Sequence[Dict[str, Any]]):
+        self.elements = list(elements)
+        n = len(self.elements)
+        centers = np.full((n, 2), np.nan)
+        pt_owner, pts, seg_owner, seg_a, seg_b = [], [], [], [], []
+        for i, el in enumerate(self.elements):
+            c = element_center(el)
+            if c is not None:
+                centers[i] = c
+            geom = _element_geometry(el)
+            if len(geom) == 1:
+                pt_owner.append(i)
+                pts.append(geom[0])
+            elif len(geom) > 1:
+                seg_owner.extend([i] * (len(geom) - 1))
+                seg_a.extend(geom[:-1])
+                seg_b.extend(geom[1:])
+        self.centers = centers
+        self._pt_owner = np.asarray(pt_owner, dtype=int)
+        self._pts = as_points(pts)
+        self._seg_owner = np.asarray(seg_owner, dtype=int)
+        self._seg_a = as_points(seg_a)
+        self._seg_b = as_points(seg_b)
+
+    def __len__(self) -> int:
+        return len(self.elements)
+
+    def distances(self, p: Point) -> np.ndarray:
+        """Distance (km) from p to each element's geometry; inf for elements without one."""
+        out = np.full(len(self.elements), np.inf)
+        if self._pts.size:
+            out[self._pt_owner] = haversine_km_many(p, self._pts)
+        if self._seg_a.size:
+            kx = EARTH_R_KM * math.cos(math.radians(p[0])) * math.pi / 180.0
+            ky = EARTH_R_KM * math.pi / 180.0
+            ax = (self._seg_a[:, 1] - p[1]) * kx
+            ay = (self._seg_a[:, 0] - p[0]) * ky
+            dx = (self._seg_b[:, 1] - p[1]) * kx - ax
+            dy = (self._seg_b[:, 0] - p[0]) * ky - ay
+            seg2 = dx * dx + dy * dy
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.where(seg2 > 0, -(ax * dx + ay * dy) / seg2, 0.0)
+            t = np.clip(t, 0.0, 1.0)
+            d = np.hypot(ax + t * dx, ay + t * dy)
+            np.minimum.at(out, self._seg_owner, d)
+        return out
+
+    def within(self, p: Point, radius_km: float) -> np.ndarray:
+        return self.distances(p) <= radius_km
+
+    def center_distances(self, p: Point) -> np.ndarray:
+        """Distance (km) from p to each element's center; nan for elements without one."""
+        return haversine_km_many(p, self.centers)
+
+def nearest_km(p: Point, pts: np.ndarray | Sequence[Point]) -> float | None:
+    d = haversine_km_many(p, pts)
+    d = d[~np.isnan(d)]
+    return float(d.min()) if d.size else None
+
+def grid_dedup(points: Sequence[Point], min_km: float, limit: int | None = None) -> List[Point]:
+    """Greedy dedup: keep a point unless an already-kept point lies within min_km.
+
+    Same result as comparing every point against every kept point, but kept
+    points are bucketed into a lat/lon grid whose cells are at least min_km
+    wide, so each point is only compared against the 3x3 cells around it.
+    """
+    if not points:
+        return []
+    # slightly oversized cells (sphere is ~111.2 km/deg) so anything within min_km is in a neighbouring cell
+    max_abs_lat = min(89.0, max(abs(p[0]) for p in points) + min_km / 110.0)
+    cell_lat = min_km / 110.0
+    cell_lon = min_km / (110.0 * math.cos(math.radians(max_abs_lat)))
+    grid: Dict[Tuple[int, int], List[Point]] = {}
+    kept: List[Point] = []
+    for p in points:
+        gi, gj = math.floor(p[0] / cell_lat), math.floor(p[1] / cell_lon)
+        clash = any(
+            haversine_km(p, q) <= min_km
+            for di in (-1, 0, 1) for dj in (-1, 0, 1)
+            for q in grid.get((gi + di, gj + dj), ())
+        )
+        if not clash:
+            kept.append(p)
+            grid.setdefault((gi, gj), []).append(p)
+            if limit is not None and len(kept) >= limit:
+                break
+    return kept
@@ -0,0 +1,134 @@
+# http_pool.py
+"""
+Shared keep-alive HTTP sessions for the external API wrappers.
+
+One requests.Session per host, each with a sized urllib3 connection pool and
+transport-level retries (exponential backoff with jitter, Retry-After aware).
+Sessions are module-level, so every graph run in the process — CLI or the
+FastAPI worker threads — reuses the same warm connections. Each request, and
+each transport retry, first takes a token from the host's rate limiter (see
+rate_limit.py).
+"""
+
+from __future__ import annotations
+import os
+import threading
+from typing import Any, Dict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import rate_limit
+import telemetry
+
+DEFAULT_HOST_CONFIG: Dict[str, Any] = {
+    "pool_connections": 1,
+    "pool_maxsize": int(os.environ.get("HTTP_POOL_MAXSIZE", "10")),
+    "retries": int(os.environ.get("HTTP_RETRIES", "3")),
+    "backoff_factor": 0.3,                  # 0.3s, 0.6s, 1.2s ... (+ jitter)
+    "status_forcelist": (429, 502, 503, 504),
+    "respect_retry_after": True,
+}
+
+# per-host overrides (merged over the defaults)
+HOST_CONFIG: Dict[str, Dict[str, Any]] = {
+    # Nominatim's usage policy is 1 req/s; no point keeping many sockets open
+    "nominatim.openstreetmap.org": {"pool_maxsize": 2},
+    # BLS answers 429 when the daily quota is spent; retrying just burns more quota
+    "api.bls.gov": {"status_forcelist": (500, 502, 503, 504)},
+}
+
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+def configure_host(host: str, **overrides):
+    """Override pool/retry settings for a host; the next request builds a fresh session."""
+    with _lock:
+        HOST_CONFIG[host] = {**HOST_CONFIG.get(host, {}), **overrides}
+        _sessions.pop(host, None)
+
+def host_config(host: str) -> Dict[str, Any]:
+    return {**DEFAULT_HOST_CONFIG, **HOST_CONFIG.get(host, {})}
+
+class _ThrottledRetry(Retry):
+    """Retry that takes a token from the host's bucket before each retry, so retry bursts
+    stay within the host's configured rate like any other request."""
+
+    host = ""
+
+    def new(self, **kw):
+        retry = super().new(**kw)   # urllib3 rebuilds the Retry on every increment
+        retry.host = self.host
+        return retry
+
+    def sleep(self, response=None):
+        super().sleep(response)
+        telemetry.note(rate_wait_s=rate_limit.acquire(self.host))
+
+def _build_session(host: str) -> requests.Session:
+    cfg = host_config(host)
+    retry = _ThrottledRetry(
+        total=cfg["retries"],
+        connect=cfg["retries"],
+        read=cfg["retries"],
+        status=cfg["retries"],
+        backoff_factor=cfg["backoff_factor"],
+        backoff_jitter=cfg["backoff_factor"],
+        status_forcelist=cfg["status_forcelist"],
+        allowed_methods=frozenset({"GET", "POST"}),   # every call we make is a read
+        respect_retry_after_header=cfg["respect_retry_after"],
+        raise_on_status=False,                        # hand the final response back to the caller
+    )
+    retry.host = host
+    adapter = HTTPAdapter(
+        pool_connections=cfg["pool_connections"],
+        pool_maxsize=cfg["pool_maxsize"],
+        max_retries=retry,
+        pool_block=False,
+    )
+    s = requests.Session()
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+def session_for(url: str) -> requests.Session:
+    host = urlsplit(url).hostname or ""
+    s = _sessions.get(host)
+    if s is None:
+        with _lock:
+            s = _sessions.get(host)
+            if s is None:
+                s = _sessions[host] = _build_session(host)
+    return s
+
+def acquire(url: str) -> float:
+    """Wait for a token from url's host bucket (no-op for hosts without a configured limit).
+
+    Callers that also hold a concurrency semaphore for the host call this *before* taking
+    it and pass acquired=True to request(), so a throttled host doesn't sit on a slot.
+    """
+    waited = rate_limit.acquire(urlsplit(url).hostname or "")
+    telemetry.note(rate_wait_s=waited)   # throttle wait goes on the caller's span (see telemetry.py)
+    return waited
+
+def request(method: str, url: str, acquired: bool = False, **kwargs) -> requests.Response:
+    if not acquired:
+        acquire(url)
+    resp = session_for(url).request(method, url, **kwargs)
+    retries = getattr(getattr(resp.raw, "retries", None), "history", None) or ()
+    telemetry.note(bytes=len(resp.content), retries=len(retries))
+    return resp
+
+def get(url: str, acquired: bool = False, **kwargs) -> requests.Response:
+    return request("GET", url, acquired, **kwargs)
+
+def post(url: str, acquired: bool = False, **kwargs) -> requests.Response:
+    return request("POST", url, acquired, **kwargs)
+
+def close_all():
+    with _lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
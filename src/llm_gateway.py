@@ -0,0 +1,246 @@
+# llm_gateway.py
+"""
+One shared gateway for every chat-model call (dynamic llm tool, report
+drafting, spec generation).
+
+All calls run on a single background event loop that owns the ChatOpenAI
+clients, so their async HTTP connection pools are reused instead of each
+caller opening its own. Requests that arrive within a short window (sibling
+nodes that became ready together) go out as one `abatch`, under a global
+concurrency limit. Queue time (waiting for a batch/slot) and model time are
+tracked separately, and every call is a telemetry span ("llm") with its queue
+time as semaphore wait and its token usage. Model requests time out after
+LLM_TIMEOUT_S, and a caller gives up (and raises TimeoutError) once that plus
+the batch window has passed, so a stalled batch or a dead loop thread can't
+hang a node forever.
+
+OPENAI_BASE_URL points the gateway at another OpenAI-compatible server, e.g.
+the local stub in benchmarks/llm_stub.py.
+"""
+
+from __future__ import annotations
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.runnables.config import ensure_config
+from langchain_openai import ChatOpenAI
+
+import telemetry
+
+DEFAULT_MODEL = os.environ.get("LLM_MODEL", "gpt-4o-mini")
+
+def _note_call(res: Any, queue_s: float):
+    usage = getattr(res, "usage_metadata", None) or {}
+    telemetry.note(sem_wait_s=queue_s, tokens_in=usage.get("input_tokens") or 0,
+                   tokens_out=usage.get("output_tokens") or 0)
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    s = sorted(values)
+    return s[min(len(s) - 1, int(round(q * (len(s) - 1))))]
+
+class LLMGateway:
+    def __init__(self, model: str = DEFAULT_MODEL, temperature: float = 0.2, max_concurrency: int = 8,
+                 batch_window_s: float = 0.02, max_batch: int = 8, timeout_s: float = 120.0,
+                 base_url: Optional[str] = None, api_key: Optional[str] = None):
+        self.model = model
+        self.temperature = temperature
+        self.max_concurrency = max_concurrency
+        self.batch_window_s = batch_window_s
+        self.max_batch = max(1, min(max_batch, max_concurrency))
+        self.timeout_s = timeout_s
+        self.base_url = base_url
+        self.api_key = api_key
+
+        self._clients: Dict[Tuple[str, float], ChatOpenAI] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        # loop-side state, created on the gateway loop
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._admit: Optional[asyncio.Lock] = None
+        self._pending: Dict[Tuple[str, float], List[Tuple[Any, Dict[str, Any], asyncio.Future, float]]] = {}
+        self._timers: Dict[Tuple[str, float], asyncio.TimerHandle] = {}
+
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.batches = 0
+        self.in_flight = 0
+        self._queue_s: Deque[float] = deque(maxlen=2000)
+        self._model_s: Deque[float] = deque(maxlen=2000)
+        self._batch_sizes: Deque[int] = deque(maxlen=2000)
+
+    # read lazily: some importers load .env after importing us
+    def _base_url(self) -> Optional[str]:
+        return self.base_url or os.environ.get("OPENAI_BASE_URL") or None
+
+    def _api_key(self) -> Optional[str]:
+        return self.api_key or os.environ.get("OPENAI_API_KEY") or None
+
+    @property
+    def available(self) -> bool:
+        """True when there's something to talk to (a key, or a local OpenAI-compatible base URL)."""
+        return bool(self._api_key() or self._base_url())
+
+    def client(self, model: Optional[str] = None, temperature: Optional[float] = None) -> ChatOpenAI:
+        key = (model or self.model, self.temperature if temperature is None else temperature)
+        c = self._clients.get(key)
+        if c is None:
+            kw: Dict[str, Any] = {"model": key[0], "temperature": key[1], "timeout": self.timeout_s}
+            if self._base_url():
+                kw["base_url"] = self._base_url()
+            if self._api_key() or self._base_url():
+                kw["api_key"] = self._api_key() or "stub"   # local stubs don't check keys
+            c = self._clients.setdefault(key, ChatOpenAI(**kw))
+        return c
+
+    # ---------- loop management ----------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def run():
+                    asyncio.set_event_loop(loop)
+                    self._sem = asyncio.Semaphore(self.max_concurrency)
+                    self._admit = asyncio.Lock()
+                    ready.set()
+                    loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="llm-gateway", daemon=True)
+                self._thread.start()
+                ready.wait()
+                self._loop = loop
+        return self._loop
+
+    # ---------- public API ----------
+
+    def _wait_s(self) -> float:
+        # the model request's own timeout plus the longest a call sits waiting for its batch to go out
+        return self.timeout_s + self.batch_window_s
+
+    def _timed_out(self) -> TimeoutError:
+        self.timeouts += 1
+        return TimeoutError(f"LLM call gave up after {self._wait_s():.1f}s")
+
+    def invoke(self, messages: Any, model: Optional[str] = None, temperature: Optional[float] = None,
+               config: Optional[Dict[str, Any]] = None):
+        """Blocking call from any thread (graph nodes run in executor threads)."""
+        config = config or ensure_config()   # picks up the calling run's callbacks (token streaming)
+        loop = self._ensure_loop()
+        with telemetry.span("call", "llm", model=model or self.model):
+            fut = asyncio.run_coroutine_threadsafe(self._submit(messages, model, temperature, config), loop)
+            try:
+                res, queue_s = fut.result(timeout=self._wait_s())
+            except TimeoutError:
+                fut.cancel()   # drops it from its batch's results; the node's error path runs
+                raise self._timed_out() from None
+            _note_call(res, queue_s)
+        return res
+
+    async def ainvoke(self, messages: Any, model: Optional[str] = None, temperature: Optional[float] = None,
+                      config: Optional[Dict[str, Any]] = None):
+        config = config or ensure_config()
+        loop = self._ensure_loop()
+        with telemetry.span("call", "llm", model=model or self.model):
+            fut = asyncio.run_coroutine_threadsafe(self._submit(messages, model, temperature, config), loop)
+            try:
+                res, queue_s = await asyncio.wait_for(asyncio.wrap_future(fut), self._wait_s())
+            except asyncio.TimeoutError:
+                fut.cancel()
+                raise self._timed_out() from None
+            _note_call(res, queue_s)
+        return res
+
+    # ---------- loop side ----------
+
+    async def _submit(self, messages: Any, model: Optional[str], temperature: Optional[float],
+                      config: Dict[str, Any]):
+        key = (model or self.model, self.temperature if temperature is None else temperature)
+        fut = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((messages, config, fut, time.perf_counter()))
+        self.requests += 1
+        if len(batch) >= self.max_batch:
+            self._dispatch(key)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.batch_window_s, self._dispatch, key)
+        return await fut
+
+    def _dispatch(self, key: Tuple[str, float]):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            asyncio.get_running_loop().create_task(self._run_batch(key, batch))
+
+    async def _run_batch(self, key: Tuple[str, float], batch):
+        n = len(batch)
+        # take all of this batch's slots at once; the admit lock stops two batches deadlocking on partial sets
+        async with self._admit:
+            for _ in range(n):
+                await self._sem.acquire()
+        started = time.perf_counter()
+        self.batches += 1
+        self.in_flight += n
+        self._batch_sizes.append(n)
+        for _, _, _, enq in batch:
+            self._queue_s.append(started - enq)
+        try:
+            results = await self.client(*key).abatch(
+                [m for m, _, _, _ in batch],
+                config=[c for _, c, _, _ in batch],
+                return_exceptions=True,
+            )
+        except Exception as e:   # abatch itself blew up; fail every caller
+            results = [e] * n
+        finally:
+            elapsed = time.perf_counter() - started
+            self.in_flight -= n
+            for _ in range(n):
+                self._sem.release()
+        for (_, _, fut, enq), res in zip(batch, results):
+            self._model_s.append(elapsed)
+            if fut.done():
+                continue
+            if isinstance(res, BaseException):
+                self.errors += 1
+                fut.set_exception(res)
+            else:
+                fut.set_result((res, started - enq))   # caller notes the queue time on its span
+
+    def stats(self) -> Dict[str, Any]:
+        q, m, b = list(self._queue_s), list(self._model_s), list(self._batch_sizes)
+        ms = lambda v: round(v * 1000, 1) if v is not None else None
+        return {
+            "available": self.available,
+            "model": self.model,
+            "base_url": self._base_url(),
+            "max_concurrency": self.max_concurrency,
+            "batch_window_ms": self.batch_window_s * 1000,
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "timeout_s": self.timeout_s,
+            "batches": self.batches,
+            "in_flight": self.in_flight,
+            "avg_batch_size": round(sum(b) / len(b), 2) if b else None,
+            "queue_ms": {"p50": ms(_percentile(q, 0.5)), "p95": ms(_percentile(q, 0.95))},
+            "model_ms": {"p50": ms(_percentile(m, 0.5)), "p95": ms(_percentile(m, 0.95))},
+        }
+
+LLM = LLMGateway(
+    max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "8")),
+    batch_window_s=float(os.environ.get("LLM_BATCH_WINDOW_MS", "20")) / 1000.0,
+    max_batch=int(os.environ.get("LLM_MAX_BATCH", "8")),
+    timeout_s=float(os.environ.get("LLM_TIMEOUT_S", "120")),
+)
@@ -7,7 +7,7 @@ Real-API version using LangGraph + LangChain
 
 
 from __future__ import annotations
-import random
+import contextvars
 import threading
 import argparse
 import json
@@ -15,131 +15,377 @@ import math
 import os
 from dotenv import load_dotenv
 import time
-from typing import Any, Dict, List, Tuple, TypedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from typing import Any, Callable, Dict, List, Tuple, TypedDict
 
+import numpy as np
 import requests
 from langgraph.graph import StateGraph, END
 from langchain_core.messages import HumanMessage
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnableConfig
 
 # -----------------------------
 # Config / helpers
 # -----------------------------
 load_dotenv()  # Loads from .env file
 
+from geo_cache import GEO_CACHE, SingleFlight  # noqa: E402  (reads GEO_CACHE_* from the env loaded above)
+import http_pool  # noqa: E402
+import telemetry  # noqa: E402
+from overpass_scheduler import EndpointScheduler  # noqa: E402
+from osm_offline import OfflineOSM  # noqa: E402
+from llm_gateway import LLM  # noqa: E402
+from checkpoints import CHECKPOINTER, thread_config  # noqa: E402  (CHECKPOINT_* from the env)
+from geo_utils import (  # noqa: E402
+    ElementIndex,
+    as_points,
+    bbox_around,
+    bbox_tiles,
+    grid_dedup,
+    haversine_km_many,
+)
+
 NOMINATIM_UA = os.environ.get("NOMINATIM_UA", "site-sourcing-langgraph/1.0 (contact: robertcupps19@gmail.com)")
 
-OVERPASS_ENDPOINTS = [
+OVERPASS_ENDPOINTS = [u.strip() for u in os.environ.get("OVERPASS_ENDPOINTS", ",".join([
     "https://overpass-api.de/api/interpreter",
     "https://overpass.kumi.systems/api/interpreter",
     "https://overpass.openstreetmap.ru/api/interpreter",
-]
+])).split(",") if u.strip()]
+# the other providers can be pointed elsewhere too (e.g. benchmarks/replay_server.py)
+NOMINATIM_URL = os.environ.get("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+FCC_URL = os.environ.get("FCC_URL", "https://geo.fcc.gov/api/census/block/find")
+# "live" = public Overpass mirrors; "offline" = local extract built with osm_offline.py
+OSM_BACKEND = os.environ.get("OSM_BACKEND", "live").lower()
+OSM_EXTRACT = os.environ.get("OSM_EXTRACT")
+
+# Route each query to the healthiest mirror. The scheduler needs to see 429/5xx answers
+# itself, so transport-level status/Retry-After retries are turned off for these hosts.
+OVERPASS_SCHEDULER = EndpointScheduler(OVERPASS_ENDPOINTS)
+for _url in OVERPASS_ENDPOINTS:
+    http_pool.configure_host(urlsplit(_url).hostname, status_forcelist=(), respect_retry_after=False)
+OVERPASS_MAX_WAIT = 30.0  # longest we'll sit out a Retry-After before giving up on the mirrors
+
 # Keep a small client-side throttle so parallel nodes don’t hammer the same host
 OVERPASS_SEM = threading.BoundedSemaphore(2)
+# Same idea for the labor APIs, which the labor ranker now calls from a worker pool
+FCC_SEM = threading.BoundedSemaphore(int(os.environ.get("FCC_MAX_CONCURRENCY", "4")))
+BLS_SEM = threading.BoundedSemaphore(int(os.environ.get("BLS_MAX_CONCURRENCY", "2")))
+LABOR_WORKERS = int(os.environ.get("LABOR_WORKERS", "8"))
+# batch mode: metros in flight at once
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "4"))
+
+# Search radii used by the rankers (previously inlined in each per-candidate `around:` query)
+ZONING_RADIUS_KM = 15.0
+INFRA_RADIUS_KM = 10.0
+ZONING_OUT_LIMIT = 60  # the per-candidate motorway query used `out center 60`
+# Ranker Overpass queries go out per cell of a fixed grid (degrees): a cell's query doesn't depend
+# on which candidates survived, so later runs and nearby metros reuse cached cells
+RANKER_TILE_DEG = float(os.environ.get("RANKER_TILE_DEG", "0.5"))
+# Ideation: search radius, minimum polygons to sample, default number of deduplicated sites
+# to keep (stage 1; `candidate_pool` in the state overrides it)
+IDEATION_RADIUS_KM = 20.0
+IDEATION_SAMPLE = int(os.environ.get("IDEATION_SAMPLE", "30"))
+IDEATION_LIMIT = int(os.environ.get("IDEATION_LIMIT", "10"))
+IDEATION_DEDUP_KM = 0.5
+
+INFRA_WEIGHTS = {
+    "generator": 4.0, "substation": 3.0, "pipeline": 2.0,
+    "mast": 1.0, "communications_tower": 1.0, "monitoring_station": 1.0, "water_tower": 1.0
+}
+# Ranker / report weights. Raw measurements are kept with each run, so /api/rescore can
+# re-rank with different weights without re-running the graph.
+ZONING_WEIGHTS = {"compatible": 0.4, "proximity": 0.6}
+LABOR_WEIGHTS = {"unemployment": 0.6, "proximity": 0.4}
+COMBINE_WEIGHTS = {"zoning": 0.4, "infra": 0.35, "labor": 0.25}
+# Cheap first-stage score; mirrors report_aggregator's combine, with distance to center standing
+# in for the labor ranker. Components without cached data are left out and the rest renormalized.
+PRESCREEN_WEIGHTS = {"zoning": 0.4, "infra": 0.35, "center": 0.25}
 
-def haversine_km(a: Tuple[float, float], b: Tuple[float, float]) -> float:
-    R = 6371.0088
-    lat1, lon1 = map(math.radians, a)
-    lat2, lon2 = map(math.radians, b)
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    h = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
-    return 2*R*math.asin(math.sqrt(h))
 
 # -----------------------------
 # External API wrappers (real) - tools
 # -----------------------------
 
 def geocode_nominatim(query: str) -> Tuple[float, float]:
-    url = "https://nominatim.openstreetmap.org/search"
-    resp = requests.get(url, params={"q": query, "format": "json", "limit": 1}, headers={"User-Agent": NOMINATIM_UA}, timeout=30)
-    resp.raise_for_status()
-    js = resp.json()
+    url = NOMINATIM_URL
+
+    def fetch():
+        telemetry.note(cache="miss")
+        resp = http_pool.get(url, params={"q": query, "format": "json", "limit": 1}, headers={"User-Agent": NOMINATIM_UA}, timeout=30)
+        resp.raise_for_status()
+        return resp.json()
+
+    with telemetry.span("call", "geocode_nominatim", cache="hit"):
+        js = GEO_CACHE.fetch("nominatim", {"q": query.strip().lower()}, fetch, should_cache=bool)
     if not js:
         raise ValueError(f"No geocoding results for '{query}'")
     return float(js[0]["lat"]), float(js[0]["lon"])
 
 def overpass(query: str, tries: int = 4, base_timeout: int = 60) -> Dict[str, Any]:
-    last_err = None
-    # Shuffle endpoints each call to spread load
-    endpoints = OVERPASS_ENDPOINTS[:]
-    random.shuffle(endpoints)
+    # Overpass reports query timeouts as a 200 with a "runtime error" remark; don't keep those
+    with telemetry.span("call", "overpass", cache="hit"):
+        return GEO_CACHE.fetch("overpass", {"query": query}, lambda: _overpass_live(query, tries, base_timeout),
+                               should_cache=lambda js: "runtime error" not in (js.get("remark") or ""))
+
+def overpass_cached(query: str) -> Dict[str, Any] | None:
+    """Cached Overpass response for query, or None; never touches the network."""
+    hit, js = GEO_CACHE.get("overpass", {"query": query})
+    return js if hit else None
+
+def _overpass_live(query: str, tries: int, base_timeout: int) -> Dict[str, Any]:
+    # Connection-level retries live in http_pool; here the scheduler picks a mirror per attempt
+    # and we fail over on 429/5xx/runtime-error answers, never sending twice to the same mirror
+    # while another one is still untried.
+    last_err: Exception | None = None
+    last_payload: Dict[str, Any] | None = None
+    tried: List[str] = []
+    telemetry.note(cache="miss")
 
     for attempt in range(tries):
-        url = endpoints[attempt % len(endpoints)]
-        # jittered backoff: 0s, ~0.6s, ~1.4s, ~3s...
-        backoff = 0.3 * (2 ** attempt) * (0.75 + random.random() * 0.5)
+        if attempt:
+            telemetry.note(retries=1)   # mirror failover
+        url, wait = OVERPASS_SCHEDULER.pick(exclude=tried)
+        if url is None:
+            last_err = last_err or RuntimeError("no Overpass mirror available (circuit breakers open, probes in flight)")
+            break
+        if wait > OVERPASS_MAX_WAIT:
+            OVERPASS_SCHEDULER.release(url)
+            last_err = last_err or RuntimeError(f"all Overpass mirrors throttled for {round(wait)}s")
+            break
+        if wait > 0:
+            telemetry.note(rate_wait_s=wait)
+            time.sleep(wait)
+        tried.append(url)
 
         try:
-            with OVERPASS_SEM:
-                resp = requests.post(
+            http_pool.acquire(url)   # rate token first, so a throttled mirror doesn't hold a semaphore slot
+            with telemetry.acquire(OVERPASS_SEM):
+                t0 = time.monotonic()
+                resp = http_pool.post(
                     url,
+                    acquired=True,
                     data={"data": query},
                     headers={"User-Agent": NOMINATIM_UA},
                     timeout=base_timeout,
                 )
-            if resp.status_code in (429, 502, 503, 504):
-                # transient server throttling/errors
-                last_err = requests.HTTPError(f"{resp.status_code} from {url}")
-            else:
-                resp.raise_for_status()
-                return resp.json()
+                elapsed = time.monotonic() - t0
         except Exception as e:
+            OVERPASS_SCHEDULER.record(url, ok=False, error=str(e))
             last_err = e
+            continue
 
-        time.sleep(backoff)
-
-    # Final attempt: try to slightly reduce the server load by lowering 'out' limit if present
-    slim_q = query.replace("out center 60;", "out center 30;").replace("out center 100;", "out center 60;")
-    try:
-        with OVERPASS_SEM:
-            resp = requests.post(
-                endpoints[0],
-                data={"data": slim_q},
-                headers={"User-Agent": NOMINATIM_UA},
-                timeout=base_timeout,
-            )
-        resp.raise_for_status()
-        return resp.json()
-    except Exception:
-        pass
+        if resp.status_code == 429 or resp.status_code >= 500:
+            OVERPASS_SCHEDULER.record(url, ok=False, latency=elapsed, status=resp.status_code,
+                                      retry_after=resp.headers.get("Retry-After"))
+            last_err = requests.HTTPError(f"{resp.status_code} from {url}", response=resp)
+            continue
+        if resp.status_code >= 400:
+            # any other 4xx (e.g. 400 for a malformed query) is our fault, not the mirror's:
+            # the mirror answered fine, and every other mirror would say the same
+            OVERPASS_SCHEDULER.record(url, ok=True, status=resp.status_code)   # no latency: a quick reject isn't a speed sample
+            raise requests.HTTPError(f"{resp.status_code} from {url}", response=resp)
+        try:
+            js = resp.json()
+        except ValueError as e:
+            OVERPASS_SCHEDULER.record(url, ok=False, latency=elapsed, status=resp.status_code, error="invalid JSON")
+            last_err = e
+            continue
+        if "runtime error" in (js.get("remark") or ""):
+            # server-side timeout/out-of-memory: the mirror is overloaded, try another one
+            OVERPASS_SCHEDULER.record(url, ok=False, latency=elapsed, status=resp.status_code, error=js["remark"])
+            last_payload = js
+            continue
+        OVERPASS_SCHEDULER.record(url, ok=True, latency=elapsed, status=resp.status_code)
+        return js
 
+    if last_payload is not None:
+        return last_payload
     raise last_err or RuntimeError("Overpass request failed after retries")
 
 
 def fcc_county_fips(lat: float, lon: float) -> Dict[str, Any]:
-    url = "https://geo.fcc.gov/api/census/block/find"
-    resp = requests.get(url, params={"latitude": lat, "longitude": lon, "format": "json", "showall": True}, timeout=30)
-    resp.raise_for_status()
-    return resp.json()
+    url = FCC_URL
 
-def bls_unemployment_series(county_fips: str) -> float | None:
+    def fetch():
+        telemetry.note(cache="miss")
+        http_pool.acquire(url)
+        with telemetry.acquire(FCC_SEM):
+            resp = http_pool.get(url, acquired=True, params={"latitude": lat, "longitude": lon, "format": "json", "showall": True}, timeout=30)
+        resp.raise_for_status()
+        return resp.json()
+
+    with telemetry.span("call", "fcc_county_fips", cache="hit"):
+        return GEO_CACHE.fetch("fcc", {"lat": lat, "lon": lon}, fetch)
+
+BLS_URL = os.environ.get("BLS_URL", "https://api.bls.gov/publicAPI/v2/timeseries/data/")
+BLS_FLIGHTS = SingleFlight()   # series ids currently being fetched, shared between concurrent runs
+
+def bls_series_id(county_fips: str) -> str | None:
     if len(county_fips) != 5:
         return None
-    state = county_fips[:2]
-    county = county_fips[2:]
-    series = f"LAUCN{state}{county}000000006A"
-    url = "https://api.bls.gov/publicAPI/v2/timeseries/data/"
-    payload = {"seriesid": [series]}
-    api_key = os.environ.get("BLS_API_KEY")
-    if api_key:
-        payload["registrationkey"] = api_key
-    resp = requests.post(url, json=payload, timeout=60)
-    if resp.status_code == 429:
-        return None
-    resp.raise_for_status()
-    data = resp.json()
-    if data.get("status") != "REQUEST_SUCCEEDED":
-        return None
-    series_data = data["Results"]["series"][0]["data"]
+    return f"LAUCN{county_fips[:2]}{county_fips[2:]}000000006A"
+
+def _latest_value(series_data: List[Dict[str, Any]]) -> float | None:
     if not series_data:
         return None
-    latest = series_data[0]
     try:
-        return float(latest["value"])
+        return float(series_data[0]["value"])
     except Exception:
         return None
 
+def bls_unemployment_rates(county_fips_list: List[str]) -> Dict[str, float | None]:
+    """Latest unemployment rate per county FIPS, fetched with as few BLS POSTs as possible.
+
+    Duplicate counties are collapsed, cached series are served from GEO_CACHE, and the rest go
+    out in chunks of up to 50 series ids (25 without a registration key) per request.
+    """
+    with telemetry.span("call", "bls_unemployment_rates"):
+        return _bls_unemployment_rates(county_fips_list)
+
+def _bls_unemployment_rates(county_fips_list: List[str]) -> Dict[str, float | None]:
+    series_by_fips = {f: bls_series_id(f) for f in dict.fromkeys(county_fips_list)}
+    data_by_series: Dict[str, List[Dict[str, Any]]] = {}
+    missing = []
+    for series in dict.fromkeys(v for v in series_by_fips.values() if v):
+        hit, series_data = GEO_CACHE.get("bls", {"seriesid": series})
+        if hit:
+            data_by_series[series] = series_data
+        else:
+            missing.append(series)
+    telemetry.note(cache_hits=len(data_by_series), cache_misses=len(missing))
+    # series another run (e.g. a neighbouring metro in a batch) is fetching right now are waited for
+    missing, pending = BLS_FLIGHTS.claim(missing)
+
+    api_key = os.environ.get("BLS_API_KEY")
+    chunk = 50 if api_key else 25
+    try:
+        for i in range(0, len(missing), chunk):
+            payload: Dict[str, Any] = {"seriesid": missing[i:i + chunk]}
+            if api_key:
+                payload["registrationkey"] = api_key
+            http_pool.acquire(BLS_URL)
+            with telemetry.acquire(BLS_SEM):
+                resp = http_pool.post(BLS_URL, acquired=True, json=payload, timeout=60)
+            if resp.status_code == 429:
+                continue
+            resp.raise_for_status()
+            data = resp.json()
+            # only successful responses are cached; throttled/failed ones are retried next run
+            if data.get("status") != "REQUEST_SUCCEEDED":
+                continue
+            for item in data.get("Results", {}).get("series", []):
+                series, series_data = item.get("seriesID"), item.get("data") or []
+                data_by_series[series] = series_data
+                if series_data:
+                    GEO_CACHE.put("bls", {"seriesid": series}, series_data)
+    except BaseException as e:
+        for series in missing:
+            BLS_FLIGHTS.resolve(series, error=e)
+        raise
+    for series in missing:
+        BLS_FLIGHTS.resolve(series, data_by_series.get(series))
+    for series, fut in pending.items():
+        series_data = fut.result()
+        if series_data is not None:
+            data_by_series[series] = series_data
+
+    return {
+        f: (_latest_value(data_by_series.get(series, [])) if series else None)
+        for f, series in series_by_fips.items()
+    }
+
+def bls_unemployment_series(county_fips: str) -> float | None:
+    return bls_unemployment_rates([county_fips]).get(county_fips)
+
+# -----------------------------
+# OSM feature sources: live Overpass (default) or a local extract (OSM_BACKEND=offline)
+# -----------------------------
+
+def motorway_query(bbox: Tuple[float, float, float, float]) -> str:
+    s, w, n, e = bbox
+    return f"""
+    [out:json][timeout:90];
+    way({s},{w},{n},{e})["highway"~"motorway|trunk"];
+    out geom;
+    """
+
+def infra_query(bbox: Tuple[float, float, float, float]) -> str:
+    bb = ",".join(str(v) for v in bbox)
+    return f"""
+    [out:json][timeout:90];
+    (
+      node({bb})["power"~"substation|generator"];
+      way({bb})["power"~"substation|generator"];
+      node({bb})["man_made"="water_tower"];
+      way({bb})["man_made"="water_tower"];
+      node({bb})["man_made"~"mast|communications_tower|monitoring_station"];
+      way({bb})["man_made"~"mast|communications_tower|monitoring_station"];
+      way({bb})["pipeline"];
+    );
+    out geom;
+    """
+
+_offline_engine = None
+_offline_lock = threading.Lock()
+
+def offline_osm():
+    """The loaded offline extract (OSM_EXTRACT), loaded once on first use."""
+    global _offline_engine
+    if _offline_engine is None:
+        with _offline_lock:
+            if _offline_engine is None:
+                if not OSM_EXTRACT:
+                    raise RuntimeError("OSM_BACKEND=offline needs OSM_EXTRACT pointing at an extract built by osm_offline.py")
+                _offline_engine = OfflineOSM.load(OSM_EXTRACT)
+    return _offline_engine
+
+def fetch_industrial(center: Tuple[float, float], radius_km: float, limit: int) -> Dict[str, Any]:
+    if OSM_BACKEND == "offline":
+        return offline_osm().industrial_around(center, radius_km, limit)
+    lat, lon = center
+    radius_m = int(radius_km * 1000)
+    q = f"""
+    [out:json][timeout:60];
+    (
+      way(around:{radius_m},{lat},{lon})["landuse"="industrial"];
+      relation(around:{radius_m},{lat},{lon})["landuse"="industrial"];
+    );
+    out center {limit};
+    """
+    return overpass(q)
+
+def overpass_tiles(make_query: Callable[[Tuple[float, float, float, float]], str],
+                   bbox: Tuple[float, float, float, float], cached_only: bool = False) -> Dict[str, Any] | None:
+    """One query per RANKER_TILE_DEG grid cell under bbox, elements merged (a way crossing a cell
+    edge comes back from both cells; it's kept once). cached_only: None unless every cell is cached."""
+    elements: List[Dict[str, Any]] = []
+    seen = set()
+    for tile in bbox_tiles(bbox, RANKER_TILE_DEG):
+        q = make_query(tile)
+        js = overpass_cached(q) if cached_only else overpass(q)
+        if js is None:
+            return None
+        for el in js.get("elements", []):
+            key = (el.get("type"), el.get("id"))
+            if key not in seen:
+                seen.add(key)
+                elements.append(el)
+    return {"elements": elements}
+
+def fetch_motorways(bbox: Tuple[float, float, float, float], cached_only: bool = False) -> Dict[str, Any] | None:
+    """Motorway/trunk ways in bbox with geometry. cached_only: return None instead of going to the network."""
+    if OSM_BACKEND == "offline":
+        return offline_osm().motorways_in_bbox(bbox)
+    return overpass_tiles(motorway_query, bbox, cached_only)
+
+def fetch_infra(bbox: Tuple[float, float, float, float], cached_only: bool = False) -> Dict[str, Any] | None:
+    """Power/water/telecom/pipeline features in bbox with geometry (see fetch_motorways)."""
+    if OSM_BACKEND == "offline":
+        return offline_osm().infra_in_bbox(bbox)
+    return overpass_tiles(infra_query, bbox, cached_only)
+
 # -----------------------------
 # LangGraph workflow state
 # -----------------------------
@@ -148,7 +394,10 @@ class SGState(TypedDict, total=False):
     prompt: str
     location: str
     center: Tuple[float, float]
+    candidate_pool: int                       # stage 1: sites kept by ideation
+    max_candidates: int                       # stage 2: sites sent through the remote-API rankers
     candidates: List[Tuple[float, float]]
+    prescreen: Dict[str, Any]
     zoning: Dict[str, Any]
     infra: Dict[str, Any]
     labor: Dict[str, Any]
@@ -158,6 +407,66 @@ class SGState(TypedDict, total=False):
 def log(state: SGState, msg: str):
     print(msg, flush=True)
 
+def candidates(state: SGState) -> List[Tuple[float, float]]:
+    # results are keyed by str(candidate); a run resumed from a checkpoint gets its
+    # candidates back as lists, so normalize before building keys
+    return [tuple(c) for c in state["candidates"]]
+
+# -----------------------------
+# Scoring (pure; shared by the rankers and rescore_facts)
+# -----------------------------
+
+def zoning_score(nearest_km: float | None, compatible: bool, weights: Dict[str, float] | None = None) -> Tuple[float, float]:
+    """(score, proximity) — proximity decays exponentially with an 8km length scale."""
+    w = weights or ZONING_WEIGHTS
+    # nearer = much higher, >25km ~ 0
+    prox = 0.0 if nearest_km is None else math.exp(-(nearest_km / 8.0))   # 0km→1.0, 8km→~0.37, 16km→~0.14
+    compat_score = 1.0 if compatible else 0.0
+    return round(w["compatible"] * compat_score + w["proximity"] * prox, 3), prox
+
+def labor_score(rate: float | None, d_center_km: float, weights: Dict[str, float] | None = None) -> Tuple[float, float, float]:
+    """(score, unemployment score, workforce proximity)."""
+    w = weights or LABOR_WEIGHTS
+    # unemployment score: center around 5% (neutral ~0.5), nicer spread
+    # 2% → ~0.875, 5% → 0.5, 10% → ~0.0 (clipped)
+    if rate is None:
+        unemp_score = 0.5  # impute neutral instead of blanket ties
+    else:
+        unemp_score = 1.0 - (max(0.0, rate - 2.0) / 8.0)  # >10% floors near 0
+        unemp_score = max(0.0, min(1.0, unemp_score))
+    # proximity to workforce: closer to city center → larger available labor pool (proxy)
+    prox_work = math.exp(-(d_center_km / 20.0))  # 0km→1.0, 20km→0.37, 40km→0.14
+    return round(w["unemployment"] * unemp_score + w["proximity"] * prox_work, 3), unemp_score, prox_work
+
+def infra_kind(tags: Dict[str, Any]) -> str | None:
+    if tags.get("power") == "generator":
+        return "generator"
+    if tags.get("power") == "substation":
+        return "substation"
+    if "pipeline" in tags:
+        return "pipeline"
+    return tags.get("man_made")
+
+def infra_scores(counts: Dict[str, Dict[str, int]], weights: Dict[str, float] | None = None) -> Dict[str, Tuple[float, float]]:
+    """Per candidate (weighted sum, score) from feature counts by kind, log-normalized across the batch."""
+    w = weights or INFRA_WEIGHTS
+    wsums = {key: float(sum(w.get(kind, 0.0) * n for kind, n in cnt.items())) for key, cnt in counts.items()}
+    denom = _log_norm_denom(list(wsums.values()))
+    return {key: (wsum, round(max(0.0, min(1.0, math.log1p(wsum) / math.log1p(denom))), 3))
+            for key, wsum in wsums.items()}
+
+def combine_score(zoning: float, infra: float, labor: float, weights: Dict[str, float] | None = None) -> float:
+    w = weights or COMBINE_WEIGHTS
+    return w["zoning"] * zoning + w["infra"] * infra + w["labor"] * labor   # keep [0,1]
+
+def _log_norm_denom(values: List[float]) -> float:
+    # batch normalization reference for infra sums: 95th percentile, at least 1
+    vals = sorted(values)
+    if not vals:
+        return 1.0
+    p95 = vals[int(0.95 * (len(vals) - 1))] if len(vals) > 1 else (vals[0] or 1.0)
+    return max(p95, 1.0)  # avoid div/0
+
 # -----------------------------
 # Nodes
 # -----------------------------
@@ -172,144 +481,149 @@ def input_parser(state: SGState) -> SGState:
         else:
             loc = text
         loc = loc.strip().strip(".")
+    if state.get("center"):
+        # batch mode geocodes every location up front
+        lat, lon = state["center"]
+        return {"location": loc, "center": (lat, lon)}
     lat, lon = geocode_nominatim(loc)
-    time.sleep(1.0)
     log(state, f"  Geocoded '{loc}' to ({lat}, {lon})")
     return {"location": loc, "center": (lat, lon)}
 
 def ideation_node(state: SGState) -> SGState:
     lat, lon = state["center"]
     log(state, "✨ [Ideation] Finding industrial landuse polygons via Overpass...")
-    q = f"""
-    [out:json][timeout:60];
-    (
-      way(around:20000,{lat},{lon})["landuse"="industrial"];
-      relation(around:20000,{lat},{lon})["landuse"="industrial"];
-    );
-    out center 30;
-    """
-    js = overpass(q)
+    pool = state.get("candidate_pool") or IDEATION_LIMIT
+    js = fetch_industrial((lat, lon), IDEATION_RADIUS_KM, max(IDEATION_SAMPLE, 3 * pool))
     centers = []
     for el in js.get("elements", []):
         if "center" in el:
             centers.append( (el["center"]["lat"], el["center"]["lon"]) )
-    uniq = []
-    for c in centers:
-        if all(haversine_km(c, u) > 0.5 for u in uniq):
-            uniq.append(c)
-        if len(uniq) >= 10:
-            break
+    uniq = grid_dedup(centers, IDEATION_DEDUP_KM, limit=pool)
     if not uniq:
         raise RuntimeError("No industrial sites found within 20km. Try another area.")
-    for i, c in enumerate(uniq, 1):
+    for i, c in enumerate(uniq[:20], 1):
         log(None, f"→ Candidate {i}: {c}")   # or simply log(_, msg)
-    time.sleep(1.0)
+    if len(uniq) > 20:
+        log(None, f"→ ... {len(uniq) - 20} more candidates")
     return {"candidates": uniq}
 
+def _ranker_bbox(state: SGState, radius_km: float) -> Tuple[float, float, float, float]:
+    """Query area for a ranker: the candidates plus the ranker radius (fetched per grid cell, see overpass_tiles)."""
+    return bbox_around(candidates(state), radius_km)
+
+def prescreen_node(state: SGState) -> SGState:
+    """Stage 1 → 2: rank the ideation pool with a cheap local score and keep the top max_candidates.
+
+    Uses distance to center plus any motorway / infra data already in the response cache
+    or the offline extract (no network). When the pool already fits, candidates pass through unchanged.
+    """
+    cands = candidates(state)
+    k = state.get("max_candidates")
+    if not k or len(cands) <= k:
+        log(state, f"🔎 [Prescreen] {len(cands)} candidates fit the limit; passing all to the rankers")
+        return {}
+    log(state, f"🔎 [Prescreen] Cheap scoring of {len(cands)} candidates, keeping top {k}...")
+
+    pts = as_points(cands)
+    comps: Dict[str, np.ndarray] = {
+        "center": np.exp(-(haversine_km_many(state["center"], pts) / 20.0)),
+    }
+
+    js = fetch_motorways(_ranker_bbox(state, ZONING_RADIUS_KM), cached_only=True)
+    if js is not None:
+        index = ElementIndex([el for el in js.get("elements", []) if el.get("type") == "way"])
+        prox = np.zeros(len(cands))
+        for i, c in enumerate(cands):
+            d = index.center_distances(c)[index.within(c, ZONING_RADIUS_KM)]
+            d = d[~np.isnan(d)]
+            if d.size:
+                prox[i] = math.exp(-(float(d.min()) / 8.0))
+        comps["zoning"] = ZONING_WEIGHTS["compatible"] + ZONING_WEIGHTS["proximity"] * prox
+
+    js = fetch_infra(_ranker_bbox(state, INFRA_RADIUS_KM), cached_only=True)
+    if js is not None:
+        features = [el for el in js.get("elements", []) if el.get("tags")]
+        index = ElementIndex(features)
+        feature_w = np.array([_infra_weight(el["tags"], INFRA_WEIGHTS) for el in features], dtype=float)
+        wsums = np.array([feature_w[index.within(c, INFRA_RADIUS_KM)].sum() for c in cands])
+        denom = _log_norm_denom(wsums.tolist())
+        comps["infra"] = np.clip(np.log1p(wsums) / math.log1p(denom), 0.0, 1.0)
+
+    total_w = sum(PRESCREEN_WEIGHTS[name] for name in comps)
+    total = sum(PRESCREEN_WEIGHTS[name] * comp for name, comp in comps.items()) / total_w
+    order = np.argsort(-total, kind="stable")[:k]
+    top = [cands[i] for i in order]
+
+    log(None, f"  components used: {sorted(comps)}")
+    for rank, i in enumerate(order, 1):
+        log(None, f"  #{rank} {cands[i]} → prescore={round(float(total[i]), 3)}")
+    return {
+        "candidates": top,
+        "prescreen": {
+            "pool_size": len(cands),
+            "components": sorted(comps),
+            "scores": {str(cands[i]): round(float(total[i]), 3) for i in order},
+        },
+    }
+
 def zoning_ranker(state: SGState) -> SGState:
     log(state, "🏷️ [Zoning Ranker] Checking industrial compatibility and highway proximity...")
+    cands = candidates(state)
+    # one query over the bounding area of all candidates; per-candidate matching is done locally
+    js = fetch_motorways(_ranker_bbox(state, ZONING_RADIUS_KM))
+    # Overpass returns ways sorted by id; keep that order so the per-candidate cap below
+    # selects the same ways the old `out center 60` per-candidate query did
+    ways = sorted((el for el in js.get("elements", []) if el.get("type") == "way"), key=lambda el: el["id"])
+
+    index = ElementIndex(ways)
+
     results = {}
-    for c in state["candidates"]:
-        q = f"""
-        [out:json][timeout:60];
-        way(around:15000,{c[0]},{c[1]})["highway"~"motorway|trunk"];
-        out center 60;
-        """
-        js = overpass(q)
-        nearest = None
-        for w in js.get("elements", []):
-            if "center" in w:
-                d = haversine_km((w["center"]["lat"], w["center"]["lon"]), c)
-                nearest = d if (nearest is None or d < nearest) else nearest
-
-        # continuous proximity score on [0,1], exponential decay with 8km length scale
-        # nearer = much higher, >25km ~ 0
-        if nearest is None:
-            prox = 0.0
-            nearest_val = 99.0
-        else:
-            nearest_val = round(nearest, 2)
-            prox = math.exp(-(nearest / 8.0))          # 0km→1.0, 8km→~0.37, 16km→~0.14
+    for c in cands:
+        near = np.flatnonzero(index.within(c, ZONING_RADIUS_KM))[:ZONING_OUT_LIMIT]
+        d = index.center_distances(c)[near]
+        d = d[~np.isnan(d)]
+        nearest = float(d.min()) if d.size else None
+        nearest_val = 99.0 if nearest is None else round(nearest, 2)
 
         compat = True  # ideation filtered landuse=industrial
-        compat_score = 1.0 if compat else 0.0
-
-        # weight industrial compatibility and proximity (tunable)
-        score = round(0.4 * compat_score + 0.6 * prox, 3)
+        # weight industrial compatibility and proximity (ZONING_WEIGHTS)
+        score, prox = zoning_score(nearest, compat)
 
         results[str(c)] = {
             "compatible": compat,
             "nearest_motorway_km": nearest_val,
             "proximity_score": round(prox, 3),
-            "score": score
+            "score": score,
+            "raw": {"nearest_km": nearest, "compatible": compat},
         }
         log(None, f"  {c} → motorway {nearest_val} km | prox={round(prox,3)} | score={score}")
     return {"zoning": results}
     
+def _infra_weight(tags: Dict[str, Any], weights: Dict[str, float]) -> float:
+    return weights.get(infra_kind(tags), 0.0)
+
 def infrastructure_ranker(state: SGState) -> SGState:
     log(state, "⚡ [Infrastructure Ranker] Weighted log-scale of nearby infra features (batch-normalized)...")
-    weights = {
-        "generator": 4.0, "substation": 3.0, "pipeline": 2.0,
-        "mast": 1.0, "communications_tower": 1.0, "monitoring_station": 1.0, "water_tower": 1.0
-    }
+    cands = candidates(state)
+    js = fetch_infra(_ranker_bbox(state, INFRA_RADIUS_KM))
+    features = [el for el in js.get("elements", []) if el.get("tags")]
+    index = ElementIndex(features)
+    kinds = sorted({infra_kind(el["tags"]) or "" for el in features})
+    kind_idx = np.array([kinds.index(infra_kind(el["tags"]) or "") for el in features], dtype=int)
 
-    wsums: Dict[str, float] = {}
-    details: Dict[str, Dict[str, Any]] = {}
-
-    for c in state["candidates"]:
-        lat, lon = c
-        q = f"""
-        [out:json][timeout:60];
-        (
-          node(around:10000,{lat},{lon})["power"~"substation|generator"];
-          way(around:10000,{lat},{lon})["power"~"substation|generator"];
-          node(around:10000,{lat},{lon})["man_made"="water_tower"];
-          way(around:10000,{lat},{lon})["man_made"="water_tower"];
-          node(around:10000,{lat},{lon})["man_made"~"mast|communications_tower|monitoring_station"];
-          way(around:10000,{lat},{lon})["man_made"~"mast|communications_tower|monitoring_station"];
-          way(around:10000,{lat},{lon})["pipeline"];
-        );
-        out tags center;
-        """
-        js = overpass(q)
-
-        wsum = 0.0
-        for el in js.get("elements", []):
-            tags = el.get("tags", {})
-            if not tags:
-                continue
-            if tags.get("power") == "generator":
-                wsum += weights["generator"]
-            elif tags.get("power") == "substation":
-                wsum += weights["substation"]
-            elif "pipeline" in tags:
-                wsum += weights["pipeline"]
-            else:
-                mm = tags.get("man_made")
-                if mm in weights:
-                    wsum += weights[mm]
-
-        key = str(c)
-        wsums[key] = wsum
-        details[key] = {"weighted_sum": round(wsum, 1)}
+    # feature counts by kind within the radius are the raw measurement; weights apply afterwards
+    counts: Dict[str, Dict[str, int]] = {}
+    for c in cands:
+        per_kind = np.bincount(kind_idx[index.within(c, INFRA_RADIUS_KM)], minlength=len(kinds))
+        counts[str(c)] = {kinds[j]: int(n) for j, n in enumerate(per_kind) if n and kinds[j]}
 
     # ------- batch normalization (log1p, relative to 95th percentile) -------
-    vals = sorted(wsums.values())
-    if vals:
-        p95 = vals[int(0.95 * (len(vals) - 1))] if len(vals) > 1 else (vals[0] or 1.0)
-        denom = max(p95, 1.0)  # avoid div/0
-    else:
-        denom = 1.0
-
     results: Dict[str, Any] = {}
-    for key, wsum in wsums.items():
-        score = math.log1p(wsum) / math.log1p(denom)
-        score = max(0.0, min(1.0, score))
-        score = round(score, 3)
-        results[key] = {**details[key], "score": score}
+    for key, (wsum, score) in infra_scores(counts).items():
+        results[key] = {"weighted_sum": round(wsum, 1), "score": score, "raw": {"counts": counts[key]}}
 
     # logs
-    for c in state["candidates"]:
+    for c in candidates(state):
         key = str(c)
         log(None, f"  {c} → infra weighted={results[key]['weighted_sum']} | score={results[key]['score']}")
 
@@ -320,50 +634,72 @@ def infrastructure_ranker(state: SGState) -> SGState:
 def labor_market_ranker(state: SGState) -> SGState:
     log(state, "👷 [Labor Market Ranker] Combining unemployment and proximity-to-center...")
     center = state["center"]
-    results = {}
-    # For normalization of distance, we’ll score 0km→1.0 and 40km→~0.135 (exp decay).
-    for c in state["candidates"]:
-        js = fcc_county_fips(c[0], c[1])
-        county_fips = js["County"]["FIPS"]
-        county_name = js["County"]["name"]
-        rate = bls_unemployment_series(county_fips)
-
-        # unemployment score: center around 5% (neutral ~0.5), nicer spread
-        # 2% → ~0.875, 5% → 0.5, 10% → ~0.0 (clipped)
-        if rate is None:
-            unemp_score = 0.5  # impute neutral instead of blanket ties
-        else:
-            unemp_score = 1.0 - (max(0.0, rate - 2.0) / 8.0)  # >10% floors near 0
-            unemp_score = max(0.0, min(1.0, unemp_score))
+    cands = candidates(state)
 
-        # proximity to workforce: closer to city center → larger available labor pool (proxy)
-        d_center = haversine_km(c, center)
-        prox_work = math.exp(-(d_center / 20.0))  # 0km→1.0, 20km→0.37, 40km→0.14
+    parent = contextvars.copy_context()   # pool threads report their FCC spans under this node
 
-        # combine (tunable): unemployment 60%, proximity 40%
-        score = round(0.6 * unemp_score + 0.4 * prox_work, 3)
+    def lookup(c):
+        js = parent.copy().run(fcc_county_fips, c[0], c[1])
+        return js["County"]["FIPS"], js["County"]["name"]
+
+    # fan out the slow FCC round trips; the per-host semaphore caps the load on the API and
+    # map() hands results back in candidate order, so output stays deterministic
+    with ThreadPoolExecutor(max_workers=max(1, min(LABOR_WORKERS, len(cands)))) as pool:
+        counties = list(pool.map(lookup, cands))
+
+    # neighbouring candidates usually share a county: one BLS request for the unique set
+    rates = bls_unemployment_rates([fips for fips, _ in counties])
+
+    d_centers = haversine_km_many(center, cands)
+
+    results = {}
+    for c, (county_fips, county_name), d_center in zip(cands, counties, d_centers.tolist()):
+        rate = rates.get(county_fips)
+        # combine (LABOR_WEIGHTS): unemployment 60%, proximity 40%
+        score, unemp_score, prox_work = labor_score(rate, d_center)
 
         results[str(c)] = {
             "county": county_name, "county_fips": county_fips,
             "unemployment_rate": rate, "unemp_score": round(unemp_score, 3),
             "distance_to_center_km": round(d_center, 2), "workforce_prox": round(prox_work, 3),
-            "score": score
+            "score": score,
+            "raw": {"unemployment_rate": rate, "distance_to_center_km": d_center},
         }
         log(None, f"  {c} → {county_name} ({county_fips}) unemp={rate}% unemp_s={round(unemp_score,3)} "
                   f"d_center={round(d_center,2)}km prox={round(prox_work,3)} | score={score}")
     return {"labor": results}
 
+def _public(result: Dict[str, Any]) -> Dict[str, Any]:
+    # raw measurements are for rescoring; keep them out of the LLM prompt
+    return {k: v for k, v in result.items() if k != "raw"}
+
+def template_report(location: str, combined: List[Tuple[Any, float, float]], zoning: Dict[str, Any],
+                    infra: Dict[str, Any], labor: Dict[str, Any]) -> str:
+    """Markdown report without an LLM; combined is [(candidate, total, display score)] best first."""
+    lines = [f"# Site Sourcing Report — {location}", ""]
+    for i, (c, s, disp) in enumerate(combined, 1):
+        z = zoning[str(c)]
+        i_det = infra[str(c)]
+        l = labor[str(c)]
+        lines += [
+            f"**{i}. {tuple(c)} — Score {disp}/100.00**",
+            f"- Zoning/Access: motorway {z['nearest_motorway_km']} km; compatible industrial = {z['compatible']}",
+            f"- Infrastructure (10km radius): {i_det['infra_objects_8km']} relevant OSM features" if 'infra_objects_8km' in i_det else f"- Infrastructure score: {i_det['score']}",
+            f"- Labor: county {l['county']} ({l['county_fips']}), unemployment {l['unemployment_rate']}%",
+            ""
+        ]
+    return "\n".join(lines)
+
 def report_aggregator(state: SGState) -> SGState:
     log(state, "🧾 [Report Aggregator] Combining scores and drafting report...")
     combined = []
-    for c in state["candidates"]:
+    for c in candidates(state):
         key = str(c)
         z = state["zoning"][key]["score"]
         i = state["infra"][key]["score"]
         l = state["labor"][key]["score"]
-        
-        
-        total = 0.4*z + 0.35*i + 0.25*l         # keep [0,1]
+
+        total = combine_score(z, i, l)           # COMBINE_WEIGHTS, keeps [0,1]
         disp = round(100.0 * total, 2)           # pretty print
         combined.append((c, total, disp))
     combined.sort(key=lambda x: x[1], reverse=True)
@@ -373,9 +709,10 @@ def report_aggregator(state: SGState) -> SGState:
         "candidates": [
             {
                 "coords": list(map(float, map(str, c))),
-                "zoning": state["zoning"][str(c)],
-                "infra": state["infra"][str(c)],
-                "labor": state["labor"][str(c)],
+                "zoning": _public(state["zoning"][str(c)]),
+                "infra": _public(state["infra"][str(c)]),
+                "labor": _public(state["labor"][str(c)]),
+                **({"prescore": state["prescreen"]["scores"][str(c)]} if state.get("prescreen") else {}),
                 "score": s,
                 "score_display": disp
             }
@@ -384,9 +721,7 @@ def report_aggregator(state: SGState) -> SGState:
     }
 
     report_md = None
-    openai_key = os.environ.get("OPENAI_API_KEY")
-    if openai_key:
-        llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.2)
+    if LLM.available:
         prompt = (
             "You are drafting a concise due-diligence note for industrial site selection. "
             "Use only the provided JSON facts; do not fabricate. "
@@ -394,49 +729,269 @@ def report_aggregator(state: SGState) -> SGState:
             "Return GitHub-flavored Markdown.\n\n"
             f"FACTS JSON:\n```json\n{json.dumps(context, indent=2)}\n```"
         )
-        msg = llm.invoke([HumanMessage(content=prompt)])
+        msg = LLM.invoke([HumanMessage(content=prompt)])
         report_md = msg.content
     else:
-        lines = [f"# Site Sourcing Report — {state['location']}", ""]
-        for i, (c, s, disp) in enumerate(combined, 1):
-            z = state["zoning"][str(c)]
-            i_det = state["infra"][str(c)]
-            l = state["labor"][str(c)]
-            lines += [
-                f"**{i}. {tuple(c)} — Score {disp}/100.00**",
-                f"- Zoning/Access: motorway {z['nearest_motorway_km']} km; compatible industrial = {z['compatible']}",
-                f"- Infrastructure (10km radius): {i_det['infra_objects_8km']} relevant OSM features" if 'infra_objects_8km' in i_det else f"- Infrastructure score: {i_det['score']}",
-                f"- Labor: county {l['county']} ({l['county_fips']}), unemployment {l['unemployment_rate']}%",
-                ""
-            ]
-        report_md = "\n".join(lines)
+        report_md = template_report(state["location"], combined, state["zoning"], state["infra"], state["labor"])
 
     print("\n" + report_md + "\n", flush=True)
     return {"report_md": report_md}
 
+# -----------------------------
+# Rescoring from stored measurements (no network)
+# -----------------------------
+
+def facts_from_state(state: SGState) -> Dict[str, Any]:
+    """The raw ranker measurements of a finished run — everything rescore_facts needs."""
+    return {
+        "location": state.get("location"),
+        "center": list(state["center"]) if state.get("center") else None,
+        "candidates": [list(c) for c in candidates(state)],
+        "zoning": {k: v["raw"] for k, v in state["zoning"].items()},
+        "infra": {k: v["raw"] for k, v in state["infra"].items()},
+        "labor": {k: {**v["raw"], "county": v["county"], "county_fips": v["county_fips"]} for k, v in state["labor"].items()},
+    }
+
+def _weights(name: str, defaults: Dict[str, float], override: Dict[str, float] | None, normalize: bool) -> Dict[str, float]:
+    override = override or {}
+    unknown = set(override) - set(defaults)
+    if unknown:
+        raise ValueError(f"unknown {name} weight(s) {sorted(unknown)}; expected {sorted(defaults)}")
+    w = {k: float(override.get(k, v)) for k, v in defaults.items()}
+    if any(v < 0 for v in w.values()):
+        raise ValueError(f"{name} weights must be >= 0")
+    total = sum(w.values())
+    if total <= 0:
+        raise ValueError(f"{name} weights must not all be 0")
+    return {k: v / total for k, v in w.items()} if normalize else w
+
+def rescore_facts(facts: Dict[str, Any], weights: Dict[str, Dict[str, float]] | None = None) -> Dict[str, Any]:
+    """Re-rank a run's stored measurements with new weights and redraft the template report.
+
+    weights may hold "combine", "zoning", "labor" (each renormalized to sum to 1) and
+    "infra" (per feature kind, used as given); anything missing keeps its default.
+    """
+    weights = weights or {}
+    unknown = set(weights) - {"combine", "zoning", "labor", "infra"}
+    if unknown:
+        raise ValueError(f"unknown weight group(s) {sorted(unknown)}")
+    cw = _weights("combine", COMBINE_WEIGHTS, weights.get("combine"), normalize=True)
+    zw = _weights("zoning", ZONING_WEIGHTS, weights.get("zoning"), normalize=True)
+    lw = _weights("labor", LABOR_WEIGHTS, weights.get("labor"), normalize=True)
+    iw = _weights("infra", INFRA_WEIGHTS, weights.get("infra"), normalize=False)
+
+    zoning, infra, labor = {}, {}, {}
+    for key, raw in facts["zoning"].items():
+        score, prox = zoning_score(raw["nearest_km"], raw["compatible"], zw)
+        nearest = raw["nearest_km"]
+        zoning[key] = {"compatible": raw["compatible"], "nearest_motorway_km": 99.0 if nearest is None else round(nearest, 2),
+                       "proximity_score": round(prox, 3), "score": score}
+    for key, (wsum, score) in infra_scores({k: v["counts"] for k, v in facts["infra"].items()}, iw).items():
+        infra[key] = {"weighted_sum": round(wsum, 1), "score": score}
+    for key, raw in facts["labor"].items():
+        score, unemp_score, prox_work = labor_score(raw["unemployment_rate"], raw["distance_to_center_km"], lw)
+        labor[key] = {"county": raw["county"], "county_fips": raw["county_fips"],
+                      "unemployment_rate": raw["unemployment_rate"], "unemp_score": round(unemp_score, 3),
+                      "distance_to_center_km": round(raw["distance_to_center_km"], 2),
+                      "workforce_prox": round(prox_work, 3), "score": score}
+
+    combined = []
+    for c in facts["candidates"]:
+        key = str(tuple(c))
+        total = combine_score(zoning[key]["score"], infra[key]["score"], labor[key]["score"], cw)
+        combined.append((tuple(c), total, round(100.0 * total, 2)))
+    combined.sort(key=lambda x: x[1], reverse=True)
+
+    return {
+        "weights": {"combine": cw, "zoning": zw, "labor": lw, "infra": iw},
+        "ranking": [
+            {"coords": list(c), "score": s, "score_display": disp,
+             "zoning": zoning[str(c)], "infra": infra[str(c)], "labor": labor[str(c)]}
+            for c, s, disp in combined
+        ],
+        "report_md": template_report(facts.get("location"), combined, zoning, infra, labor),
+    }
+
 # -----------------------------
 # DAG construction
 # -----------------------------
 
-def build_graph():
+def traced_node(node_id: str, fn: Callable[[SGState], SGState]):
+    """fn as a graph node inside a telemetry "node" span named by its graph node id (so the critical
+    path can follow the graph's edges). The run is the config's run_id, else its thread_id."""
+    def node(state: SGState, config: RunnableConfig) -> SGState:
+        conf = (config or {}).get("configurable", {})
+        with telemetry.span("node", node_id, run_id=conf.get("run_id") or conf.get("thread_id")):
+            return fn(state)
+    return node
+
+def graph_edges(app) -> List[Tuple[str, str]]:
+    return [(e.source, e.target) for e in app.get_graph().edges]
+
+def build_graph(checkpointer=CHECKPOINTER,
+                wrap: Callable[[str, Callable[[SGState, RunnableConfig], SGState]], Any] | None = None):
+    """Every superstep is checkpointed under the run's thread_id (see checkpoints.py), so
+    invoking with input None and the same thread_id resumes after the last completed node.
+    wrap(node_id, node) decorates each traced node (the server adds its node events this way)."""
     g = StateGraph(SGState)
-    g.add_node("input_parser", input_parser)
-    g.add_node("ideation", ideation_node)
-    g.add_node("zoning_ranker", zoning_ranker)
-    g.add_node("infra_ranker", infrastructure_ranker)
-    g.add_node("labor_ranker", labor_market_ranker)
-    g.add_node("report", report_aggregator)
+    for node_id, fn in [
+        ("input_parser", input_parser),
+        ("ideation", ideation_node),
+        ("prescreen", prescreen_node),
+        ("zoning_ranker", zoning_ranker),
+        ("infra_ranker", infrastructure_ranker),
+        ("labor_ranker", labor_market_ranker),
+        ("report", report_aggregator),
+    ]:
+        node = traced_node(node_id, fn)
+        g.add_node(node_id, wrap(node_id, node) if wrap else node)
 
     g.set_entry_point("input_parser")
     g.add_edge("input_parser", "ideation")
-    g.add_edge("ideation", "zoning_ranker")
-    g.add_edge("ideation", "infra_ranker")
-    g.add_edge("ideation", "labor_ranker")
+    g.add_edge("ideation", "prescreen")
+    g.add_edge("prescreen", "zoning_ranker")
+    g.add_edge("prescreen", "infra_ranker")
+    g.add_edge("prescreen", "labor_ranker")
     g.add_edge("zoning_ranker", "report")
     g.add_edge("infra_ranker", "report")
     g.add_edge("labor_ranker", "report")
     g.add_edge("report", END)
-    return g.compile()
+    return g.compile(checkpointer=checkpointer)
+
+# -----------------------------
+# Batch mode (many locations)
+# -----------------------------
+
+def batch_locations(locations: List[str]) -> List[str]:
+    """Non-empty locations, each place once (first spelling wins; case and spacing are ignored)."""
+    seen: Dict[str, str] = {}
+    for loc in locations:
+        if loc.strip():
+            seen.setdefault(" ".join(loc.lower().split()), loc.strip())
+    return list(seen.values())
+
+def geocode_many(locations: List[str]) -> Tuple[Dict[str, Tuple[float, float]], Dict[str, str]]:
+    """({location: center}, {location: error}) for a batch of place names (see batch_locations).
+
+    Nominatim has no bulk endpoint, so this is the single-place lookup fanned out over a pool:
+    cached names return immediately and the per-host token bucket keeps the rest at 1 req/s.
+    """
+    def lookup(loc):
+        try:
+            return geocode_nominatim(loc), None
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
+
+    centers, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_CONCURRENCY, len(locations)))) as pool:
+        for loc, (center, err) in zip(locations, pool.map(lookup, locations)):
+            if center is not None:
+                centers[loc] = center
+            else:
+                errors[loc] = err
+    return centers, errors
+
+def batch_inits(centers: Dict[str, Tuple[float, float]], prompt: str | None = None,
+                candidate_pool: int | None = None, max_candidates: int | None = None) -> Dict[str, SGState]:
+    """Initial state per geocoded location. Nearby metros share ranker responses through the
+    cached grid cells (overpass_tiles), so nothing batch-specific goes in the state."""
+    inits: Dict[str, SGState] = {}
+    for loc, center in centers.items():
+        init: SGState = {"prompt": prompt or f"Find industrial sites near {loc}", "location": loc, "center": center}
+        if candidate_pool:
+            init["candidate_pool"] = candidate_pool
+        if max_candidates:
+            init["max_candidates"] = max_candidates
+        inits[loc] = init
+    return inits
+
+def combine_facts(facts_list: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """One ranking over several runs' measurements (facts_from_state), best first.
+
+    Zoning and labor scores don't depend on the rest of the batch; infra is log-normalized
+    against the whole set of sites, so a score means the same thing in every metro. A site
+    found from more than one metro keeps its best entry.
+    """
+    counts = {(i, key): raw["counts"] for i, f in enumerate(facts_list) for key, raw in f["infra"].items()}
+    infra = infra_scores(counts)
+    best: Dict[Tuple[float, float], Dict[str, Any]] = {}
+    for i, f in enumerate(facts_list):
+        for c in f["candidates"]:
+            key = str(tuple(c))
+            z, l = f["zoning"][key], f["labor"][key]
+            zs, _ = zoning_score(z["nearest_km"], z["compatible"])
+            ls, _, _ = labor_score(l["unemployment_rate"], l["distance_to_center_km"])
+            wsum, infra_s = infra[(i, key)]
+            total = combine_score(zs, infra_s, ls)
+            row = {
+                "location": f.get("location"), "coords": list(c), "score": total, "score_display": round(100.0 * total, 2),
+                "zoning": zs, "infra": infra_s, "labor": ls,
+                "nearest_motorway_km": None if z["nearest_km"] is None else round(z["nearest_km"], 2),
+                "infra_weighted_sum": round(wsum, 1), "county": l["county"], "county_fips": l["county_fips"],
+                "unemployment_rate": l["unemployment_rate"],
+            }
+            if tuple(c) not in best or total > best[tuple(c)]["score"]:
+                best[tuple(c)] = row
+    return sorted(best.values(), key=lambda r: r["score"], reverse=True)
+
+def combined_report(ranking: List[Dict[str, Any]], metros: List[Dict[str, Any]], top: int = 25) -> str:
+    """Markdown for a batch: the top sites across all metros, then each metro's best site and any failures."""
+    ok = [m for m in metros if m.get("status") == "done"]
+    lines = [f"# Combined Site Ranking — {len(ok)} of {len(metros)} metros", "",
+             "| # | Metro | Site | Score | Zoning | Infra | Labor | Motorway km | County | Unemp. % |",
+             "|---|---|---|---|---|---|---|---|---|---|"]
+    for i, r in enumerate(ranking[:top], 1):
+        lines.append(f"| {i} | {r['location']} | {tuple(r['coords'])} | {r['score_display']} | {r['zoning']} | "
+                     f"{r['infra']} | {r['labor']} | {r['nearest_motorway_km']} | {r['county']} | {r['unemployment_rate']} |")
+    if len(ranking) > top:
+        lines.append(f"\n… {len(ranking) - top} more sites")
+    lines += ["", "## Best site per metro", ""]
+    best = {}
+    for r in ranking:
+        best.setdefault(r["location"], r)
+    for m in metros:
+        r = best.get(m["location"])
+        if r is not None:
+            lines.append(f"- **{m['location']}**: {tuple(r['coords'])} — {r['score_display']}/100")
+        elif m.get("status") == "done":
+            lines.append(f"- **{m['location']}**: no sites")
+    failed = [m for m in metros if m.get("status") != "done"]
+    if failed:
+        lines += ["", "## Failed", ""] + [f"- **{m['location']}** ({m.get('status')}): {m.get('error')}" for m in failed]
+    return "\n".join(lines)
+
+def run_batch(locations: List[str], prompt: str | None = None, candidate_pool: int | None = None,
+              max_candidates: int | None = None, concurrency: int | None = None, top: int = 25,
+              thread_prefix: str | None = None) -> Dict[str, Any]:
+    """Source sites for many locations: bulk geocode, run the graph per metro on a pool (rate limits
+    and response cache are process-wide, so neighbours share fetches), then rank everything together."""
+    locations = batch_locations(locations)
+    prefix = thread_prefix or f"batch-{int(time.time())}-{os.getpid()}"
+    print(f"=== Batch: geocoding {len(locations)} locations ===", flush=True)
+    centers, geo_errors = geocode_many(locations)
+    inits = batch_inits(centers, prompt, candidate_pool, max_candidates)
+
+    app = build_graph()
+    metros = [{"location": loc, "thread_id": f"{prefix}.{i}", "center": centers.get(loc),
+               "status": "error" if loc in geo_errors else "queued", "error": geo_errors.get(loc)}
+              for i, loc in enumerate(locations)]
+
+    def run_one(m):
+        telemetry.TELEMETRY.start_run(m["thread_id"], graph_edges(app))
+        try:
+            state = app.invoke(inits[m["location"]], config=thread_config(m["thread_id"]))
+            m.update(status="done", report_md=state.get("report_md"))
+            return state
+        except Exception as e:
+            m.update(status="error", error=f"{type(e).__name__}: {e}")
+            print(f"=== {m['location']} FAILED ({m['error']}); resume with --resume {m['thread_id']} ===", flush=True)
+            return None
+
+    todo = [m for m in metros if m["status"] == "queued"]
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency or BATCH_CONCURRENCY, len(todo) or 1))) as pool:
+        states = list(pool.map(run_one, todo))
+    ranking = combine_facts([facts_from_state(s) for s in states if s is not None])
+    return {"metros": metros, "ranking": ranking, "report_md": combined_report(ranking, metros, top)}
 
 # -----------------------------
 # Main
@@ -446,15 +1001,67 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--prompt", type=str, default="Find industrial sites near Phoenix, AZ")
     parser.add_argument("--location", type=str, default=None)  # ✅ add this line
+    parser.add_argument("--candidate-pool", type=int, default=None,
+                        help=f"stage 1: sites ideation keeps (default {IDEATION_LIMIT}; thousands is fine)")
+    parser.add_argument("--max-candidates", type=int, default=None,
+                        help="stage 2: top sites (by cheap prescore) sent through the API rankers")
+    parser.add_argument("--osm-extract", type=str, default=None,
+                        help="answer OSM queries from this offline extract instead of live Overpass")
+    parser.add_argument("--resume", type=str, default=None, metavar="THREAD_ID",
+                        help="continue a failed run from its last completed node (other inputs are ignored)")
+    parser.add_argument("--locations", type=str, nargs="+", default=None,
+                        help="batch mode: source sites for each of these locations and rank them together")
+    parser.add_argument("--locations-file", type=str, default=None, help="batch mode: one location per line")
+    parser.add_argument("--batch-concurrency", type=int, default=None,
+                        help=f"batch mode: metros in flight at once (default {BATCH_CONCURRENCY})")
+    parser.add_argument("--top", type=int, default=25, help="batch mode: sites in the combined ranking")
     args = parser.parse_args()
 
+    if args.osm_extract:
+        global OSM_BACKEND, OSM_EXTRACT
+        OSM_BACKEND, OSM_EXTRACT = "offline", args.osm_extract
+
+    if args.locations or args.locations_file:
+        locations = list(args.locations or [])
+        if args.locations_file:
+            with open(args.locations_file, encoding="utf-8") as f:
+                locations += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        # the default single-metro prompt names Phoenix; batch prompts are per location unless given
+        prompt = args.prompt if args.prompt != parser.get_default("prompt") else None
+        out = run_batch(locations, prompt, args.candidate_pool, args.max_candidates, args.batch_concurrency, args.top)
+        print("\n" + out["report_md"] + "\n", flush=True)
+        print("=== BATCH DONE ===", flush=True)
+        return out
+
     app = build_graph()
-    init: SGState = {"prompt": args.prompt}
+    thread_id = args.resume or f"cli-{int(time.time())}-{os.getpid()}"
+    config = thread_config(thread_id)
+    init: SGState | None = {"prompt": args.prompt}
     if args.location:
         init["location"] = args.location  # ✅ pass location into initial state
+    if args.candidate_pool:
+        init["candidate_pool"] = args.candidate_pool
+    if args.max_candidates:
+        init["max_candidates"] = args.max_candidates
+
+    if args.resume:
+        if CHECKPOINTER is None:
+            parser.error("--resume needs checkpoints (unset CHECKPOINT_DISABLE)")
+        snap = app.get_state(config)
+        if not snap.next:
+            print(f"Nothing to resume for {thread_id}" + (" (already finished)" if snap.values else ""), flush=True)
+            return snap.values
+        print(f"=== Resuming {thread_id} at {list(snap.next)} ===", flush=True)
+        init = None
 
-    print("=== Executing Real-API LangGraph ===", flush=True)
-    final_state = app.invoke(init)
+    print(f"=== Executing Real-API LangGraph (thread {thread_id}) ===", flush=True)
+    telemetry.TELEMETRY.start_run(thread_id, graph_edges(app), resumed=init is None)
+    try:
+        final_state = app.invoke(init, config=config)
+    except Exception:
+        if CHECKPOINTER is not None:
+            print(f"=== FAILED; resume with --resume {thread_id} ===", flush=True)
+        raise
     print("=== DONE ===", flush=True)
     return final_state
 
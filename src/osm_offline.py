@@ -0,0 +1,276 @@
+# osm_offline.py
+"""
+Offline OSM engine: answers the ideation / zoning / infrastructure Overpass
+queries from a local regional extract, with no network.
+
+The extract is a small SQLite dump holding only the features the graph looks
+at (industrial landuse, motorways/trunks, power/water/telecom/pipeline). It is
+built once from an OSM PBF (needs the optional `osmium` package) or from a
+GeoJSON export:
+
+    python src/osm_offline.py build arizona-latest.osm.pbf arizona.sqlite
+    python src/osm_offline.py build phoenix.geojson phoenix.sqlite
+
+and loaded into in-memory grid indexes at startup (OSM_BACKEND=offline,
+OSM_EXTRACT=path). Results come back in the same JSON shape Overpass returns
+(`{"elements": [...]}`), so the nodes process them unchanged.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+from typing import Any, Dict, Iterable, List, Tuple
+
+from geo_utils import element_within_km, haversine_km
+
+Bbox = Tuple[float, float, float, float]  # south, west, north, east
+
+_TYPE_ORDER = {"node": 0, "way": 1, "relation": 2}
+
+# -----------------------------
+# Feature classification (mirrors the Overpass filters used by the nodes)
+# -----------------------------
+
+def categories_for(el_type: str, tags: Dict[str, str]) -> List[str]:
+    cats = []
+    if el_type in ("way", "relation") and tags.get("landuse") == "industrial":
+        cats.append("industrial")
+    if el_type == "way" and re.search("motorway|trunk", tags.get("highway", "")):
+        cats.append("motorway")
+    if el_type in ("node", "way"):
+        if (re.search("substation|generator", tags.get("power", ""))
+                or tags.get("man_made") == "water_tower"
+                or re.search("mast|communications_tower|monitoring_station", tags.get("man_made", ""))
+                or (el_type == "way" and "pipeline" in tags)):
+            cats.append("infra")
+    return cats
+
+def _bounds(coords: Iterable[Tuple[float, float]]) -> Dict[str, float]:
+    lats, lons = zip(*coords)
+    return {"minlat": min(lats), "minlon": min(lons), "maxlat": max(lats), "maxlon": max(lons)}
+
+# -----------------------------
+# Engine
+# -----------------------------
+
+class _BBoxGrid:
+    """Buckets element positions by the grid cells their bounding box touches."""
+
+    def __init__(self, cell_deg: float = 0.05):
+        self.cell = cell_deg
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+
+    def _span(self, s: float, w: float, n: float, e: float):
+        c = self.cell
+        for i in range(math.floor(s / c), math.floor(n / c) + 1):
+            for j in range(math.floor(w / c), math.floor(e / c) + 1):
+                yield i, j
+
+    def add(self, pos: int, b: Dict[str, float]):
+        for key in self._span(b["minlat"], b["minlon"], b["maxlat"], b["maxlon"]):
+            self.cells.setdefault(key, []).append(pos)
+
+    def query(self, bbox: Bbox) -> List[int]:
+        seen = set()
+        for key in self._span(*bbox):
+            seen.update(self.cells.get(key, ()))
+        return sorted(seen)
+
+class OfflineOSM:
+    def __init__(self, elements: Dict[str, List[Dict[str, Any]]], path: str | None = None):
+        self.path = path
+        self.elements = {
+            cat: sorted(els, key=lambda el: (_TYPE_ORDER[el["type"]], el["id"]))
+            for cat, els in elements.items()
+        }
+        self.grids: Dict[str, _BBoxGrid] = {}
+        for cat, els in self.elements.items():
+            grid = _BBoxGrid()
+            for pos, el in enumerate(els):
+                grid.add(pos, el["bounds"])
+            self.grids[cat] = grid
+
+    @classmethod
+    def load(cls, path: str) -> "OfflineOSM":
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute("SELECT category, type, id, tags, geometry FROM elements").fetchall()
+        finally:
+            conn.close()
+        elements: Dict[str, List[Dict[str, Any]]] = {"industrial": [], "motorway": [], "infra": []}
+        for cat, el_type, el_id, tags, geometry in rows:
+            elements.setdefault(cat, []).append(_element(el_type, el_id, json.loads(tags), json.loads(geometry)))
+        return cls(elements, path)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "elements": {cat: len(els) for cat, els in self.elements.items()}}
+
+    def _in_bbox(self, cat: str, bbox: Bbox) -> List[Dict[str, Any]]:
+        s, w, n, e = bbox
+        out = []
+        for pos in self.grids[cat].query(bbox):
+            el = self.elements[cat][pos]
+            b = el["bounds"]
+            if b["maxlat"] >= s and b["minlat"] <= n and b["maxlon"] >= w and b["minlon"] <= e:
+                out.append(el)
+        return out   # grid positions are sorted, so this keeps Overpass (type, id) order
+
+    # ---------- the queries the nodes make ----------
+
+    def industrial_around(self, center: Tuple[float, float], radius_km: float, limit: int | None = None) -> Dict[str, Any]:
+        """`(way|relation)(around:r,lat,lon)["landuse"="industrial"]; out center <limit>;`"""
+        dlat = radius_km / 110.574
+        dlon = radius_km / (111.320 * math.cos(math.radians(min(89.0, abs(center[0]) + dlat))))
+        bbox = (center[0] - dlat, center[1] - dlon, center[0] + dlat, center[1] + dlon)
+        out = []
+        for el in self._in_bbox("industrial", bbox):
+            rings = el.get("rings") or [el.get("geometry") or []]
+            if any(element_within_km({"geometry": ring}, center, radius_km) for ring in rings):
+                b = el["bounds"]
+                out.append({
+                    "type": el["type"], "id": el["id"], "tags": el["tags"],
+                    "center": {"lat": (b["minlat"] + b["maxlat"]) / 2.0, "lon": (b["minlon"] + b["maxlon"]) / 2.0},
+                })
+                if limit is not None and len(out) >= limit:
+                    break
+        return {"elements": out}
+
+    def motorways_in_bbox(self, bbox: Bbox) -> Dict[str, Any]:
+        """`way(bbox)["highway"~"motorway|trunk"]; out geom;`"""
+        return {"elements": self._in_bbox("motorway", bbox)}
+
+    def infra_in_bbox(self, bbox: Bbox) -> Dict[str, Any]:
+        """Power / water tower / telecom / pipeline union from the infrastructure ranker; `out geom;`"""
+        return {"elements": self._in_bbox("infra", bbox)}
+
+def _element(el_type: str, el_id: int, tags: Dict[str, str], geometry: Any) -> Dict[str, Any]:
+    """Overpass `out geom` shaped element from a stored row."""
+    if el_type == "node":
+        lat, lon = geometry
+        return {"type": "node", "id": el_id, "lat": lat, "lon": lon, "tags": tags,
+                "bounds": {"minlat": lat, "minlon": lon, "maxlat": lat, "maxlon": lon}}
+    if el_type == "relation":
+        rings = [[{"lat": la, "lon": lo} for la, lo in ring] for ring in geometry]
+        return {"type": "relation", "id": el_id, "tags": tags, "rings": rings,
+                "bounds": _bounds(pt for ring in geometry for pt in ring)}
+    return {"type": "way", "id": el_id, "tags": tags,
+            "geometry": [{"lat": la, "lon": lo} for la, lo in geometry], "bounds": _bounds(geometry)}
+
+# -----------------------------
+# Building the SQLite dump
+# -----------------------------
+
+def _iter_geojson(path: str):
+    """(type, id, tags, geometry) from a GeoJSON export (osmium export / ogr2ogr style)."""
+    with open(path) as f:
+        fc = json.load(f)
+    for n, feat in enumerate(fc.get("features", [])):
+        props = dict(feat.get("properties") or {})
+        tags = props.pop("tags", None) or {k: v for k, v in props.items() if not k.startswith("@")}
+        fid = str(feat.get("id") or props.get("@id") or "")
+        m = re.match(r"(node|way|relation)/?(\d+)", fid)
+        el_id = int(m.group(2)) if m else n
+        geom = feat.get("geometry") or {}
+        coords = geom.get("coordinates")
+        gtype = geom.get("type")
+        if gtype == "Point":
+            yield "node", el_id, tags, [coords[1], coords[0]]
+        elif gtype == "LineString":
+            yield "way", el_id, tags, [[lat, lon] for lon, lat in coords]
+        elif gtype == "Polygon":
+            el_type = m.group(1) if m else "way"
+            ring = [[lat, lon] for lon, lat in coords[0]]
+            if el_type == "relation":
+                yield "relation", el_id, tags, [ring]
+            else:
+                yield "way", el_id, tags, ring
+        elif gtype == "MultiPolygon":
+            yield "relation", el_id, tags, [[[lat, lon] for lon, lat in poly[0]] for poly in coords]
+
+def _iter_pbf(path: str):
+    """(type, id, tags, geometry) from an OSM PBF/XML file via pyosmium."""
+    try:
+        import osmium
+    except ImportError as e:
+        raise RuntimeError("Reading .pbf extracts needs the optional 'osmium' package (pip install osmium)") from e
+
+    out: List[Tuple[str, int, Dict[str, str], Any]] = []
+
+    class Handler(osmium.SimpleHandler):
+        def node(self, n):
+            tags = {t.k: t.v for t in n.tags}
+            if tags and categories_for("node", tags):
+                out.append(("node", n.id, tags, [n.location.lat, n.location.lon]))
+
+        def way(self, w):
+            tags = {t.k: t.v for t in w.tags}
+            if not tags or not categories_for("way", tags):
+                return
+            try:
+                geom = [[nd.location.lat, nd.location.lon] for nd in w.nodes]
+            except osmium.InvalidLocationError:
+                return
+            if geom:
+                out.append(("way", w.id, tags, geom))
+
+        def area(self, a):
+            if a.from_way():
+                return   # closed ways already came through way()
+            tags = {t.k: t.v for t in a.tags}
+            if not categories_for("relation", tags):
+                return
+            rings = [[[nd.lat, nd.lon] for nd in ring] for ring in a.outer_rings()]
+            if rings:
+                out.append(("relation", a.orig_id(), tags, rings))
+
+    Handler().apply_file(path, locations=True)
+    return out
+
+def build_extract(src: str, dest: str) -> Dict[str, int]:
+    rows = _iter_geojson(src) if src.endswith((".geojson", ".json")) else _iter_pbf(src)
+    if os.path.exists(dest):
+        os.remove(dest)
+    conn = sqlite3.connect(dest)
+    counts: Dict[str, int] = {}
+    try:
+        conn.execute("CREATE TABLE elements (category TEXT, type TEXT, id INTEGER, tags TEXT, geometry TEXT)")
+        for el_type, el_id, tags, geometry in rows:
+            for cat in categories_for(el_type, tags):
+                conn.execute("INSERT INTO elements VALUES (?, ?, ?, ?, ?)",
+                             (cat, el_type, el_id, json.dumps(tags), json.dumps(geometry)))
+                counts[cat] = counts.get(cat, 0) + 1
+        conn.commit()
+    finally:
+        conn.close()
+    return counts
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(description="Offline OSM extract tools")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="build the SQLite dump from a .osm.pbf or .geojson extract")
+    b.add_argument("src")
+    b.add_argument("dest")
+    q = sub.add_parser("query", help="sanity-check an extract around a point")
+    q.add_argument("extract")
+    q.add_argument("lat", type=float)
+    q.add_argument("lon", type=float)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        print(json.dumps(build_extract(args.src, args.dest)))
+    else:
+        eng = OfflineOSM.load(args.extract)
+        center = (args.lat, args.lon)
+        ind = eng.industrial_around(center, 20.0)["elements"]
+        print(json.dumps({**eng.stats(), "industrial_within_20km": len(ind)}))
+        if ind:
+            c = ind[0]["center"]
+            print(f"first industrial centroid at {haversine_km(center, (c['lat'], c['lon'])):.2f} km")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,185 @@
+# overpass_scheduler.py
+"""
+Health-aware routing across the public Overpass mirrors.
+
+Each mirror keeps a rolling window of outcomes, an EWMA of latency, any
+Retry-After deadline it handed us, and a small circuit breaker
+(closed -> open after repeated failures -> half-open probe after a cooldown).
+pick() routes to the healthiest mirror that is currently allowed to take traffic.
+"""
+
+from __future__ import annotations
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Tuple
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+def parse_retry_after(value: str | None, now: float | None = None) -> float | None:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    now = time.time() if now is None else now
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - now)
+    except Exception:
+        return None
+
+class _Mirror:
+    def __init__(self, url: str, window: int):
+        self.url = url
+        self.outcomes: deque = deque(maxlen=window)   # True = ok, False = failed
+        self.latency_ewma: float | None = None
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.cooldown = 0.0
+        self.retry_after_until = 0.0
+        self.last_status: int | None = None
+        self.last_error: str | None = None
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1.0 - sum(self.outcomes) / len(self.outcomes)
+
+class EndpointScheduler:
+    def __init__(self, endpoints: Iterable[str], window: int = 20, failure_threshold: int = 3,
+                 base_cooldown: float = 30.0, max_cooldown: float = 600.0, ewma_alpha: float = 0.3,
+                 default_latency: float = 2.0, error_penalty: float = 30.0):
+        self._mirrors: Dict[str, _Mirror] = {u: _Mirror(u, window) for u in endpoints}
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.ewma_alpha = ewma_alpha
+        self.default_latency = default_latency
+        self.error_penalty = error_penalty
+        self._lock = threading.Lock()
+
+    # ---------- routing ----------
+
+    def _score(self, m: _Mirror) -> float:
+        # expected cost (seconds) of sending one more query here; lower is better.
+        # Mirrors we have no latency for yet get the default so they are still tried,
+        # and each recent failure counts roughly like a wasted round trip to a timeout.
+        latency = m.latency_ewma if m.latency_ewma is not None else self.default_latency
+        return latency * (1 + m.in_flight) + self.error_penalty * m.error_rate()
+
+    def _available_at(self, m: _Mirror, now: float) -> float:
+        t = m.retry_after_until
+        if m.state == OPEN:
+            t = max(t, m.open_until)
+        return t
+
+    def pick(self, exclude: Iterable[str] = ()) -> Tuple[str | None, float]:
+        """Return (url, wait_seconds). wait is > 0 only when every mirror is throttled or open;
+        url is None when the only mirrors left are tripped ones that already have their probe out."""
+        exclude = set(exclude)
+        now = time.time()
+        with self._lock:
+            pool = [m for u, m in self._mirrors.items() if u not in exclude] or list(self._mirrors.values())
+            if not pool:
+                return None, 0.0
+            ready = []
+            for m in pool:
+                if self._available_at(m, now) > now:
+                    continue
+                if m.state == OPEN:
+                    m.state = HALF_OPEN          # cooldown elapsed: let one probe through
+                if m.state == HALF_OPEN and m.in_flight > 0:
+                    continue
+                ready.append(m)
+            if ready:
+                best = min(ready, key=self._score)
+                best.in_flight += 1
+                best.requests += 1
+                return best.url, 0.0
+            # an open/half-open mirror with a request out (or a caller sleeping until its cooldown
+            # ends) already has its one probe; don't send it a second
+            waitable = [m for m in pool if m.state == CLOSED or m.in_flight == 0]
+            if not waitable:
+                return None, 0.0
+            soonest = min(waitable, key=lambda m: self._available_at(m, now))
+            soonest.in_flight += 1
+            soonest.requests += 1
+            return soonest.url, max(0.0, self._available_at(soonest, now) - now)
+
+    # ---------- feedback ----------
+
+    def release(self, url: str):
+        """Give back a pick() that was never sent (no outcome to record)."""
+        with self._lock:
+            m = self._mirrors.get(url)
+            if m is not None:
+                m.in_flight = max(0, m.in_flight - 1)
+                m.requests = max(0, m.requests - 1)
+
+    def record(self, url: str, ok: bool, latency: float | None = None, status: int | None = None,
+               retry_after: str | None = None, error: str | None = None):
+        now = time.time()
+        with self._lock:
+            m = self._mirrors.get(url)
+            if m is None:
+                return
+            m.in_flight = max(0, m.in_flight - 1)
+            m.outcomes.append(ok)
+            m.last_status = status
+            if ok:
+                # only successful answers say how fast a mirror really is; fast 429s would flatter it
+                if latency is not None:
+                    a = self.ewma_alpha
+                    m.latency_ewma = latency if m.latency_ewma is None else (a * latency + (1 - a) * m.latency_ewma)
+                m.consecutive_failures = 0
+                m.state = CLOSED
+                m.cooldown = 0.0
+                m.last_error = None
+                return
+            m.failures += 1
+            m.consecutive_failures += 1
+            m.last_error = error or (f"HTTP {status}" if status else None)
+            if status == 429:
+                m.rate_limited += 1
+            wait = parse_retry_after(retry_after, now)
+            if wait is not None:
+                m.retry_after_until = max(m.retry_after_until, now + wait)
+            if m.state == HALF_OPEN or m.consecutive_failures >= self.failure_threshold:
+                # trip (or re-trip) the breaker with a doubling cooldown
+                m.cooldown = min(self.max_cooldown, m.cooldown * 2 if m.cooldown else self.base_cooldown)
+                m.state = OPEN
+                m.open_until = now + m.cooldown
+
+    # ---------- introspection ----------
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            out = []
+            for m in self._mirrors.values():
+                out.append({
+                    "url": m.url,
+                    "state": m.state,
+                    "score": round(self._score(m), 3),
+                    "latency_ewma_s": None if m.latency_ewma is None else round(m.latency_ewma, 3),
+                    "error_rate": round(m.error_rate(), 3),
+                    "in_flight": m.in_flight,
+                    "requests": m.requests,
+                    "failures": m.failures,
+                    "rate_limited": m.rate_limited,
+                    "consecutive_failures": m.consecutive_failures,
+                    "open_for_s": round(max(0.0, m.open_until - now), 1) if m.state == OPEN else 0.0,
+                    "retry_after_s": round(max(0.0, m.retry_after_until - now), 1),
+                    "last_status": m.last_status,
+                    "last_error": m.last_error,
+                })
+            return sorted(out, key=lambda d: d["score"])
@@ -0,0 +1,93 @@
+# rate_limit.py
+"""
+Per-provider token buckets. Every outbound request in http_pool takes a token
+for its host first, so we only ever wait when a provider's published limit
+actually requires it (cache hits never get here).
+"""
+
+from __future__ import annotations
+import threading
+import time
+from typing import Any, Dict
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float = 1.0):
+        self.rate = float(rate)          # tokens per second
+        self.burst = float(burst)        # bucket capacity
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+        self.acquired = 0
+        self.waited = 0
+        self.wait_seconds = 0.0
+
+    def reserve(self) -> float:
+        """Take one token (possibly on credit) and return how long the caller must wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1.0
+            self.acquired += 1
+            if self._tokens >= 0:
+                return 0.0
+            # negative balance = callers queued ahead of us; each waits for its own token
+            wait = -self._tokens / self.rate
+            self.waited += 1
+            self.wait_seconds += wait
+            return wait
+
+    def acquire(self) -> float:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate_per_s": self.rate,
+            "burst": self.burst,
+            "acquired": self.acquired,
+            "waited": self.waited,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+# requests/second and burst per host. Nominatim's usage policy is an absolute max of 1 req/s;
+# BLS allows 50 requests per 10 s with a key; the others are polite client-side defaults.
+RATE_LIMITS: Dict[str, Dict[str, float]] = {
+    "nominatim.openstreetmap.org": {"rate": 1.0, "burst": 1},
+    "overpass-api.de": {"rate": 1.0, "burst": 2},
+    "overpass.kumi.systems": {"rate": 1.0, "burst": 2},
+    "overpass.openstreetmap.ru": {"rate": 1.0, "burst": 2},
+    "geo.fcc.gov": {"rate": 5.0, "burst": 5},
+    "api.bls.gov": {"rate": 2.0, "burst": 5},
+}
+
+_buckets: Dict[str, TokenBucket] = {}
+_lock = threading.Lock()
+
+def configure(host: str, rate: float, burst: float = 1.0):
+    with _lock:
+        RATE_LIMITS[host] = {"rate": rate, "burst": burst}
+        _buckets.pop(host, None)
+
+def bucket_for(host: str) -> TokenBucket | None:
+    """Bucket for a host, or None when the host has no configured limit."""
+    b = _buckets.get(host)
+    if b is None:
+        cfg = RATE_LIMITS.get(host)
+        if cfg is None:
+            return None
+        with _lock:
+            b = _buckets.get(host)
+            if b is None:
+                b = _buckets[host] = TokenBucket(cfg["rate"], cfg.get("burst", 1.0))
+    return b
+
+def acquire(host: str) -> float:
+    b = bucket_for(host)
+    return b.acquire() if b is not None else 0.0
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {host: b.stats() for host, b in _buckets.items()}
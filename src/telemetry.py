@@ -0,0 +1,321 @@
+# telemetry.py
+"""
+Structured timing for graph runs: a span per run, per node and per external
+call (Overpass, Nominatim, FCC, BLS, LLM). Spans nest through contextvars, so
+a call made inside a node (or a thread that copied the node's context) lands
+under that node and run.
+
+Call spans carry duration, bytes received, transport retries, cache hit/miss,
+semaphore wait and rate-limit wait. Finished spans feed Prometheus-style
+histograms/counters (render_prometheus -> /api/metrics) and a bounded
+per-run log used for the critical-path breakdown (/api/runs/{id}/critical_path).
+
+    TELEMETRY_DISABLE=1     no spans are recorded (span() still yields a dict)
+    TELEMETRY_RUNS          runs whose spans are kept for critical paths (default 200)
+"""
+
+from __future__ import annotations
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 1e7, 1e8)
+MAX_SPANS_PER_RUN = 5000
+
+_current: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("telemetry_span", default=None)
+
+# -----------------------------
+# Metric types
+# -----------------------------
+
+def _labels_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _fmt_labels(key: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = key + extra
+    if not items:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in items) + "}"
+
+def _fmt_num(v: float) -> str:
+    return repr(float(v)) if v != int(v) or abs(v) >= 1e15 else str(int(v))
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name, self.help, self.buckets = name, help, tuple(buckets)
+        self._series: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}   # bucket counts..., sum, count
+
+    def observe(self, value: float, **labels):
+        s = self._series.setdefault(_labels_key(labels), [0.0] * (len(self.buckets) + 2))
+        for i, b in enumerate(self.buckets):
+            if value <= b:
+                s[i] += 1
+        s[-2] += value
+        s[-1] += 1
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, s in sorted(self._series.items()):
+            for b, n in zip(self.buckets, s):
+                out.append(f"{self.name}_bucket{_fmt_labels(key, (('le', _fmt_num(b)),))} {_fmt_num(n)}")
+            out.append(f"{self.name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {_fmt_num(s[-1])}")
+            out.append(f"{self.name}_sum{_fmt_labels(key)} {_fmt_num(s[-2])}")
+            out.append(f"{self.name}_count{_fmt_labels(key)} {_fmt_num(s[-1])}")
+        return out
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._series: Dict[Tuple[Tuple[str, str], ...], float] = {}
+
+    def inc(self, value: float = 1.0, **labels):
+        if value:
+            key = _labels_key(labels)
+            self._series[key] = self._series.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        out += [f"{self.name}{_fmt_labels(key)} {_fmt_num(v)}" for key, v in sorted(self._series.items())]
+        return out
+
+# -----------------------------
+# Recorder
+# -----------------------------
+
+class Telemetry:
+    def __init__(self, keep_runs: int = 200, enabled: bool = True):
+        self.enabled = enabled
+        self.keep_runs = keep_runs
+        self._lock = threading.Lock()
+        self._runs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        p = "sitesourcing_"
+        self.run_seconds = Histogram(p + "run_duration_seconds", "Wall-clock time of a graph run", DURATION_BUCKETS)
+        self.node_seconds = Histogram(p + "node_duration_seconds", "Time inside one graph node")
+        self.call_seconds = Histogram(p + "call_duration_seconds", "External call latency, including waits and retries")
+        self.call_sem_wait = Histogram(p + "call_semaphore_wait_seconds", "Time spent waiting for a concurrency slot")
+        self.call_bytes = Histogram(p + "call_response_bytes", "Response bytes per external call", BYTES_BUCKETS)
+        self.call_rate_wait = Counter(p + "call_rate_limit_wait_seconds_total", "Time spent waiting on token buckets")
+        self.call_retries = Counter(p + "call_retries_total", "Transport-level retries and mirror failovers")
+        self.call_cache = Counter(p + "call_cache_total", "Cache lookups by result (hit/miss)")
+        self.call_errors = Counter(p + "call_errors_total", "External calls that raised")
+        self.llm_tokens = Counter(p + "llm_tokens_total", "LLM tokens by direction (in/out)")
+        self._metrics = [self.run_seconds, self.node_seconds, self.call_seconds, self.call_sem_wait, self.call_bytes,
+                         self.call_rate_wait, self.call_retries, self.call_cache, self.call_errors, self.llm_tokens]
+
+    # ---------- runs ----------
+
+    def start_run(self, run_id: str, edges: Sequence[Sequence[str]] = (), resumed: bool = False):
+        """Remember a run's DAG (for the critical path). A resumed run keeps its earlier spans."""
+        if not self.enabled:
+            return
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None or not resumed:
+                run = self._runs[run_id] = {"edges": [tuple(e) for e in edges], "spans": []}
+            run["edges"] = [tuple(e) for e in edges] or run["edges"]
+            self._runs.move_to_end(run_id)
+            while len(self._runs) > self.keep_runs:
+                self._runs.popitem(last=False)
+
+    def record(self, sp: Dict[str, Any]):
+        if not self.enabled:
+            return
+        a, kind, name = sp["attrs"], sp["kind"], sp["name"]
+        with self._lock:
+            if kind == "run":
+                self.run_seconds.observe(sp["duration"], kind=name)
+            elif kind == "node":
+                self.node_seconds.observe(sp["duration"], node=name)
+            else:
+                cache = a.get("cache", "none")
+                self.call_seconds.observe(sp["duration"], call=name, cache=cache)
+                self.call_sem_wait.observe(a.get("sem_wait_s", 0.0), call=name)
+                if a.get("bytes"):
+                    self.call_bytes.observe(a["bytes"], call=name)
+                self.call_rate_wait.inc(a.get("rate_wait_s", 0.0), call=name)
+                self.call_retries.inc(a.get("retries", 0), call=name)
+                if cache != "none":
+                    self.call_cache.inc(1, call=name, result=cache)
+                self.call_cache.inc(a.get("cache_hits", 0), call=name, result="hit")
+                self.call_cache.inc(a.get("cache_misses", 0), call=name, result="miss")
+                if sp.get("error"):
+                    self.call_errors.inc(1, call=name)
+                self.llm_tokens.inc(a.get("tokens_in", 0), direction="in")
+                self.llm_tokens.inc(a.get("tokens_out", 0), direction="out")
+            run = self._runs.get(sp.get("run_id") or "")
+            if run is not None and len(run["spans"]) < MAX_SPANS_PER_RUN:
+                run["spans"].append(sp)
+
+    def spans(self, run_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            run = self._runs.get(run_id)
+            return list(run["spans"]) if run is not None else None
+
+    # ---------- output ----------
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            lines: List[str] = []
+            for m in self._metrics:
+                lines += m.render()
+        return "\n".join(lines) + "\n"
+
+    def critical_path(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Chain of nodes that decided the run's wall-clock time, with where each one's time went.
+
+        Walks back from the last node to finish, each time to the predecessor that finished
+        last (the one the node actually waited on). gap_ms is scheduling delay after that
+        predecessor; external_ms is the union of the node's call spans (parallel calls count
+        once) and self_ms the rest (local compute, logging)."""
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is None:
+                return None
+            edges, spans = list(run["edges"]), list(run["spans"])
+
+        nodes: Dict[str, Dict[str, Any]] = {}
+        for sp in spans:
+            if sp["kind"] == "node":
+                nodes[sp["name"]] = sp   # a resumed run's re-executed node replaces the failed attempt
+        run_span = next((sp for sp in reversed(spans) if sp["kind"] == "run"), None)
+        if not nodes:
+            return {"run_id": run_id, "wall_ms": _ms(run_span["duration"]) if run_span else None, "path": []}
+
+        preds: Dict[str, List[str]] = {}
+        for s, t in edges:
+            preds.setdefault(t, []).append(s)
+        calls_by_node: Dict[str, List[Dict[str, Any]]] = {}
+        for sp in spans:
+            if sp["kind"] == "call" and sp.get("node") in nodes:
+                calls_by_node.setdefault(sp["node"], []).append(sp)
+
+        cur = max(nodes.values(), key=lambda sp: sp["end"])
+        chain = [cur]
+        seen = {cur["name"]}
+        while True:
+            ps = [nodes[p] for p in preds.get(cur["name"], []) if p in nodes and p not in seen]
+            if not ps:
+                break
+            cur = max(ps, key=lambda sp: sp["end"])
+            seen.add(cur["name"])
+            chain.append(cur)
+        chain.reverse()
+
+        t0 = run_span["start"] if run_span else chain[0]["start"]
+        path, prev_end = [], t0
+        for sp in chain:
+            calls = calls_by_node.get(sp["name"], [])
+            external = _union([(c["start"], c["end"]) for c in calls])
+            by_call: Dict[str, Dict[str, Any]] = {}
+            for c in calls:
+                b = by_call.setdefault(c["name"], {"count": 0, "total_ms": 0.0, "sem_wait_ms": 0.0, "rate_wait_ms": 0.0,
+                                                   "bytes": 0, "retries": 0, "cache_hits": 0, "errors": 0})
+                b["count"] += 1
+                b["total_ms"] += c["duration"] * 1000
+                b["sem_wait_ms"] += c["attrs"].get("sem_wait_s", 0.0) * 1000
+                b["rate_wait_ms"] += c["attrs"].get("rate_wait_s", 0.0) * 1000
+                b["bytes"] += int(c["attrs"].get("bytes", 0))
+                b["retries"] += int(c["attrs"].get("retries", 0))
+                b["cache_hits"] += int(c["attrs"].get("cache") == "hit") + int(c["attrs"].get("cache_hits", 0))
+                b["errors"] += int(bool(c.get("error")))
+            for b in by_call.values():
+                for k in ("total_ms", "sem_wait_ms", "rate_wait_ms"):
+                    b[k] = round(b[k], 1)
+            path.append({
+                "node": sp["name"],
+                "start_ms": _ms(sp["start"] - t0),
+                "gap_ms": _ms(max(0.0, sp["start"] - prev_end)),
+                "duration_ms": _ms(sp["duration"]),
+                "external_ms": _ms(external),
+                "self_ms": _ms(max(0.0, sp["duration"] - external)),
+                "calls": by_call,
+                **({"error": sp["error"]} if sp.get("error") else {}),
+            })
+            prev_end = sp["end"]
+
+        wall = run_span["duration"] if run_span else chain[-1]["end"] - t0
+        return {
+            "run_id": run_id,
+            "wall_ms": _ms(wall),
+            "critical_ms": round(sum(p["duration_ms"] + p["gap_ms"] for p in path), 1),
+            "path": path,
+            "nodes_off_path": sorted(set(nodes) - {p["node"] for p in path}),
+        }
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+def _union(intervals: List[Tuple[float, float]]) -> float:
+    total, end = 0.0, float("-inf")
+    for s, e in sorted(intervals):
+        if s > end:
+            total += e - s
+            end = e
+        elif e > end:
+            total += e - end
+            end = e
+    return total
+
+TELEMETRY = Telemetry(
+    keep_runs=int(os.environ.get("TELEMETRY_RUNS", "200")),
+    enabled=os.environ.get("TELEMETRY_DISABLE", "").lower() not in ("1", "true", "yes"),
+)
+
+# -----------------------------
+# Span API
+# -----------------------------
+
+@contextmanager
+def span(kind: str, name: str, run_id: Optional[str] = None, **attrs) -> Iterator[Dict[str, Any]]:
+    """Time a block as a "run", "node" or "call" span; nested spans inherit run and node."""
+    parent = _current.get()
+    sp: Dict[str, Any] = {
+        "kind": kind,
+        "name": name,
+        "run_id": run_id or (parent or {}).get("run_id"),
+        "node": name if kind == "node" else (parent or {}).get("node"),
+        "start": time.time(),
+        "attrs": dict(attrs),
+    }
+    token = _current.set(sp)
+    t0 = time.perf_counter()
+    try:
+        yield sp
+    except BaseException as e:
+        sp["error"] = type(e).__name__
+        raise
+    finally:
+        sp["duration"] = time.perf_counter() - t0
+        sp["end"] = sp["start"] + sp["duration"]
+        _current.reset(token)
+        TELEMETRY.record(sp)
+
+def note(**values):
+    """Add to the innermost open span: numbers accumulate, anything else overwrites."""
+    sp = _current.get()
+    if sp is None:
+        return
+    a = sp["attrs"]
+    for k, v in values.items():
+        if isinstance(v, (int, float)) and not isinstance(v, bool) and isinstance(a.get(k, 0), (int, float)):
+            a[k] = a.get(k, 0) + v
+        else:
+            a[k] = v
+
+@contextmanager
+def acquire(sem):
+    """`with acquire(SEM):` — like `with SEM:`, but the wait is noted on the current span."""
+    t0 = time.perf_counter()
+    sem.acquire()
+    note(sem_wait_s=time.perf_counter() - t0)
+    try:
+        yield
+    finally:
+        sem.release()
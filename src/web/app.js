@@ -140,9 +140,11 @@ Nodes:
           method: 'POST', headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify({ prompt, spec: specRef.current })
         });
+        const body = await res.json().catch(() => ({}));
+        if (res.status === 429) throw new Error('server busy: ' + (body.error || 'run queue full'));
         if (!res.ok) throw new Error('execute_generated ' + res.status);
-        onStarted && onStarted();
-        showMsg('✔ queued run', false);
+        onStarted && onStarted(body.run_id);
+        showMsg(body.queue_position ? `✔ queued run (position ${body.queue_position})` : '✔ run started', false);
       } catch (e) { showMsg(e?.message || String(e)); }
       finally { setRunning(false); }
     };
@@ -163,7 +165,7 @@ Nodes:
   }
 
   function Badges({ status }) {
-    const order = ['input_parser', 'ideation', 'zoning_ranker', 'infra_ranker', 'labor_ranker', 'report'];
+    const order = ['input_parser', 'ideation', 'prescreen', 'zoning_ranker', 'infra_ranker', 'labor_ranker', 'report'];
     return e('div', { className: 'card' },
       e('div', { className: 'hdr' }, e('h2', null, 'Execution Status')),
       e('div', { className: 'flex' },
@@ -184,6 +186,15 @@ Nodes:
 
     // holds the latest generated WorkflowSpec from /api/generate
     const specRef = React.useRef(null);
+    const wsRef = React.useRef(null);
+
+    // the server only sends events for runs this socket subscribed to
+    const onStarted = (runId) => {
+      const ws = wsRef.current;
+      if (runId && ws && ws.readyState === WebSocket.OPEN) {
+        ws.send(JSON.stringify({ action: 'subscribe', run_id: runId }));
+      }
+    };
 
     const onSpec = (spec) => {
       specRef.current = spec;
@@ -195,62 +206,77 @@ Nodes:
     React.useEffect(() => {
       const proto = location.protocol === 'https:' ? 'wss://' : 'ws://';
       const ws = new WebSocket(proto + location.host + '/ws');
+      wsRef.current = ws;
+
+      const handle = (msg) => {
+        if (msg.type === 'run_start') {
+          setStatus({});
+          setReport('');
+          setNodes((ns) => ns.map((n) => ({ ...n, data: { ...n.data, status: 'idle' } })));
+          setEdges((es) => es.map((ed) => ({ ...ed, animated: false })));
+        }
 
-      ws.onmessage = (evt) => {
-        try {
-          const msg = JSON.parse(evt.data);
-
-          if (msg.type === 'run_start') {
-            setStatus({});
-            setReport('');
-            setNodes((ns) => ns.map((n) => ({ ...n, data: { ...n.data, status: 'idle' } })));
-            setEdges((es) => es.map((ed) => ({ ...ed, animated: false })));
-          }
+        // static path events
+        if (msg.type === 'node_start') {
+          setStatus((s) => ({ ...s, [msg.node]: 'running' }));
+          setNodes((ns) => ns.map((n) => (n.id === msg.node ? { ...n, data: { ...n.data, status: 'running' } } : n)));
+          setEdges((es) => es.map((ed) => (ed.source === msg.node ? { ...ed, animated: true } : ed)));
+        }
+        if (msg.type === 'node_end') {
+          setStatus((s) => ({ ...s, [msg.node]: 'done' }));
+          setNodes((ns) => ns.map((n) => (n.id === msg.node ? { ...n, data: { ...n.data, status: 'done' } } : n)));
+          setEdges((es) => es.map((ed) => (ed.source === msg.node ? { ...ed, animated: false } : ed)));
+        }
 
-          // static path events
-          if (msg.type === 'node_start') {
-            setStatus((s) => ({ ...s, [msg.node]: 'running' }));
-            setNodes((ns) => ns.map((n) => (n.id === msg.node ? { ...n, data: { ...n.data, status: 'running' } } : n)));
-            setEdges((es) => es.map((ed) => (ed.source === msg.node ? { ...ed, animated: true } : ed)));
-          }
-          if (msg.type === 'node_end') {
-            setStatus((s) => ({ ...s, [msg.node]: 'done' }));
-            setNodes((ns) => ns.map((n) => (n.id === msg.node ? { ...n, data: { ...n.data, status: 'done' } } : n)));
-            setEdges((es) => es.map((ed) => (ed.source === msg.node ? { ...ed, animated: false } : ed)));
+        // dynamic path pulse
+        if (msg.type === 'node_tick') {
+          const nodeId = msg.node;
+          if (nodeId) {
+            setStatus((s) => ({ ...s, [nodeId]: 'running' }));
+            setNodes((ns) => ns.map((n) => (n.id === nodeId ? { ...n, data: { ...n.data, status: 'running' } } : n)));
+            setEdges((es) => es.map((ed) => (ed.source === nodeId ? { ...ed, animated: true } : ed)));
+
+            // optimistic finalize after a brief delay
+            setTimeout(() => {
+              setStatus((s) => ({ ...s, [nodeId]: 'done' }));
+              setNodes((ns) => ns.map((n) => (n.id === nodeId ? { ...n, data: { ...n.data, status: 'done' } } : n)));
+              setEdges((es) => es.map((ed) => (ed.source === nodeId ? { ...ed, animated: false } : ed)));
+            }, 250);
           }
+        }
 
-          // dynamic path pulse
-          if (msg.type === 'node_tick') {
-            const nodeId = msg.node;
-            if (nodeId) {
-              setStatus((s) => ({ ...s, [nodeId]: 'running' }));
-              setNodes((ns) => ns.map((n) => (n.id === nodeId ? { ...n, data: { ...n.data, status: 'running' } } : n)));
-              setEdges((es) => es.map((ed) => (ed.source === nodeId ? { ...ed, animated: true } : ed)));
-
-              // optimistic finalize after a brief delay
-              setTimeout(() => {
-                setStatus((s) => ({ ...s, [nodeId]: 'done' }));
-                setNodes((ns) => ns.map((n) => (n.id === nodeId ? { ...n, data: { ...n.data, status: 'done' } } : n)));
-                setEdges((es) => es.map((ed) => (ed.source === nodeId ? { ...ed, animated: false } : ed)));
-              }, 250);
-            }
-          }
+        // drafting tokens as they arrive; result/result_final below replace them with the full text
+        if (msg.type === 'report_delta') setReport((r) => r + (msg.delta || ''));
+        if (msg.type === 'result') setReport(msg.report_md || '');
+        if (msg.type === 'result_final') setReport(msg.report_md || '');
+
+        if (msg.type === 'run_end') {
+          // finalize any lingering animations
+          setNodes((ns) => ns.map((n) =>
+            n.data.status === 'running' ? { ...n, data: { ...n.data, status: 'done' } } : n
+          ));
+          setEdges((es) => es.map((ed) => ({ ...ed, animated: false })));
+        }
 
-          if (msg.type === 'result') setReport(msg.report_md || '');
-          if (msg.type === 'result_final') setReport(msg.report_md || '');
+        if (msg.type === 'run_cancelled') {
+          setNodes((ns) => ns.map((n) =>
+            n.data.status === 'running' ? { ...n, data: { ...n.data, status: 'idle' } } : n
+          ));
+          setEdges((es) => es.map((ed) => ({ ...ed, animated: false })));
+          showMsg('run cancelled', false);
+        }
 
-          if (msg.type === 'run_end') {
-            // finalize any lingering animations
-            setNodes((ns) => ns.map((n) =>
-              n.data.status === 'running' ? { ...n, data: { ...n.data, status: 'done' } } : n
-            ));
-            setEdges((es) => es.map((ed) => ({ ...ed, animated: false })));
-          }
+        if (msg.type === 'run_error') {
+          setReport('ERROR: ' + (msg.error || 'unknown'));
+          showMsg(msg.error || 'run error');
+        }
+      };
 
-          if (msg.type === 'run_error') {
-            setReport('ERROR: ' + (msg.error || 'unknown'));
-            showMsg(msg.error || 'run error');
-          }
+      ws.onmessage = (evt) => {
+        try {
+          const msg = JSON.parse(evt.data);
+          // the server coalesces bursts into one batch frame
+          (msg.type === 'batch' ? msg.events : [msg]).forEach(handle);
         } catch (e) {
           showMsg('WS parse: ' + (e?.message || String(e)));
         }
@@ -267,7 +293,7 @@ Nodes:
       ),
       e(DesignerCard, { onSpec }),
       e(DagCard, { nodes, edges }),
-      e(ControlCardGenerated, { specRef, onStarted: () => {} }),
+      e(ControlCardGenerated, { specRef, onStarted }),
       e(Badges, { status }),
       e('div', { className: 'card' },
         e('div', { className: 'hdr' }, e('h2', null, 'Results')),
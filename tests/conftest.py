@@ -0,0 +1,57 @@
+# tests/conftest.py
+"""
+Shared setup: put src/ and src/backend/ on the path, and keep the suite off the
+user's caches and checkpoints (the modules read these at import time). Also the
+fake API answers the static-graph tests run against.
+"""
+
+import math
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT / "src", ROOT / "src" / "backend", ROOT / "src" / "benchmarks"):
+    sys.path.insert(0, str(p))
+
+_tmp = tempfile.mkdtemp(prefix="site-sourcing-tests-")
+os.environ.setdefault("GEO_CACHE_DISABLE", "1")
+os.environ.setdefault("NODE_CACHE_DISABLE", "1")
+os.environ.setdefault("CHECKPOINT_PATH", ":memory:")
+os.environ.setdefault("RUN_FACTS_PATH", os.path.join(_tmp, "run_facts.sqlite"))
+
+CENTER = (33.45, -112.07)
+
+def _offset(lat, lon, dlat_km, dlon_km):
+    return lat + dlat_km / 111.0, lon + dlon_km / (111.0 * math.cos(math.radians(lat)))
+
+@pytest.fixture
+def fake_sources(monkeypatch):
+    """Fixed fake answers from every API the static graph calls (template report, no LLM)."""
+    import milestone1_sitesourcing_langgraph_real as sitesourcing
+
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
+    sites = [_offset(*CENTER, dy, dx) for dy, dx in [(2, 3), (-6, 1), (9, -4), (-3, -12), (14, 8)]]
+    infra = [{"type": "node", "id": i, "lat": lat, "lon": lon, "tags": tags}
+             for i, ((lat, lon), tags) in enumerate([
+                 (_offset(*CENTER, 2.5, 3), {"power": "substation"}),
+                 (_offset(*CENTER, 1.5, 2), {"power": "generator"}),
+                 (_offset(*CENTER, -6, 2), {"man_made": "water_tower"}),
+                 (_offset(*CENTER, 10, -4), {"man_made": "mast"}),
+                 (_offset(*CENTER, 13, 9), {"pipeline": "gas"}),
+             ])]
+    motorway = {"type": "way", "id": 1, "geometry": [
+        {"lat": lat, "lon": lon} for lat, lon in (_offset(*CENTER, -20, 0), _offset(*CENTER, 20, 0))]}
+
+    monkeypatch.setattr(sitesourcing, "geocode_nominatim", lambda q: CENTER)
+    monkeypatch.setattr(sitesourcing, "fetch_industrial", lambda center, r, limit: {
+        "elements": [{"type": "way", "id": i, "center": {"lat": lat, "lon": lon}} for i, (lat, lon) in enumerate(sites)]})
+    monkeypatch.setattr(sitesourcing, "fetch_motorways", lambda bbox, cached_only=False: {"elements": [motorway]})
+    monkeypatch.setattr(sitesourcing, "fetch_infra", lambda bbox, cached_only=False: {"elements": infra})
+    monkeypatch.setattr(sitesourcing, "fcc_county_fips", lambda lat, lon: {
+        "County": {"FIPS": "04013" if lat < CENTER[0] + 0.05 else "04021", "name": "Maricopa" if lat < CENTER[0] + 0.05 else "Pinal"}})
+    monkeypatch.setattr(sitesourcing, "bls_unemployment_rates", lambda fips: {"04013": 3.4, "04021": 5.9})
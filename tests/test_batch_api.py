@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import milestone1_sitesourcing_langgraph_real as sitesourcing
+from runs import RunScheduler
+
+LOCATIONS = ["Phoenix, AZ", "Dallas, TX", "Atlanta, GA"]
+
+@pytest.fixture
+def client(monkeypatch):
+    """The batch endpoint with geocoding and the graph replaced: metro 0 is slow, the rest quick."""
+    monkeypatch.setattr(main, "runs", RunScheduler(max_workers=4, max_queue=4))
+    monkeypatch.setattr(sitesourcing, "geocode_many", lambda locs: (
+        {loc: (30.0 + 5 * i, -110.0 + 10 * i) for i, loc in enumerate(locs)}, {}))
+    monkeypatch.setattr(sitesourcing, "facts_from_state", lambda state: {"location": state["location"]})
+    monkeypatch.setattr(sitesourcing, "combine_facts", lambda facts: [])
+    seen = {"in_flight": 0, "peak": 0}
+
+    async def stream_run(graph, init, r, drafting_node, config=None):
+        seen["in_flight"] += 1
+        seen["peak"] = max(seen["peak"], seen["in_flight"])
+        try:
+            await asyncio.sleep(5 if r.id.endswith(".0") else 0.05)
+        finally:
+            seen["in_flight"] -= 1
+        return {"location": init["location"]}
+
+    monkeypatch.setattr(main, "stream_run", stream_run)
+    with TestClient(main.app) as c:
+        c.seen = seen
+        yield c
+
+def wait_for(client, path, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        resp = client.get(path)
+        if resp.status_code == 200:
+            return resp.json()
+        time.sleep(0.02)
+    raise AssertionError(f"{path} never answered 200")
+
+def test_batch_takes_a_slot_per_metro_in_flight(client):
+    batch_id = client.post("/api/execute_batch", json={"locations": LOCATIONS, "concurrency": 2}).json()["run_id"]
+    assert main.runs.get(batch_id).slots == 2
+
+    metro = wait_for(client, f"/api/runs/{batch_id}.0")
+    assert metro["batch"] == batch_id and metro["kind"] == "static"
+    assert client.post(f"/api/runs/{batch_id}.0/cancel").json()["cancelled"]
+
+    out = wait_for(client, f"/api/runs/{batch_id}/batch")
+    assert [m["status"] for m in out["metros"]] == ["cancelled", "done", "done"]
+    assert client.get(f"/api/runs/{batch_id}.0").json()["status"] == "cancelled"
+    assert client.seen["peak"] <= 2 and main.runs._used == 0
+
+def test_batch_slots_capped_by_locations_and_workers(client):
+    small = client.post("/api/execute_batch", json={"locations": LOCATIONS[1:], "concurrency": 10}).json()["run_id"]
+    assert main.runs.get(small).slots == 2
+    wide = client.post("/api/execute_batch", json={"locations": LOCATIONS + ["Boise, ID", "Reno, NV"],
+                                                   "concurrency": 10}).json()
+    assert wide["status"] == "queued" and main.runs.get(wide["run_id"]).slots == 4
+
+@pytest.mark.parametrize("field", ["concurrency", "top"])
+def test_batch_rejects_non_positive_limits(client, field):
+    resp = client.post("/api/execute_batch", json={"locations": LOCATIONS, field: 0})
+    assert resp.status_code == 422
@@ -0,0 +1,31 @@
+import json
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+import milestone1_sitesourcing_langgraph_real as sitesourcing
+from events import EventBus
+from runs import RunScheduler
+
+def test_run_started_before_any_socket_is_replayed(monkeypatch):
+    monkeypatch.setattr(main, "bus", EventBus(flush_interval=0.01))
+    monkeypatch.setattr(main, "runs", RunScheduler(max_workers=2, max_queue=2))
+    monkeypatch.setattr(sitesourcing, "facts_from_state", lambda state: {"location": state.get("location")})
+
+    async def stream_run(graph, init, r, drafting_node, config=None):
+        return {"location": init["location"]}
+
+    monkeypatch.setattr(main, "stream_run", stream_run)
+    with TestClient(main.app) as client:
+        run_id = client.post("/api/execute", json={"prompt": "sites", "location": "Phoenix, AZ"}).json()["run_id"]
+        deadline = time.time() + 5
+        while main.runs.get(run_id).status != "done" and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)   # one flush window
+        assert main.bus._history.get(run_id), "events published before the first socket were dropped"
+
+        with client.websocket_connect(f"/ws?run_id={run_id}") as ws:
+            frame = json.loads(ws.receive_text())
+    events = frame["events"] if frame["type"] == "batch" else [frame]
+    assert [e["type"] for e in events] == ["run_start", "run_end"]
@@ -0,0 +1,65 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_pool
+import rate_limit
+import milestone1_sitesourcing_langgraph_real as sitesourcing
+
+@pytest.fixture
+def flaky_server():
+    """Local server answering 503 to the first `fail` requests, then 200."""
+    state = {"fail": 2, "seen": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["seen"] += 1
+            code = 503 if state["seen"] <= state["fail"] else 200
+            body = b'{"ok": true}'
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}/", state
+    srv.shutdown()
+
+def test_transport_retries_take_rate_tokens(flaky_server):
+    url, state = flaky_server
+    http_pool.configure_host("127.0.0.1", backoff_factor=0, respect_retry_after=False)
+    rate_limit.configure("127.0.0.1", rate=1000.0, burst=1000)
+    try:
+        resp = http_pool.get(url, timeout=5)
+        assert resp.status_code == 200 and state["seen"] == 3
+        # the first attempt and both retries each took a token
+        assert rate_limit.bucket_for("127.0.0.1").acquired == 3
+    finally:
+        rate_limit.RATE_LIMITS.pop("127.0.0.1", None)
+        rate_limit._buckets.pop("127.0.0.1", None)
+        http_pool.HOST_CONFIG.pop("127.0.0.1", None)
+        http_pool._sessions.pop("127.0.0.1", None)
+
+def test_rate_token_is_taken_before_the_semaphore(monkeypatch):
+    free_slots = []
+    monkeypatch.setattr(rate_limit, "acquire", lambda host: free_slots.append(sitesourcing.FCC_SEM._value) or 0.0)
+
+    class Resp:
+        content = b"{}"
+        raw = None
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"County": {"FIPS": "04013", "name": "Maricopa"}}
+
+    monkeypatch.setattr(http_pool, "session_for", lambda url: type("S", (), {"request": lambda *a, **k: Resp()})())
+    sitesourcing.fcc_county_fips(33.45, -112.07)
+    assert free_slots == [sitesourcing.FCC_SEM._initial_value]
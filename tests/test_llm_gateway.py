@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+from typing import TypedDict
+
+import pytest
+from langchain_core.messages import HumanMessage
+from langgraph.graph import StateGraph, END
+
+import llm_stub
+from llm_gateway import LLMGateway
+
+@pytest.fixture
+def stub(monkeypatch):
+    """llm_stub on a free port with OPENAI_BASE_URL pointing at it; yields the stub's state."""
+    server, state = llm_stub.serve(port=0, latency_ms=150, token_delay_ms=2)
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    yield state
+    server.shutdown()
+
+def invoke_concurrently(gw: LLMGateway, n: int):
+    out = [None] * n
+
+    def call(i):
+        out[i] = gw.invoke([HumanMessage(content=f"question {i}")])
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+def test_sibling_calls_share_one_batch(stub):
+    gw = LLMGateway(batch_window_s=0.2, max_batch=8, max_concurrency=8)
+    assert gw.available
+    replies = invoke_concurrently(gw, 4)
+    assert [r.content.split("First line: ")[1].splitlines()[0] for r in replies] == [f"question {i}" for i in range(4)]
+    stats = gw.stats()
+    assert stats["requests"] == 4 and stats["batches"] == 1 and stats["avg_batch_size"] == 4
+    assert stub.requests == 4 and stub.max_in_flight == 4   # the batch's requests went out together
+
+def test_concurrency_limit_is_respected(stub):
+    gw = LLMGateway(batch_window_s=0.01, max_batch=8, max_concurrency=2)
+    replies = invoke_concurrently(gw, 6)
+    assert all(r.content for r in replies)
+    assert stub.requests == 6 and stub.max_in_flight <= 2
+    assert gw.stats()["in_flight"] == 0
+
+def test_stats_separate_queue_and_model_time(stub):
+    gw = LLMGateway(batch_window_s=0.01, max_batch=1, max_concurrency=1)
+    invoke_concurrently(gw, 3)   # one at a time: the later calls wait ~150ms / ~300ms for the slot
+    stats = gw.stats()
+    assert stats["errors"] == 0 and stats["batches"] == 3
+    assert stats["model_ms"]["p50"] >= 140                    # a call's own round trip
+    assert stats["queue_ms"]["p95"] >= 280                    # the last call sat behind two others
+    assert stats["queue_ms"]["p95"] > stats["model_ms"]["p50"]
+
+def test_messages_mode_streaming_reaches_astream(stub):
+    gw = LLMGateway(batch_window_s=0.01)
+
+    class S(TypedDict, total=False):
+        report_md: str
+
+    def draft(state: S) -> S:
+        return {"report_md": gw.invoke([HumanMessage(content="draft it")]).content}
+
+    g = StateGraph(S)
+    g.add_node("draft", draft)
+    g.set_entry_point("draft")
+    g.add_edge("draft", END)
+    app = g.compile()
+
+    async def run():
+        deltas, final = [], {}
+        async for mode, chunk in app.astream({}, stream_mode=["messages", "values"]):
+            if mode == "values":
+                final = chunk
+            elif chunk[1].get("langgraph_node") == "draft" and chunk[0].content:
+                deltas.append(chunk[0].content)
+        return deltas, final
+
+    deltas, final = asyncio.run(run())
+    assert len(deltas) > 1
+    assert "".join(deltas) == final["report_md"]
+    assert final["report_md"].startswith("# Stub report")
+
+def test_stalled_call_times_out(monkeypatch):
+    server, state = llm_stub.serve(port=0, latency_ms=1000, token_delay_ms=0)
+    server.handle_error = lambda request, address: None   # the abandoned requests hit a closed socket
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    try:
+        gw = LLMGateway(batch_window_s=0.01, timeout_s=0.3)
+        t0 = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            gw.invoke([HumanMessage(content="slow")])
+        assert time.perf_counter() - t0 < 0.9
+        with pytest.raises(TimeoutError):
+            asyncio.run(gw.ainvoke([HumanMessage(content="slow")]))
+        assert gw.stats()["timeouts"] == 2
+    finally:
+        server.shutdown()
@@ -0,0 +1,33 @@
+import asyncio
+from collections import Counter
+
+import milestone1_sitesourcing_langgraph_real as sitesourcing
+from checkpoints import thread_config
+from telemetry import TELEMETRY
+
+NODES = ["input_parser", "ideation", "prescreen", "zoning_ranker", "infra_ranker", "labor_ranker", "report"]
+INIT = {"prompt": "Find industrial sites near Phoenix, AZ", "location": "Phoenix, AZ"}
+
+def _node_spans(run_id):
+    return Counter(sp["name"] for sp in TELEMETRY.spans(run_id) if sp["kind"] == "node")
+
+def test_plain_graph_records_node_spans(fake_sources):
+    app = sitesourcing.build_graph(checkpointer=None)
+    TELEMETRY.start_run("spans-cli", sitesourcing.graph_edges(app))
+    app.invoke(dict(INIT), config=thread_config("spans-cli"))
+    assert _node_spans("spans-cli") == Counter(NODES)
+    path = [step["node"] for step in TELEMETRY.critical_path("spans-cli")["path"]]
+    assert path[:3] == ["input_parser", "ideation", "prescreen"] and path[-1] == "report"
+
+def test_server_graph_counts_each_node_once(fake_sources, monkeypatch):
+    import main
+    from runs import Run
+
+    events = []
+    monkeypatch.setattr(main, "emit", events.append)
+    r = Run("static", run_id="spans-server")
+    asyncio.run(main.stream_run(main.app_graph, dict(INIT), r, "report",
+                                config=main.run_config(r, {"run_kind": "static"})))
+    assert _node_spans("spans-server") == Counter(NODES)
+    assert {e["node"] for e in events if e["type"] == "node_start"} == \
+        {main.EVENT_NAMES.get(n, n) for n in NODES}
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+import requests
+
+import milestone1_sitesourcing_langgraph_real as sitesourcing
+from overpass_scheduler import EndpointScheduler
+
+MIRRORS = ["http://mirror-a.test/api/interpreter", "http://mirror-b.test/api/interpreter"]
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.headers = {}
+        self._payload = payload or {}
+
+    def json(self):
+        return self._payload
+
+@pytest.fixture
+def mirrors(monkeypatch):
+    """Fake mirrors answering with the given status codes, in order; returns the urls hit."""
+    scheduler = EndpointScheduler(MIRRORS)
+    monkeypatch.setattr(sitesourcing, "OVERPASS_SCHEDULER", scheduler)
+    hits = []
+
+    def answer_with(*statuses):
+        answers = iter(statuses)
+
+        def post(url, **kwargs):
+            hits.append(url)
+            status = next(answers)
+            return FakeResponse(status, {"elements": []} if status == 200 else None)
+        monkeypatch.setattr(sitesourcing.http_pool, "post", post)
+        return scheduler, hits
+    return answer_with
+
+def test_client_error_is_raised_without_failover(mirrors):
+    scheduler, hits = mirrors(400, 200)
+    with pytest.raises(requests.HTTPError):
+        sitesourcing._overpass_live("[out:json];bad", tries=4, base_timeout=5)
+    assert len(hits) == 1
+    assert all(m["failures"] == 0 for m in scheduler.stats())
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_throttle_and_server_errors_fail_over(mirrors, status):
+    scheduler, hits = mirrors(status, 200)
+    assert sitesourcing._overpass_live("[out:json];ok", tries=4, base_timeout=5) == {"elements": []}
+    assert len(hits) == 2 and hits[0] != hits[1]
+    assert sum(m["failures"] for m in scheduler.stats()) == 1
+
+def _trip(scheduler, url):
+    for _ in range(scheduler.failure_threshold):
+        scheduler.pick(exclude=[u for u in MIRRORS if u != url])
+        scheduler.record(url, ok=False, status=503)
+
+def test_half_open_mirror_gets_a_single_probe():
+    scheduler = EndpointScheduler(MIRRORS[:1], base_cooldown=0.05)
+    _trip(scheduler, MIRRORS[0])
+    time.sleep(0.06)
+    assert scheduler.pick() == (MIRRORS[0], 0.0)   # the probe
+    assert scheduler.pick() == (None, 0.0)         # not a second one, not even via the fallback
+    scheduler.record(MIRRORS[0], ok=True, latency=0.1, status=200)
+    assert scheduler.pick() == (MIRRORS[0], 0.0)
+
+def test_caller_waiting_out_a_cooldown_is_the_probe():
+    scheduler = EndpointScheduler(MIRRORS[:1], base_cooldown=30)
+    _trip(scheduler, MIRRORS[0])
+    url, wait = scheduler.pick()
+    assert url == MIRRORS[0] and 29 < wait <= 30
+    assert scheduler.pick() == (None, 0.0)
+
+def test_fallback_skips_the_probing_mirror():
+    scheduler = EndpointScheduler(MIRRORS, base_cooldown=0.05)
+    _trip(scheduler, MIRRORS[0])
+    scheduler.pick(exclude=[MIRRORS[0]])
+    scheduler.record(MIRRORS[1], ok=False, status=429, retry_after="20")
+    time.sleep(0.06)
+    assert scheduler.pick() == (MIRRORS[0], 0.0)   # probe; the other mirror is throttled
+    url, wait = scheduler.pick()
+    assert url == MIRRORS[1] and wait > 19
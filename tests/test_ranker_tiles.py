@@ -0,0 +1,50 @@
+import re
+
+import milestone1_sitesourcing_langgraph_real as sitesourcing
+from geo_utils import bbox_around, bbox_tiles
+
+def test_tiles_cover_the_box_on_a_fixed_grid():
+    assert bbox_tiles((33.1, -112.4, 33.3, -112.1), 0.5) == [(33.0, -112.5, 33.5, -112.0)]
+    tiles = bbox_tiles((33.4, -112.2, 33.6, -111.9), 0.5)
+    assert tiles == [(33.0, -112.5, 33.5, -112.0), (33.0, -112.0, 33.5, -111.5),
+                     (33.5, -112.5, 34.0, -112.0), (33.5, -112.0, 34.0, -111.5)]
+    # a box ending exactly on a grid line doesn't pull in the next row
+    assert bbox_tiles((33.0, -112.5, 33.5, -112.0), 0.5) == [(33.0, -112.5, 33.5, -112.0)]
+
+def test_different_survivors_share_cells():
+    a = bbox_around([(33.42, -112.05), (33.38, -112.10)], sitesourcing.ZONING_RADIUS_KM)
+    b = bbox_around([(33.45, -112.00)], sitesourcing.ZONING_RADIUS_KM)
+    assert a != b and bbox_tiles(a, 0.5) == bbox_tiles(b, 0.5)
+
+def _fake_overpass(monkeypatch, cached=None):
+    queries = []
+
+    def answer(q):
+        queries.append(q)
+        s = float(re.search(r"way\(([-\d.]+),", q).group(1))
+        # way 1 crosses every cell edge, so each cell returns it
+        return {"elements": [{"type": "way", "id": 1}, {"type": "way", "id": int(s * 10)}]}
+
+    monkeypatch.setattr(sitesourcing, "OSM_BACKEND", "overpass")
+    monkeypatch.setattr(sitesourcing, "overpass", answer)
+    monkeypatch.setattr(sitesourcing, "overpass_cached", lambda q: answer(q) if cached is None or cached(q) else None)
+    return queries
+
+def test_rankers_query_per_cell_and_merge(monkeypatch):
+    queries = _fake_overpass(monkeypatch)
+    js = sitesourcing.fetch_motorways((33.4, -112.2, 33.6, -112.1))
+    assert len(queries) == 2
+    assert sorted(el["id"] for el in js["elements"]) == [1, 330, 335]
+
+def test_cached_only_needs_every_cell(monkeypatch):
+    _fake_overpass(monkeypatch, cached=lambda q: "way(33.0," in q)
+    assert sitesourcing.fetch_motorways((33.1, -112.2, 33.3, -112.1), cached_only=True) is not None
+    assert sitesourcing.fetch_motorways((33.4, -112.2, 33.6, -112.1), cached_only=True) is None
+
+def test_ranker_box_ignores_the_rest_of_the_batch():
+    centers = {"Phoenix, AZ": (33.45, -112.07), "Mesa, AZ": (33.42, -111.83), "Tucson, AZ": (32.22, -110.97)}
+    inits = sitesourcing.batch_inits(centers)
+    assert list(inits) == list(centers) and all("region" not in init for init in inits.values())
+    state = {**inits["Phoenix, AZ"], "candidates": [(33.50, -112.10), (33.40, -112.00)]}
+    assert sitesourcing._ranker_bbox(state, sitesourcing.ZONING_RADIUS_KM) == \
+        bbox_around(state["candidates"], sitesourcing.ZONING_RADIUS_KM)
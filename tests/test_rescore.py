@@ -0,0 +1,37 @@
+import pytest
+
+import milestone1_sitesourcing_langgraph_real as sitesourcing
+
+@pytest.fixture
+def final_state(fake_sources):
+    """A finished static run over fixed fake API answers (template report, no LLM)."""
+    app = sitesourcing.build_graph(checkpointer=None)
+    return app.invoke({"prompt": "Find industrial sites near Phoenix, AZ", "location": "Phoenix, AZ"})
+
+def test_default_weights_reproduce_the_stored_ranking(final_state):
+    out = sitesourcing.rescore_facts(sitesourcing.facts_from_state(final_state))
+    expected = sorted(
+        (sitesourcing.combine_score(final_state["zoning"][k]["score"], final_state["infra"][k]["score"],
+                                    final_state["labor"][k]["score"]), k)
+        for k in final_state["zoning"]
+    )[::-1]
+    assert [str(tuple(r["coords"])) for r in out["ranking"]] == [k for _, k in expected]
+    assert [r["score"] for r in out["ranking"]] == pytest.approx([s for s, _ in expected])
+    assert out["report_md"] == final_state["report_md"]
+
+def test_unknown_infra_key_is_rejected(final_state):
+    facts = sitesourcing.facts_from_state(final_state)
+    with pytest.raises(ValueError, match="substaton"):
+        sitesourcing.rescore_facts(facts, {"infra": {"substaton": 10}})
+    with pytest.raises(ValueError):
+        sitesourcing.rescore_facts(facts, {"infra": {"substation": -1}})
+    assert sitesourcing.rescore_facts(facts, {"infra": {"substation": 10}})["weights"]["infra"]["substation"] == 10.0
+
+def test_rescore_endpoint_returns_400_for_unknown_infra_key(final_state):
+    from fastapi.testclient import TestClient
+    import main
+    main.RUN_FACTS.save("rescore-test", sitesourcing.facts_from_state(final_state))
+    client = TestClient(main.app)
+    resp = client.post("/api/rescore", json={"run_id": "rescore-test", "weights": {"infra": {"substaton": 10}}})
+    assert resp.status_code == 400 and "substaton" in resp.json()["error"]
+    assert client.post("/api/rescore", json={"run_id": "rescore-test"}).status_code == 200
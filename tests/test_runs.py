@@ -0,0 +1,180 @@
+import asyncio
+
+from runs import QueueFull, RunScheduler
+
+async def _submit_and_check(max_workers, blockers):
+    runs = RunScheduler(max_workers=max_workers, max_queue=4)
+    release = asyncio.Event()
+
+    async def blocked(r):
+        await release.wait()
+
+    for _ in range(blockers):
+        runs.submit("static", blocked)
+    await asyncio.sleep(0)   # let the blockers take their slots
+    r = runs.submit("static", blocked)
+    position = runs.queue_position(r.id)
+    release.set()
+    await asyncio.gather(*(x.task for x in runs.runs.values()))
+    return position, runs.queue_position(r.id)
+
+def test_idle_scheduler_starts_immediately():
+    position, after = asyncio.run(_submit_and_check(max_workers=2, blockers=0))
+    assert position == 0 and after == 0
+
+def test_spare_slot_starts_immediately():
+    position, _ = asyncio.run(_submit_and_check(max_workers=2, blockers=1))
+    assert position == 0
+
+def test_full_scheduler_queues():
+    position, after = asyncio.run(_submit_and_check(max_workers=2, blockers=2))
+    assert position == 1 and after == 0
+
+def test_unknown_run_has_no_position():
+    assert RunScheduler().queue_position("nope") is None
+
+async def _peak_slots(runs):
+    peak = 0
+    while any(not r.task.done() for r in runs.runs.values()):
+        peak = max(peak, runs._used)
+        await asyncio.sleep(0.001)
+    return peak
+
+def test_wide_run_holds_its_slots():
+    async def go():
+        runs = RunScheduler(max_workers=4, max_queue=4)
+        release = asyncio.Event()
+
+        async def blocked(r):
+            await release.wait()
+
+        wide = runs.submit("batch", blocked, slots=3)
+        await asyncio.sleep(0)
+        one = runs.submit("static", blocked)
+        two = runs.submit("static", blocked)
+        positions = runs.queue_position(one.id), runs.queue_position(two.id)
+        await asyncio.sleep(0)
+        used = runs._used
+        release.set()
+        await asyncio.gather(*(x.task for x in runs.runs.values()))
+        return wide.slots, positions, used
+    slots, positions, used = asyncio.run(go())
+    assert slots == 3 and positions == (0, 1) and used == 4
+
+def test_wide_run_is_not_overtaken():
+    async def go():
+        runs = RunScheduler(max_workers=2, max_queue=4)
+        order = []
+
+        async def work(r):
+            order.append(r.id)
+            await asyncio.sleep(0.01)
+
+        runs.submit("static", work, run_id="a")
+        await asyncio.sleep(0)
+        runs.submit("batch", work, run_id="wide", slots=2)
+        runs.submit("static", work, run_id="b")
+        peak = await _peak_slots(runs)
+        return order, peak
+    order, peak = asyncio.run(go())
+    assert order == ["a", "wide", "b"] and peak <= 2
+
+def test_children_run_in_parent_slots_and_cancel_alone():
+    async def go():
+        runs = RunScheduler(max_workers=4, max_queue=4)
+        in_flight, peak = 0, 0
+
+        async def metro(c):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                await asyncio.sleep(0.05 if c.id.endswith(".0") else 0.01)
+            finally:
+                in_flight -= 1
+            return c.id
+
+        async def batch(r):
+            gate = asyncio.Semaphore(r.slots)
+            children = [runs.child("static", metro, {"batch": r.id}, f"{r.id}.{i}", gate) for i in range(5)]
+            await asyncio.sleep(0)
+            runs.cancel(f"{r.id}.0")
+            await asyncio.gather(*(c.task for c in children))
+            return [c.result for c in children]
+
+        b = runs.submit("batch", batch, run_id="b", slots=2)
+        await b.task
+        return b, runs, peak
+    b, runs, peak = asyncio.run(go())
+    assert peak <= 2 and runs._used == 0
+    assert runs.get("b.0").status == "cancelled"
+    assert [runs.get(f"b.{i}").status for i in range(1, 5)] == ["done"] * 4
+    assert b.status == "done" and b.result == [None, "b.1", "b.2", "b.3", "b.4"]
+
+def test_cancelled_parent_cancels_children():
+    async def go():
+        runs = RunScheduler(max_workers=2, max_queue=4)
+
+        async def metro(c):
+            await asyncio.sleep(10)
+
+        async def batch(r):
+            gate = asyncio.Semaphore(r.slots)
+            children = [runs.child("static", metro, None, f"{r.id}.{i}", gate) for i in range(3)]
+            await asyncio.gather(*(c.task for c in children))
+
+        b = runs.submit("batch", batch, run_id="b", slots=2)
+        await asyncio.sleep(0.01)
+        runs.cancel("b")
+        await b.task
+        await asyncio.sleep(0)
+        return runs
+    runs = asyncio.run(go())
+    assert runs.get("b").status == "cancelled" and runs._used == 0
+    assert {runs.get(f"b.{i}").status for i in range(3)} == {"cancelled"}
+
+def test_cancelled_head_of_queue_lets_the_next_run_start():
+    async def go():
+        runs = RunScheduler(max_workers=2, max_queue=4)
+        release = asyncio.Event()
+
+        async def blocked(r):
+            await release.wait()
+
+        runs.submit("static", blocked, run_id="busy")
+        await asyncio.sleep(0)
+        runs.submit("batch", blocked, run_id="wide", slots=2)
+        runs.submit("static", blocked, run_id="next")
+        await asyncio.sleep(0)
+        before = runs.get("next").status
+        runs.cancel("wide")
+        await asyncio.sleep(0.01)
+        after = runs.get("next").status
+        release.set()
+        await asyncio.gather(*(x.task for x in runs.runs.values()))
+        return before, after
+    assert asyncio.run(go()) == ("queued", "running")
+
+def test_queue_limit_counts_waiting_runs_not_running_ones():
+    async def go():
+        runs = RunScheduler(max_workers=4, max_queue=2)
+        release = asyncio.Event()
+
+        async def blocked(r):
+            await release.wait()
+
+        runs.submit("batch", blocked, slots=3)
+        await asyncio.sleep(0)
+        runs.submit("static", blocked)   # takes the last free slot
+        await asyncio.sleep(0)
+        queued = [runs.submit("static", blocked) for _ in range(2)]
+        try:
+            runs.submit("static", blocked)
+            rejected = None
+        except QueueFull as e:
+            rejected = e.depth
+        positions = [runs.queue_position(r.id) for r in queued]
+        release.set()
+        await asyncio.gather(*(x.task for x in runs.runs.values()))
+        return positions, rejected
+    assert asyncio.run(go()) == ([1, 2], 2)